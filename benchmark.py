@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""Reproducible benchmarks for the Python API servers.
+
+For each dataset size a fresh worker process builds a synthetic league
+(clips, matches, standings, settings) in a temporary directory, imports the
+server there and measures every API route twice:
+
+* in-process through the Flask test client (pure handler cost), and
+* over HTTP against a local threaded server with concurrent keep-alive
+  clients (``--threads``), which includes WSGI and socket overhead.
+
+p50/p95/p99 latency, throughput and the worker's peak RSS are written as
+JSON (by default to ``bench_results/<commit>.json``) so runs can be diffed::
+
+    python benchmark.py --sizes 10 1000 100000
+    python benchmark.py compare bench_results/old.json bench_results/new.json
+"""
+import argparse
+import http.client
+import importlib
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = (10, 1000, 10000, 100000)
+
+TEAMS = ['ACP 507', 'Coiner FC', 'FC WEST SIDE', 'Humacao Fc', 'Punta Coco Fc',
+         'Pura Vibra', 'Raven Law', 'Rayos X Fc', 'Tiki Taka Fc', 'fly city']
+CLIP_TYPES = ['goles', 'asistencias', 'atajadas', 'jugadas']
+WORDS = ['golazo', 'chilena', 'atajada', 'remate', 'tiro', 'libre', 'cabezazo',
+         'contragolpe', 'regate', 'pase', 'volea', 'penal', 'último', 'minuto']
+
+
+# ---- synthetic data ------------------------------------------------------
+
+def make_clips(n, rng):
+    start = datetime(2025, 1, 1)
+    clips = []
+    for i in range(n):
+        clips.append({
+            'id': f"bench-{i:06d}",
+            'title': ' '.join(rng.choice(WORDS) for _ in range(3)),
+            'description': ' '.join(rng.choice(WORDS) for _ in range(8)),
+            'type': rng.choice(CLIP_TYPES),
+            'category': rng.choice(CLIP_TYPES),
+            'club': rng.choice(TEAMS),
+            'filename': f"bench-{i:06d}.mp4",
+            'upload_date': (start + timedelta(seconds=rng.randrange(365 * 86400))).isoformat(),
+            'views': rng.randrange(5000),
+            'likes': rng.randrange(500),
+            'duration': '0:30'
+        })
+    return clips
+
+
+def make_matches(n, rng):
+    start = datetime(2025, 1, 1)
+    pairs = [(h, a) for h in TEAMS for a in TEAMS if h != a]
+    per_day = len(TEAMS) // 2
+    matches = []
+    for i in range(n):
+        home, away = pairs[i % len(pairs)]
+        matchday = i // per_day + 1
+        finished = rng.random() < 0.6
+        matches.append({
+            'id': 1000 + i,
+            'homeTeam': home,
+            'awayTeam': away,
+            'homeScore': rng.randrange(5) if finished else 0,
+            'awayScore': rng.randrange(5) if finished else 0,
+            'date': (start + timedelta(days=7 * (matchday - 1))).strftime('%Y-%m-%d'),
+            'time': '20:00',
+            'status': 'finished' if finished else 'scheduled',
+            'matchday': matchday
+        })
+    return matches
+
+
+def make_standings():
+    return [{
+        'position': i + 1, 'team': team, 'teamId': i + 1, 'played': 0, 'won': 0,
+        'drawn': 0, 'lost': 0, 'goalsFor': 0, 'goalsAgainst': 0,
+        'goalDifference': 0, 'points': 0
+    } for i, team in enumerate(TEAMS)]
+
+
+def write_dataset(directory, size, seed):
+    rng = random.Random(seed)
+    files = {
+        'clips_data.json': make_clips(size, rng),
+        'matches_data.json': make_matches(size, rng),
+        'standings_data.json': make_standings(),
+        'league_settings.json': {'seasonName': 'Bench', 'pointsWin': 3, 'pointsDraw': 1, 'pointsLoss': 0},
+    }
+    for name, data in files.items():
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    shutil.copy(os.path.join(REPO_DIR, 'index.html'), directory)
+    shutil.copy(os.path.join(REPO_DIR, 'styles.css'), directory)
+
+
+# ---- routes --------------------------------------------------------------
+
+def routes_for(app_name, size):
+    """(name, method, path) tuples exercised for each server"""
+    mid = f"bench-{size // 2:06d}"
+    common = [
+        ('clips', 'GET', '/api/clips'),
+        ('clips_deep_page', 'GET', f"/api/clips?page={max(size // 12 // 2, 1)}"),
+        ('clips_cursor', 'GET', '/api/clips?after='),
+        ('clip_detail', 'GET', f"/api/clips/{mid}"),
+        ('clip_like', 'POST', f"/api/clips/{mid}/like"),
+        ('stats', 'GET', '/api/stats'),
+        ('static_css', 'GET', '/styles.css'),
+    ]
+    if app_name == 'server':
+        return common + [('clips_category', 'GET', '/api/clips?category=goles')]
+    return common + [
+        ('clips_category', 'GET', '/api/clips?category=goles'),
+        ('standings', 'GET', '/api/standings'),
+        ('matches', 'GET', '/api/matches'),
+        ('matches_matchday', 'GET', '/api/matches?matchday=3'),
+        ('matches_status', 'GET', '/api/matches?status=scheduled'),
+        ('settings', 'GET', '/api/settings'),
+    ]
+
+
+# ---- measurement ---------------------------------------------------------
+
+def summarize(latencies, wall):
+    latencies = sorted(latencies)
+    n = len(latencies)
+
+    def pct(p):
+        return round(latencies[min(n - 1, int(p * n))] * 1000, 3) if n else None
+
+    return {
+        'requests': n,
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+        'throughput_rps': round(n / wall, 1) if wall else None
+    }
+
+
+def bench_test_client(app, routes, iterations):
+    client = app.test_client()
+    results = {}
+    for name, method, path in routes:
+        client.open(path, method=method)  # warm-up
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(iterations):
+            t = time.perf_counter()
+            client.open(path, method=method)
+            latencies.append(time.perf_counter() - t)
+        results[name] = summarize(latencies, time.perf_counter() - start)
+    return results
+
+
+def bench_http(app, routes, threads, requests_per_thread):
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    results = {}
+    try:
+        for name, method, path in routes:
+            latencies = []
+            lock = threading.Lock()
+
+            def worker():
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                local = []
+                for _ in range(requests_per_thread):
+                    t = time.perf_counter()
+                    conn.request(method, path, headers={'Connection': 'keep-alive'})
+                    conn.getresponse().read()
+                    local.append(time.perf_counter() - t)
+                conn.close()
+                with lock:
+                    latencies.extend(local)
+
+            workers = [threading.Thread(target=worker) for _ in range(threads)]
+            start = time.perf_counter()
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+            results[name] = summarize(latencies, time.perf_counter() - start)
+    finally:
+        server.shutdown()
+    return results
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_worker(args):
+    """Benchmark one (app, size) pair in this process and print JSON"""
+    workdir = tempfile.mkdtemp(prefix='lpcp-bench-')
+    try:
+        write_dataset(workdir, args.size, args.seed)
+        os.chdir(workdir)
+        sys.path.insert(0, REPO_DIR)
+
+        load_start = time.perf_counter()
+        module = importlib.import_module(args.app)
+        len(module.clip_store)  # force the initial load
+        load_seconds = time.perf_counter() - load_start
+
+        routes = routes_for(args.app, args.size)
+        result = {
+            'app': args.app,
+            'size': args.size,
+            'startup_load_s': round(load_seconds, 4),
+            'test_client': bench_test_client(module.app, routes, args.iterations),
+            'http': bench_http(module.app, routes, args.threads, args.requests),
+        }
+        result['peak_rss_mb'] = peak_rss_mb()
+        module.clip_store.close()
+        print(json.dumps(result))
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ---- driver --------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_suite(args):
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {'iterations': args.iterations, 'threads': args.threads,
+                   'requests_per_thread': args.requests, 'seed': args.seed},
+        'runs': []
+    }
+
+    env = dict(os.environ, LPCP_LOG_SAMPLE='0')
+    for app_name in args.apps:
+        for size in args.sizes:
+            print(f"⏱️  {app_name} con {size} registros...", file=sys.stderr)
+            cmd = [sys.executable, os.path.abspath(__file__), 'worker', '--app', app_name,
+                   '--size', str(size), '--seed', str(args.seed), '--iterations', str(args.iterations),
+                   '--threads', str(args.threads), '--requests', str(args.requests)]
+            output = subprocess.run(cmd, env=env, capture_output=True, text=True)
+            if output.returncode != 0:
+                print(output.stderr, file=sys.stderr)
+                continue
+            report['runs'].append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    out = args.output or os.path.join(REPO_DIR, 'bench_results', f"{commit}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Resultados guardados en {out}", file=sys.stderr)
+    print_report(report)
+
+
+def print_report(report):
+    for run in report['runs']:
+        print(f"\n{run['app']} · {run['size']} registros · RSS máx {run['peak_rss_mb']} MB")
+        print(f"{'ruta':<20}{'p50':>10}{'p95':>10}{'p99':>10}{'rps':>10}{'http p95':>12}{'http rps':>10}")
+        for name, stats in run['test_client'].items():
+            http_stats = run['http'].get(name, {})
+            print(f"{name:<20}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+                  f"{stats['throughput_rps']:>10}{http_stats.get('p95_ms', '-'):>12}{http_stats.get('throughput_rps', '-'):>10}")
+
+
+def compare(old_path, new_path, threshold):
+    """Print per-route p50/p95 changes; returns True if any regressed past threshold"""
+    with open(old_path, encoding='utf-8') as f:
+        old = {(r['app'], r['size']): r for r in json.load(f)['runs']}
+    with open(new_path, encoding='utf-8') as f:
+        new = {(r['app'], r['size']): r for r in json.load(f)['runs']}
+
+    regressed = False
+    for key in sorted(set(old) & set(new)):
+        print(f"\n{key[0]} · {key[1]} registros")
+        for mode in ('test_client', 'http'):
+            for name, after in new[key][mode].items():
+                before = old[key][mode].get(name)
+                if not before:
+                    continue
+                changes = []
+                for metric in ('p50_ms', 'p95_ms'):
+                    if before[metric]:
+                        delta = (after[metric] - before[metric]) / before[metric] * 100
+                        changes.append(f"{metric} {before[metric]} → {after[metric]} ({delta:+.1f}%)")
+                        if delta > threshold:
+                            regressed = True
+                print(f"  {mode:<12}{name:<20}" + '  '.join(changes))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LPCP API benchmarks')
+    sub = parser.add_subparsers(dest='command')
+
+    def add_load_args(p):
+        p.add_argument('--seed', type=int, default=42)
+        p.add_argument('--iterations', type=int, default=200, help='test-client requests per route')
+        p.add_argument('--threads', type=int, default=8, help='concurrent HTTP clients')
+        p.add_argument('--requests', type=int, default=50, help='HTTP requests per client per route')
+
+    run = sub.add_parser('run', help='run the full suite (default)')
+    run.add_argument('--apps', nargs='+', default=['simple_server', 'server'])
+    run.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES))
+    run.add_argument('--output')
+    add_load_args(run)
+
+    worker = sub.add_parser('worker', help=argparse.SUPPRESS)
+    worker.add_argument('--app', required=True)
+    worker.add_argument('--size', type=int, required=True)
+    add_load_args(worker)
+
+    cmp_parser = sub.add_parser('compare', help='diff two result files')
+    cmp_parser.add_argument('old')
+    cmp_parser.add_argument('new')
+    cmp_parser.add_argument('--threshold', type=float, default=10.0, help='regression threshold in %%')
+
+    argv = sys.argv[1:]
+    if not argv or argv[0].startswith('-'):
+        argv = ['run'] + argv
+    args = parser.parse_args(argv)
+
+    if args.command == 'worker':
+        run_worker(args)
+    elif args.command == 'compare':
+        sys.exit(1 if compare(args.old, args.new, args.threshold) else 0)
+    else:
+        run_suite(args)
+
+
+if __name__ == '__main__':
+    main()
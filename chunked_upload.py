@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""Resumable chunked uploads that stream straight to disk.
+
+A client opens a session (``create``), sends the file as raw chunks at
+increasing offsets (``append``), and closes it (``finalize``). Chunks are
+copied from the request stream into ``<upload folder>/.partial/<id>.part``
+while a SHA-256 digest is updated, so finishing an upload is a rename on the
+same filesystem rather than another copy, and duplicates can be detected by
+digest. If a connection drops, ``status`` reports how many bytes landed and
+the client resumes from there.
+
+Concurrent chunk writers, open sessions and reserved temp bytes are capped
+so a burst of uploads cannot pin every worker thread or fill the disk.
+Sessions with no chunk for ``ttl`` seconds are abandoned: a sweep run on
+``create`` and ``append`` (at most once per ``sweep_interval``) drops them,
+along with their partial files, so they stop counting against the caps.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+COPY_BUFFER = 64 * 1024
+
+
+class UploadError(Exception):
+    """Upload failure carrying the HTTP status to return"""
+
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+class UploadSessions:
+    """In-progress chunked uploads, persisted next to their partial files"""
+
+    def __init__(self, folder, max_size, max_active=4, max_sessions=32,
+                 max_pending_bytes=2 * 1024 * 1024 * 1024, max_chunk=8 * 1024 * 1024,
+                 ttl=24 * 3600, sweep_interval=60):
+        self.folder = folder
+        self.partial_folder = os.path.join(folder, '.partial')
+        self.max_size = max_size
+        self.max_sessions = max_sessions
+        self.max_pending_bytes = max_pending_bytes
+        self.max_chunk = max_chunk
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+
+        self._lock = threading.Lock()
+        self._writers = threading.BoundedSemaphore(max_active)
+        self._sessions = {}
+        self._hashes = {}
+        self._busy = set()
+        self._next_sweep = 0.0
+
+        os.makedirs(self.partial_folder, exist_ok=True)
+
+    # ---- session bookkeeping -------------------------------------------
+
+    def _part_path(self, upload_id):
+        return os.path.join(self.partial_folder, f"{upload_id}.part")
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.partial_folder, f"{upload_id}.json")
+
+    def _save_meta(self, session):
+        with open(self._meta_path(session['id']), 'w', encoding='utf-8') as f:
+            json.dump(session, f, ensure_ascii=False)
+
+    def _get(self, upload_id):
+        session = self._sessions.get(upload_id)
+        if session is not None:
+            return session
+
+        # Session from before a restart: reload it and re-hash what landed
+        try:
+            uuid.UUID(upload_id)
+            with open(self._meta_path(upload_id), 'r', encoding='utf-8') as f:
+                session = json.load(f)
+        except (ValueError, OSError):
+            raise UploadError('Upload not found', 404)
+
+        digest = hashlib.sha256()
+        try:
+            with open(self._part_path(upload_id), 'rb') as f:
+                for block in iter(lambda: f.read(COPY_BUFFER), b''):
+                    digest.update(block)
+                session['offset'] = f.tell()
+        except OSError:
+            raise UploadError('Upload not found', 404)
+        session['last_activity'] = time.time()
+        self._sessions[upload_id] = session
+        self._hashes[upload_id] = digest
+        return session
+
+    def _remove_files(self, upload_id):
+        for path in (self._part_path(upload_id), self._meta_path(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _sweep(self):
+        """Drop sessions idle for longer than ``ttl`` (call with the lock held)"""
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        cutoff = now - self.ttl
+        for upload_id, session in list(self._sessions.items()):
+            if upload_id not in self._busy and session.get('last_activity', 0) < cutoff:
+                del self._sessions[upload_id]
+                self._hashes.pop(upload_id, None)
+                self._remove_files(upload_id)
+
+        # Sessions left from before a restart are only on disk
+        try:
+            entries = list(os.scandir(self.partial_folder))
+        except OSError:
+            return
+        for entry in entries:
+            upload_id, ext = os.path.splitext(entry.name)
+            if ext not in ('.json', '.part') or upload_id in self._sessions:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _pending_bytes(self):
+        return sum(s['size'] for s in self._sessions.values())
+
+    # ---- API -----------------------------------------------------------
+
+    def create(self, filename, size, metadata=None):
+        if size <= 0 or size > self.max_size:
+            raise UploadError('Invalid file size', 413 if size > self.max_size else 400)
+
+        with self._lock:
+            self._sweep()
+            if len(self._sessions) >= self.max_sessions:
+                raise UploadError('Too many uploads in progress, try again later', 429)
+            if self._pending_bytes() + size > self.max_pending_bytes:
+                raise UploadError('Upload storage is full, try again later', 507)
+
+            upload_id = str(uuid.uuid4())
+            session = {
+                'id': upload_id,
+                'filename': filename,
+                'size': size,
+                'offset': 0,
+                'metadata': metadata or {},
+                'last_activity': time.time()
+            }
+            open(self._part_path(upload_id), 'wb').close()
+            self._save_meta(session)
+            self._sessions[upload_id] = session
+            self._hashes[upload_id] = hashlib.sha256()
+            return session
+
+    def status(self, upload_id):
+        with self._lock:
+            return dict(self._get(upload_id))
+
+    def append(self, upload_id, offset, stream, length):
+        """Copy ``length`` bytes from ``stream`` at ``offset``; returns the new offset"""
+        if length is None or length <= 0:
+            raise UploadError('Content-Length required')
+        if length > self.max_chunk:
+            raise UploadError('Chunk too large', 413, max_chunk=self.max_chunk)
+
+        with self._lock:
+            self._sweep()
+            session = self._get(upload_id)
+            if upload_id in self._busy:
+                raise UploadError('Chunk already in progress', 409, offset=session['offset'])
+            if offset != session['offset']:
+                raise UploadError('Offset mismatch', 409, offset=session['offset'])
+            if offset + length > session['size']:
+                raise UploadError('Chunk exceeds declared size', 400, offset=session['offset'])
+            if not self._writers.acquire(blocking=False):
+                raise UploadError('Too many concurrent uploads, retry shortly', 429, offset=session['offset'])
+            self._busy.add(upload_id)
+            digest = self._hashes[upload_id]
+
+        written = 0
+        try:
+            with open(self._part_path(upload_id), 'r+b') as f:
+                f.seek(offset)
+                while written < length:
+                    block = stream.read(min(COPY_BUFFER, length - written))
+                    if not block:
+                        break
+                    f.write(block)
+                    digest.update(block)
+                    written += len(block)
+        finally:
+            # Whatever reached the file counts, so a dropped chunk resumes where it stopped
+            with self._lock:
+                session['offset'] = offset + written
+                session['last_activity'] = time.time()
+                self._busy.discard(upload_id)
+                self._writers.release()
+                self._save_meta(session)
+
+        if written < length:
+            raise UploadError('Connection interrupted', 400, offset=session['offset'])
+        return session['offset']
+
+    def finalize(self, upload_id):
+        """Close a complete upload; returns (session, partial path, sha256 hex digest)"""
+        with self._lock:
+            session = self._get(upload_id)
+            if upload_id in self._busy:
+                raise UploadError('Chunk still in progress', 409, offset=session['offset'])
+            if session['offset'] != session['size']:
+                raise UploadError('Upload incomplete', 409, offset=session['offset'])
+            self._sessions.pop(upload_id)
+            digest = self._hashes.pop(upload_id).hexdigest()
+        try:
+            os.remove(self._meta_path(upload_id))
+        except FileNotFoundError:
+            pass
+        return session, self._part_path(upload_id), digest
+
+    def abort(self, upload_id):
+        with self._lock:
+            self._get(upload_id)
+            if upload_id in self._busy:
+                raise UploadError('Chunk still in progress', 409)
+            self._sessions.pop(upload_id, None)
+            self._hashes.pop(upload_id, None)
+        self._remove_files(upload_id)
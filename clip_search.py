@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""In-memory inverted index for searching clips by title, description and club.
+
+Text is folded to lowercase ASCII (``Bogotá`` and ``bogota`` match) and
+split into words. Each word maps to the clips containing it with a
+field-weighted term frequency (title counts most), and a sorted vocabulary
+gives prefix matching for type-ahead: the last query word matches every
+indexed word it starts.
+
+Every query word must match; results are ranked with BM25. The index is
+kept current by a ClipStore listener (uploads, edits, deletions) and is only
+rebuilt when the clip file is reloaded.
+"""
+import bisect
+import math
+import re
+import threading
+import unicodedata
+
+FIELD_WEIGHTS = {'title': 3, 'club': 2, 'description': 1}
+
+# Very common Spanish words that would only add noise to the ranking
+STOPWORDS = frozenset('a al con de del el en es la las lo los o para por que se su un una y'.split())
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Most vocabulary words a prefix may expand to
+MAX_EXPANSIONS = 50
+
+_WORD = re.compile(r'\w+')
+
+
+def fold(text):
+    """Lowercase and strip accents: 'Atlético' -> 'atletico'"""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text):
+    return [w for w in _WORD.findall(fold(text)) if w not in STOPWORDS]
+
+
+class ClipSearch:
+    """Incrementally maintained BM25 index over clip text fields"""
+
+    def __init__(self, store, fields=FIELD_WEIGHTS):
+        self.store = store
+        self.fields = dict(fields)
+        self._lock = threading.RLock()
+        self._postings = {}   # word -> {clip id: weighted tf}
+        self._doc_terms = {}  # clip id -> {word: weighted tf}
+        self._doc_len = {}
+        self._total_len = 0
+        self._vocab = []      # sorted words, for prefix lookups
+        self._loaded = False
+        store.add_listener(self._on_change)
+
+    # ---- bookkeeping ---------------------------------------------------
+
+    def _terms(self, clip):
+        terms = {}
+        for field, weight in self.fields.items():
+            value = clip.get(field)
+            if value:
+                for word in tokenize(value):
+                    terms[word] = terms.get(word, 0) + weight
+        return terms
+
+    def _index(self, clip):
+        clip_id = clip.get('id')
+        if clip_id is None:
+            return
+        terms = self._terms(clip)
+        self._doc_terms[clip_id] = terms
+        length = sum(terms.values())
+        self._doc_len[clip_id] = length
+        self._total_len += length
+        for word, tf in terms.items():
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = {}
+                bisect.insort(self._vocab, word)
+            postings[clip_id] = tf
+
+    def _unindex(self, clip_id):
+        terms = self._doc_terms.pop(clip_id, None)
+        if terms is None:
+            return
+        self._total_len -= self._doc_len.pop(clip_id)
+        for word in terms:
+            postings = self._postings[word]
+            del postings[clip_id]
+            if not postings:
+                del self._postings[word]
+                i = bisect.bisect_left(self._vocab, word)
+                del self._vocab[i]
+
+    def _rebuild(self, clips):
+        self._postings, self._doc_terms, self._doc_len = {}, {}, {}
+        self._total_len = 0
+        self._vocab = []
+        for clip in clips:
+            self._index(clip)
+
+    def _on_change(self, event, clip, changes):
+        with self._lock:
+            if event == 'reload':
+                self._rebuild(self.store.all())
+                self._loaded = True
+            elif not self._loaded or event == 'increment':
+                return
+            elif event == 'add':
+                self._unindex(clip.get('id'))
+                self._index(clip)
+            elif event == 'remove':
+                self._unindex(clip.get('id'))
+            elif event == 'update' and any(field in self.fields for field in changes):
+                self._unindex(clip.get('id'))
+                self._index(clip)
+
+    def _ensure_loaded(self):
+        # The first store read triggers the 'reload' that builds the index
+        if not self._loaded:
+            self.store.count()
+
+    # ---- queries -------------------------------------------------------
+
+    def _expand(self, prefix):
+        i = bisect.bisect_left(self._vocab, prefix)
+        words = []
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix) and len(words) < MAX_EXPANSIONS:
+            words.append(self._vocab[i])
+            i += 1
+        return words
+
+    def _word_scores(self, word, avg_len, n_docs):
+        postings = self._postings.get(word, {})
+        idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+        scores = {}
+        for clip_id, tf in postings.items():
+            norm = K1 * (1 - B + B * self._doc_len[clip_id] / avg_len)
+            scores[clip_id] = idf * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query, prefix=True, category=None, category_field=None, limit=20, offset=0):
+        """Return ``(total, [(clip, score), ...])`` ranked by BM25.
+
+        With ``prefix`` the last word also matches longer words it starts
+        (type-ahead).
+        """
+        words = _WORD.findall(fold(query))
+        # Stopwords are not indexed, but a type-ahead prefix like 'de' may
+        # still be the start of 'defensa'
+        words = [w for w in words[:-1] if w not in STOPWORDS] + \
+            [w for w in words[-1:] if prefix or w not in STOPWORDS]
+        if not words:
+            return 0, []
+        self._ensure_loaded()
+        category_field = category_field or self.store.category_field
+
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if n_docs == 0:
+                return 0, []
+            avg_len = (self._total_len / n_docs) or 1.0
+
+            # Rarest exact words first so the candidate set shrinks fast
+            last = words[-1] if prefix else None
+            exact = sorted(set(words[:-1] if prefix else words), key=lambda w: len(self._postings.get(w, ())))
+            totals = None
+            for word in exact:
+                scores = self._word_scores(word, avg_len, n_docs)
+                totals = scores if totals is None else {
+                    clip_id: total + scores[clip_id] for clip_id, total in totals.items() if clip_id in scores}
+                if not totals:
+                    return 0, []
+
+            if last is not None:
+                # A clip matching several expansions keeps its best one
+                best = {}
+                for word in self._expand(last):
+                    for clip_id, score in self._word_scores(word, avg_len, n_docs).items():
+                        if (totals is None or clip_id in totals) and score > best.get(clip_id, 0):
+                            best[clip_id] = score
+                totals = {clip_id: (totals[clip_id] if totals else 0) + score for clip_id, score in best.items()}
+
+        hits = []
+        for clip_id, score in totals.items():
+            clip = self.store.get(clip_id)
+            if clip is None or (category and clip.get(category_field) != category):
+                continue
+            hits.append((clip, score))
+        hits.sort(key=lambda hit: (-hit[1], str(hit[0].get('id'))))
+        return len(hits), hits[offset:offset + limit]
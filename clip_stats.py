@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Clip aggregates maintained incrementally from ClipStore changes.
+
+Totals (clips, views, likes) are kept globally and per club, per clip type
+and per upload day. Uploads, edits, views, likes and deletions adjust the
+affected buckets by their delta, so ``totals()`` is O(1) and a breakdown
+costs only the number of groups; a reload of the clip file recomputes
+everything from the records.
+
+``check()`` recomputes from the raw clips, reports every bucket that
+drifted and adopts the recomputed values. ``python clip_stats.py check``
+does the same offline for the data file, and also lists records whose
+counters are missing, negative or not numbers.
+"""
+import sys
+import threading
+
+DIMENSIONS = ('club', 'type', 'day')
+COUNTERS = ('views', 'likes')
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return 0
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _empty():
+    return {'clips': 0, 'views': 0, 'likes': 0}
+
+
+class ClipStats:
+    """Global, per-club, per-type and per-day clip/view/like totals"""
+
+    def __init__(self, store, club_field='club', type_field=None, date_field='upload_date'):
+        self.store = store
+        self.fields = {'club': club_field, 'type': type_field or store.category_field, 'day': date_field}
+        self._lock = threading.RLock()
+        self._totals = _empty()
+        self._groups = {dim: {} for dim in DIMENSIONS}
+        self._loaded = False
+        store.add_listener(self._on_change)
+
+    # ---- bookkeeping ---------------------------------------------------
+
+    def _keys(self, clip):
+        date = clip.get(self.fields['day']) or ''
+        return (
+            ('club', clip.get(self.fields['club']) or 'unknown'),
+            ('type', clip.get(self.fields['type']) or 'unknown'),
+            ('day', str(date)[:10] or 'unknown'),
+        )
+
+    def _bump(self, clip, field, delta):
+        if not delta:
+            return
+        self._totals[field] += delta
+        for dim, key in self._keys(clip):
+            bucket = self._groups[dim].get(key)
+            if bucket is None:
+                bucket = self._groups[dim][key] = _empty()
+            bucket[field] += delta
+            if field == 'clips' and bucket['clips'] <= 0:
+                del self._groups[dim][key]
+
+    def _add(self, clip, sign=1):
+        # Counters first: a removal may drop the whole bucket with 'clips'
+        for field in COUNTERS:
+            self._bump(clip, field, sign * _number(clip.get(field, 0)))
+        self._bump(clip, 'clips', sign)
+
+    def _recompute(self, clips):
+        self._totals = _empty()
+        self._groups = {dim: {} for dim in DIMENSIONS}
+        for clip in clips:
+            self._add(clip)
+
+    def _on_change(self, event, clip, changes):
+        with self._lock:
+            if event == 'reload':
+                self._recompute(self.store.all())
+                self._loaded = True
+            elif not self._loaded:
+                return
+            elif event == 'add':
+                self._add(clip)
+            elif event == 'remove':
+                self._add(clip, -1)
+            elif event == 'increment':
+                for field, delta in changes.items():
+                    if field in COUNTERS:
+                        self._bump(clip, field, delta)
+            elif event == 'update':
+                old = dict(clip, **{field: old for field, (old, new) in changes.items()})
+                self._add(old, -1)
+                self._add(clip)
+
+    def _ensure_loaded(self):
+        # The first store read triggers the 'reload' that fills the aggregates
+        if not self._loaded:
+            self.store.count()
+
+    # ---- reads ---------------------------------------------------------
+
+    def totals(self):
+        self._ensure_loaded()
+        with self._lock:
+            return {'total_clips': self._totals['clips'],
+                    'total_views': self._totals['views'],
+                    'total_likes': self._totals['likes']}
+
+    def breakdown(self, dimension=None):
+        """``{dimension: {key: {clips, views, likes}}}`` for one or every dimension"""
+        if dimension is not None and dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown breakdown: {dimension}")
+        self._ensure_loaded()
+        with self._lock:
+            return {dim: {key: dict(bucket) for key, bucket in sorted(self._groups[dim].items(), key=lambda kv: str(kv[0]))}
+                    for dim in DIMENSIONS if dimension in (None, dim)}
+
+    def check(self):
+        """Recompute from the clip records; return the drifted buckets and adopt the fix"""
+        self._ensure_loaded()
+        fresh = ClipStats.__new__(ClipStats)
+        fresh.fields = self.fields
+
+        # Under the store lock no change can land between recompute and adopt
+        with self.store.locked(), self._lock:
+            fresh._recompute(self.store.all())
+            drift = []
+            if self._totals != fresh._totals:
+                drift.append({'scope': 'total', 'stored': dict(self._totals), 'actual': dict(fresh._totals)})
+            for dim in DIMENSIONS:
+                for key in sorted(set(self._groups[dim]) | set(fresh._groups[dim]), key=str):
+                    stored = self._groups[dim].get(key, _empty())
+                    actual = fresh._groups[dim].get(key, _empty())
+                    if stored != actual:
+                        drift.append({'scope': dim, 'key': key, 'stored': stored, 'actual': actual})
+            self._totals = fresh._totals
+            self._groups = fresh._groups
+        return drift
+
+
+def find_bad_records(clips):
+    """Records whose counters would be miscounted"""
+    problems = []
+    for clip in clips:
+        for field in COUNTERS:
+            value = clip.get(field, 0)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                problems.append((clip.get('id'), f"{field} is not a number: {value!r}"))
+            elif value < 0:
+                problems.append((clip.get('id'), f"{field} is negative: {value}"))
+        if not clip.get('upload_date'):
+            problems.append((clip.get('id'), 'missing upload_date'))
+    return problems
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'check':
+        print("Uso: python clip_stats.py check")
+        sys.exit(1)
+
+    from simple_server import clip_stats
+
+    drift = clip_stats.check()
+    totals = clip_stats.totals()
+    print(f"📊 {totals['total_clips']} clips · {totals['total_views']} vistas · {totals['total_likes']} likes")
+    for dim, groups in clip_stats.breakdown().items():
+        print(f"   {dim}: {len(groups)} grupos")
+    for item in drift:
+        print(f"⚠️ Diferencia en {item['scope']} {item.get('key', '')}: {item['stored']} -> {item['actual']}")
+
+    problems = find_bad_records(clip_stats.store.all())
+    for clip_id, problem in problems:
+        print(f"⚠️ Clip {clip_id}: {problem}")
+    if not drift and not problems:
+        print("✅ Agregados consistentes")
+    sys.exit(1 if problems else 0)
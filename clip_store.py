@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""Process-resident clip repository shared by the Flask servers.
+
+Clips are loaded once and served from memory. Mutations mark the store dirty
+and a debounced timer writes the whole list back through the server's
+``save_clips_data`` function; a final flush runs at interpreter exit. The data
+file's mtime (or the storage backend's version, when ``version`` is given) is
+checked at most once per ``check_interval`` so edits made by hand, as
+described in MANUAL_UPDATE_GUIDE.md, are picked up without a restart.
+
+When a CounterJournal is attached, ``increment`` appends to it instead of
+dirtying the store; the journal is folded in on every (re)load and a
+background compactor merges it into the data file.
+
+Several worker processes can share one data file. Loads and flushes run
+under ``lock`` (the storage backend's cross-process lock), edits not yet
+written are kept as a list of operations, and a flush that finds the file or
+journal changed by someone else reloads first and replays those operations
+on top instead of overwriting the other worker's writes. ``save`` is called
+as ``save(clips, expected_version)`` so the backend can refuse a stale write.
+
+Newest-first order is kept in per-category sorted key lists of
+``(upload_date, id)`` maintained on insert, so both offset pages and keyset
+(cursor) pages are served without sorting the clip list per request. A
+``sha256`` -> id map finds an already uploaded file without a scan.
+"""
+import atexit
+import base64
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+
+from metrics import log_error, log_event
+
+# Key of the ordered index covering every category
+_ALL = object()
+
+
+def _order_key(clip):
+    return (clip.get('upload_date') or '', str(clip.get('id', '')))
+
+
+def encode_cursor(clip):
+    """Opaque keyset token for the position just after ``clip``"""
+    raw = json.dumps(list(_order_key(clip)), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError on a malformed token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        upload_date, clip_id = json.loads(raw)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    return (str(upload_date), str(clip_id))
+
+
+class ClipStore:
+    """In-memory clip list with write-behind persistence"""
+
+    def __init__(self, path, load, save, journal=None, version=None, lock=None, category_field='type',
+                 flush_delay=2.0, check_interval=1.0, compact_interval=30.0):
+        self.path = path
+        self.category_field = category_field
+        self._load_fn = load
+        self._save_fn = save
+        self._version_fn = version
+        self._lock_fn = lock or contextlib.nullcontext
+        self.journal = journal
+        self.flush_delay = flush_delay
+        self.check_interval = check_interval
+        self.compact_interval = compact_interval
+
+        self._lock = threading.RLock()
+        self._clips = []
+        self._by_id = {}
+        self._by_digest = {}
+        self._order = {_ALL: []}
+        self._loaded = False
+        self._dirty = False
+        self._pending = []
+        self._journal_seen = 0
+        self._timer = None
+        self._mtime = None
+        self._last_check = 0.0
+        self._compactor = None
+        self._listeners = []
+
+        atexit.register(self.close)
+
+    # ---- change notification -------------------------------------------
+
+    def add_listener(self, listener):
+        """Call ``listener(event, clip, changes)`` after every mutation.
+
+        ``event`` is 'add', 'update', 'increment', 'remove' or 'reload'
+        (``clip`` is None for reload; the reloaded list is readable through
+        ``all()``); ``changes`` maps each updated field to ``(old, new)``, or
+        is ``{field: delta}`` for increments. Listeners run under the store
+        lock, so they see mutations in order and must stay cheap.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, event, clip=None, changes=None):
+        for listener in self._listeners:
+            try:
+                listener(event, clip, changes)
+            except Exception as e:
+                log_error('listener_failed', e, source='clips')
+
+    # ---- loading -------------------------------------------------------
+
+    def _file_mtime(self):
+        if self._version_fn is not None:
+            return self._version_fn()
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        """Read the data file and journal, then re-apply edits not yet written"""
+        with self._lock_fn():
+            clips = self._load_fn() or []
+            mtime = self._file_mtime()
+            entries, seen = self.journal.replay(mtime) if self.journal is not None else ([], 0)
+        self._clips = list(clips)
+        self._by_id = {c['id']: c for c in self._clips if 'id' in c}
+        self._mtime = mtime
+        self._journal_seen = seen
+        for clip_id, field, delta in entries:
+            clip = self._by_id.get(clip_id)
+            if clip is not None:
+                clip[field] = clip.get(field, 0) + delta
+        for op in self._pending:
+            self._replay(op)
+        self._rebuild_order()
+        self._by_digest = {c['sha256']: c['id'] for c in self._clips if c.get('sha256') and 'id' in c}
+        self._last_check = time.monotonic()
+        self._loaded = True
+        self._notify('reload')
+
+    def _ensure_fresh(self):
+        """Load on first use and reload if the file was edited externally"""
+        if not self._loaded:
+            self._load()
+            return
+
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        mtime = self._file_mtime()
+        if mtime is not None and mtime != self._mtime:
+            log_event('store_reloaded', sample=1.0, path=self.path)
+            try:
+                self._load()
+            except Exception as e:
+                # Keep serving what we have; retried on the next check
+                log_error('store_reload_failed', e, path=self.path)
+
+    def _replay(self, op):
+        kind, clip_id = op[0], op[1]
+        if kind == 'add':
+            clip = op[2]
+            old = self._by_id.get(clip_id)
+            if old is not None:
+                self._clips.remove(old)
+            self._clips.append(clip)
+            self._by_id[clip_id] = clip
+        elif kind == 'remove':
+            clip = self._by_id.pop(clip_id, None)
+            if clip is not None:
+                self._clips.remove(clip)
+        else:
+            clip = self._by_id.get(clip_id)
+            if clip is None:
+                return
+            if kind == 'update':
+                clip.update(op[2])
+            else:
+                field, delta = op[2], op[3]
+                clip[field] = clip.get(field, 0) + delta
+
+    def reload(self):
+        """Force a reload from disk, dropping unsaved changes"""
+        with self._lock:
+            self._cancel_timer()
+            self._dirty = False
+            self._pending = []
+            self._load()
+
+    # ---- ordered index -------------------------------------------------
+
+    def _rebuild_order(self):
+        order = {_ALL: []}
+        for clip in self._clips:
+            key = _order_key(clip)
+            order[_ALL].append(key)
+            order.setdefault(clip.get(self.category_field), []).append(key)
+        for keys in order.values():
+            keys.sort()
+        self._order = order
+
+    def _index_add(self, clip):
+        key = _order_key(clip)
+        bisect.insort(self._order[_ALL], key)
+        bisect.insort(self._order.setdefault(clip.get(self.category_field), []), key)
+
+    def _index_remove(self, clip):
+        key = _order_key(clip)
+        for bucket in (_ALL, clip.get(self.category_field)):
+            keys = self._order.get(bucket, [])
+            i = bisect.bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+    def _digest_add(self, clip):
+        if clip.get('sha256'):
+            self._by_digest[clip['sha256']] = clip['id']
+
+    def _digest_remove(self, clip):
+        if clip.get('sha256') and self._by_digest.get(clip['sha256']) == clip['id']:
+            del self._by_digest[clip['sha256']]
+
+    def _keys(self, category):
+        return self._order.get(_ALL if category is None else category, [])
+
+    def _clips_for(self, keys):
+        return [self._by_id[clip_id] for _, clip_id in reversed(keys) if clip_id in self._by_id]
+
+    # ---- reads ---------------------------------------------------------
+
+    def all(self):
+        """Return a shallow copy of the clip list (records must not be mutated)"""
+        with self._lock:
+            self._ensure_fresh()
+            return list(self._clips)
+
+    def get(self, clip_id):
+        with self._lock:
+            self._ensure_fresh()
+            return self._by_id.get(clip_id)
+
+    def get_by_sha256(self, digest):
+        """Clip whose uploaded file has this SHA-256 hex digest, or None"""
+        with self._lock:
+            self._ensure_fresh()
+            clip_id = self._by_digest.get(digest)
+            return self._by_id.get(clip_id) if clip_id is not None else None
+
+    def count(self, category=None):
+        with self._lock:
+            self._ensure_fresh()
+            return len(self._keys(category))
+
+    def page(self, category=None, offset=0, limit=12):
+        """Newest-first slice [offset, offset + limit) of a category"""
+        with self._lock:
+            self._ensure_fresh()
+            keys = self._keys(category)
+            end = max(len(keys) - offset, 0)
+            return self._clips_for(keys[max(end - limit, 0):end])
+
+    def page_after(self, category=None, after=None, limit=12):
+        """Newest-first clips strictly older than the ``after`` key.
+
+        Returns ``(clips, has_more)``; O(log n + limit) and stable while new
+        clips are being uploaded.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            keys = self._keys(category)
+            end = len(keys) if after is None else bisect.bisect_left(keys, after)
+            start = max(end - limit, 0)
+            return self._clips_for(keys[start:end]), start > 0
+
+    def locked(self):
+        """The store lock, to hold across several reads that must agree"""
+        return self._lock
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_fresh()
+            return len(self._clips)
+
+    # ---- writes --------------------------------------------------------
+
+    def add(self, clip):
+        with self._lock:
+            self._ensure_fresh()
+            self._clips.append(clip)
+            self._by_id[clip['id']] = clip
+            self._index_add(clip)
+            self._digest_add(clip)
+            self._pending.append(('add', clip['id'], clip))
+            self._mark_dirty()
+            self._notify('add', clip)
+            return clip
+
+    def update(self, clip_id, fields):
+        with self._lock:
+            self._ensure_fresh()
+            clip = self._by_id.get(clip_id)
+            if clip is None:
+                return None
+            reorder = 'upload_date' in fields or self.category_field in fields
+            if reorder:
+                self._index_remove(clip)
+            changes = {k: (clip.get(k), v) for k, v in fields.items()}
+            self._digest_remove(clip)
+            clip.update(fields)
+            self._digest_add(clip)
+            if reorder:
+                self._index_add(clip)
+            self._pending.append(('update', clip_id, dict(fields)))
+            self._mark_dirty()
+            self._notify('update', clip, changes)
+            return clip
+
+    def increment(self, clip_id, field, delta=1):
+        """Bump a numeric counter and return the updated clip, or None"""
+        with self._lock:
+            self._ensure_fresh()
+            clip = self._by_id.get(clip_id)
+            if clip is None:
+                return None
+            clip[field] = clip.get(field, 0) + delta
+            if self.journal is not None:
+                self._journal_seen += self.journal.append(clip_id, field, delta)
+                self._start_compactor()
+            else:
+                self._pending.append(('increment', clip_id, field, delta))
+                self._mark_dirty()
+            self._notify('increment', clip, {field: delta})
+            return clip
+
+    def remove(self, clip_id):
+        with self._lock:
+            self._ensure_fresh()
+            clip = self._by_id.pop(clip_id, None)
+            if clip is None:
+                return None
+            self._clips.remove(clip)
+            self._index_remove(clip)
+            self._digest_remove(clip)
+            self._pending.append(('remove', clip_id))
+            self._mark_dirty()
+            self._notify('remove', clip)
+            return clip
+
+    # ---- persistence ---------------------------------------------------
+
+    def _mark_dirty(self):
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _stale(self):
+        """True if another process wrote the file or journal since we read them"""
+        if self._file_mtime() != self._mtime:
+            return True
+        return self.journal is not None and self.journal.size() != self._journal_seen
+
+    def flush(self):
+        """Write pending changes to disk now"""
+        with self._lock:
+            self._cancel_timer()
+            if not self._dirty:
+                return True
+            try:
+                with self._lock_fn():
+                    self._commit()
+            except Exception as e:
+                log_error('store_flush_failed', e, path=self.path)
+                # Keep the data dirty and try again later
+                self._mark_dirty()
+                return False
+            return True
+
+    def _commit(self):
+        if self._stale():
+            self._load()
+
+        # Any snapshot carries the folded counters, so it must also
+        # retire the journal entries it contains
+        marker = None
+        if self.journal is not None and self._journal_seen:
+            marker = self.journal.begin_compaction(self._mtime, self._journal_seen)
+
+        try:
+            saved = self._save_fn(list(self._clips), self._mtime) is not False
+        except Exception:
+            if marker is not None:
+                self.journal.abort_compaction()
+            raise
+        if not saved:
+            if marker is not None:
+                self.journal.abort_compaction()
+            raise IOError(f"could not save {self.path}")
+
+        self._dirty = False
+        self._pending = []
+        self._mtime = self._file_mtime()
+        if marker is not None:
+            self.journal.end_compaction(marker)
+            # Anything left was appended by other processes and is not in memory
+            self._journal_seen = 0
+
+    def compact(self):
+        """Fold the counter journal into the data file and empty it"""
+        with self._lock:
+            if self.journal is None or not self._loaded or self.journal.size() == 0:
+                return True
+            self._dirty = True
+            return self.flush()
+
+    def _start_compactor(self):
+        if self._compactor is None:
+            self._compactor = threading.Thread(target=self._compact_loop, daemon=True)
+            self._compactor.start()
+
+    def _compact_loop(self):
+        # Sync the journal every second and compact every compact_interval
+        elapsed = 0.0
+        while True:
+            time.sleep(1.0)
+            elapsed += 1.0
+            try:
+                self.journal.sync()
+                if elapsed >= self.compact_interval:
+                    elapsed = 0.0
+                    self.compact()
+            except Exception as e:
+                log_error('journal_compaction_failed', e, path=self.path)
+
+    def close(self):
+        """Flush pending changes and fold the journal (runs at exit)"""
+        self.compact()
+        self.flush()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Trending clips: engagement decayed by clip age, kept ranked as it changes.
+
+A clip's trending score is ``(1 + W_VIEW*views + W_LIKE*likes)`` halved every
+``half_life`` hours since its upload. Ranking uses the logarithm::
+
+    log(1 + W_VIEW*views + W_LIKE*likes) + uploaded_at / tau
+
+Decay multiplies every score by the same factor as time passes, so this key
+never changes on its own: the order only moves when a clip gets a view or a
+like, and nothing has to be re-decayed in the background. The reported score
+is decayed to "now" only for the clips a query returns.
+
+Keys are kept in sorted lists (``bisect``) for the whole feed and for each
+club and each clip type, maintained by a ClipStore listener: a view or a like
+moves one key per list, and a top-N query is a slice.
+"""
+import bisect
+import math
+import threading
+import time
+from datetime import datetime
+
+W_VIEW = 1.0
+W_LIKE = 5.0
+HALF_LIFE_HOURS = 72
+
+# Scope of the list covering every clip
+_ALL = ('all', None)
+
+
+def uploaded_at(clip, field='upload_date'):
+    """Upload time as a Unix timestamp (0 if missing or unreadable)"""
+    value = clip.get(field)
+    if not value:
+        return 0.0
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return 0.0
+    return parsed.timestamp()
+
+
+def _count(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return 0
+    return max(value, 0)
+
+
+class ClipTrending:
+    """Time-decayed trending feed, overall and per club and clip type"""
+
+    def __init__(self, store, half_life_hours=HALF_LIFE_HOURS, club_field='club', type_field=None,
+                 date_field='upload_date'):
+        self.store = store
+        self.tau = half_life_hours * 3600 / math.log(2)
+        self.fields = {'club': club_field, 'type': type_field or store.category_field, 'date': date_field}
+        self._lock = threading.RLock()
+        self._lists = {}    # scope -> sorted [(-log score, str(id), id)]
+        self._entries = {}  # clip id -> (key, scopes)
+        self._loaded = False
+        store.add_listener(self._on_change)
+
+    # ---- bookkeeping ---------------------------------------------------
+
+    def log_score(self, clip):
+        engagement = 1 + W_VIEW * _count(clip.get('views', 0)) + W_LIKE * _count(clip.get('likes', 0))
+        return math.log(engagement) + uploaded_at(clip, self.fields['date']) / self.tau
+
+    def _scopes(self, clip):
+        return (_ALL,
+                ('club', clip.get(self.fields['club']) or 'unknown'),
+                ('type', clip.get(self.fields['type']) or 'unknown'))
+
+    def _index(self, clip):
+        clip_id = clip.get('id')
+        if clip_id is None:
+            return
+        key = (-self.log_score(clip), str(clip_id), clip_id)
+        scopes = self._scopes(clip)
+        for scope in scopes:
+            bisect.insort(self._lists.setdefault(scope, []), key)
+        self._entries[clip_id] = (key, scopes)
+
+    def _unindex(self, clip_id):
+        entry = self._entries.pop(clip_id, None)
+        if entry is None:
+            return
+        key, scopes = entry
+        for scope in scopes:
+            keys = self._lists[scope]
+            i = bisect.bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+            if not keys:
+                del self._lists[scope]
+
+    def _rebuild(self, clips):
+        self._lists, self._entries = {}, {}
+        keyed = {}
+        for clip in clips:
+            clip_id = clip.get('id')
+            if clip_id is None:
+                continue
+            key = (-self.log_score(clip), str(clip_id), clip_id)
+            scopes = self._scopes(clip)
+            for scope in scopes:
+                keyed.setdefault(scope, []).append(key)
+            self._entries[clip_id] = (key, scopes)
+        self._lists = {scope: sorted(keys) for scope, keys in keyed.items()}
+
+    def _on_change(self, event, clip, changes):
+        with self._lock:
+            if event == 'reload':
+                self._rebuild(self.store.all())
+                self._loaded = True
+            elif not self._loaded:
+                return
+            elif event == 'remove':
+                self._unindex(clip.get('id'))
+            else:
+                # add, increment and any edit: re-key the one clip
+                self._unindex(clip.get('id'))
+                self._index(clip)
+
+    def _ensure_loaded(self):
+        # The first store read triggers the 'reload' that fills the lists
+        if not self._loaded:
+            self.store.count()
+
+    # ---- queries -------------------------------------------------------
+
+    def top(self, limit=20, offset=0, club=None, clip_type=None, now=None):
+        """``(total, [(clip, score now)])`` for the whole feed or one club or type"""
+        if club is not None and clip_type is not None:
+            raise ValueError('Filter by club or by type, not both')
+        self._ensure_loaded()
+        scope = ('club', club) if club is not None else ('type', clip_type) if clip_type is not None else _ALL
+        now = time.time() if now is None else now
+        with self._lock:
+            keys = self._lists.get(scope, [])
+            total = len(keys)
+            page = keys[offset:offset + limit]
+
+        feed = []
+        for neg_log, _, clip_id in page:
+            clip = self.store.get(clip_id)
+            if clip is not None:
+                feed.append((clip, math.exp(-neg_log - now / self.tau)))
+        return total, feed
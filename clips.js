@@ -3,6 +3,8 @@ let currentPage = 1;
 let currentFilter = 'all';
 let isLoading = false;
 let statsInterval;
+let eventSource = null;
+let currentStats = null;
 let lastStatsUpdate = 0;
 let isServerAvailable = false;
 let teamsData = []; // Equipos dinámicos del backend
@@ -824,6 +826,7 @@ async function loadStats() {
 
 // Función para actualizar estadísticas desde el servidor
 function updateStatsFromServer(stats) {
+    currentStats = { ...stats };
     const statNumbers = document.querySelectorAll('.stat-number');
     if (statNumbers.length >= 3) {
         updateStatWithAnimation(statNumbers[0], stats.total_clips);
@@ -953,11 +956,57 @@ function updateStatWithAnimation(element, newValue) {
     }
 }
 
-function startRealTimeUpdates() {
+// Aplicar un cambio de contador recibido por el canal de eventos
+function applyCounterEvent(data) {
+    if (data.field === 'views') {
+        updateClipViews(data.id, data.value);
+    } else if (data.field === 'likes') {
+        updateClipLikes(data.id, data.value);
+    }
+    
+    const key = data.field === 'views' ? 'total_views' : data.field === 'likes' ? 'total_likes' : null;
+    const statNumbers = document.querySelectorAll('.stat-number');
+    if (key && currentStats && statNumbers.length >= 3) {
+        currentStats[key] += data.delta;
+        updateStatWithAnimation(statNumbers[key === 'total_views' ? 1 : 2], currentStats[key]);
+        lastStatsUpdate = Date.now();
+    }
+}
+
+// Canal de eventos del servidor (SSE); si no existe, se vuelve al sondeo
+function startEventStream() {
+    eventSource = new EventSource('/api/events?topics=clips,counters');
+    
+    eventSource.addEventListener('counters', (e) => applyCounterEvent(JSON.parse(e.data)));
+    
+    // Clips nuevos/eliminados o un reinicio del canal: recargar totales
+    ['clips', 'reset'].forEach(type => {
+        eventSource.addEventListener(type, () => loadStats());
+    });
+    
+    eventSource.onerror = () => {
+        if (eventSource && eventSource.readyState === EventSource.CLOSED) {
+            console.log('📡 Canal de eventos no disponible, usando actualización periódica');
+            eventSource = null;
+            startStatsPolling();
+        }
+    };
+}
+
+function startStatsPolling() {
+    if (statsInterval) return;
     // Update stats every 1.5 seconds para mayor responsividad
     statsInterval = setInterval(async () => {
         await loadStats();
     }, 1500);
+}
+
+function startRealTimeUpdates() {
+    if (window.EventSource) {
+        startEventStream();
+    } else {
+        startStatsPolling();
+    }
     
     // También actualizar cuando la página se vuelve visible
     document.addEventListener('visibilitychange', () => {
@@ -992,6 +1041,10 @@ function stopRealTimeUpdates() {
         clearInterval(statsInterval);
         statsInterval = null;
     }
+    if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+    }
 }
 
 function formatNumber(num) {
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Append-only journal of clip counter increments.
+
+Each view or like is one small line ``["<clip id>", "<counter>", <delta>]``
+appended with ``O_APPEND`` instead of a rewrite of the whole clips file. The
+ClipStore folds the journal into the clip records when it loads, and its
+compactor periodically writes a fresh snapshot and empties the journal.
+
+Compaction is made crash-safe with a marker file: before the snapshot is
+written the marker records how many journal bytes it folds and the data file
+mtime at that moment. If the process dies before the journal is trimmed, the
+next load sees the marker and skips those bytes only when the data file has
+actually been rewritten since, so no increment is lost or counted twice.
+
+Several processes may append to one journal: appends and trims hold a
+cross-process FileLock, and an appender whose descriptor points at a journal
+replaced by another process's trim reopens it first.
+
+A journal left ending in a torn line (no trailing newline) gets the newline
+with the first append after opening it, so the torn fragment stays a line of
+its own that replay skips instead of merging with the new increment.
+"""
+import json
+import os
+import threading
+
+from storage import FileLock
+
+
+class CounterJournal:
+    """Durable append-only (clip id, counter, delta) log"""
+
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.marker_path = path + '.compact'
+        self.fsync = fsync
+        self._file_lock = FileLock(path + '.lock')
+        self._lock = threading.Lock()
+        self._fd = None
+        self._torn = False
+        self._unsynced = False
+
+    def _open(self):
+        if self._fd is not None:
+            try:
+                current = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                current = None
+            if current != os.fstat(self._fd).st_ino:
+                # Another process trimmed (replaced) the journal
+                os.close(self._fd)
+                self._fd = None
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            size = os.fstat(self._fd).st_size
+            self._torn = size > 0 and os.pread(self._fd, 1, size - 1) != b'\n'
+        return self._fd
+
+    def append(self, clip_id, counter, delta=1):
+        """Record one increment and return the number of bytes appended"""
+        line = (json.dumps([clip_id, counter, delta], ensure_ascii=False) + '\n').encode('utf-8')
+        with self._file_lock, self._lock:
+            fd = self._open()
+            if self._torn:
+                # Close the torn line left by a crash before appending
+                line = b'\n' + line
+                self._torn = False
+            os.write(fd, line)
+            if self.fsync:
+                os.fsync(fd)
+            else:
+                self._unsynced = True
+        return len(line)
+
+    def sync(self):
+        """fsync appends made since the last sync (used when fsync=False)"""
+        with self._lock:
+            if self._fd is not None and self._unsynced:
+                os.fsync(self._fd)
+                self._unsynced = False
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _read_entries(self):
+        """Return ``(entries, nbytes)`` for the journal as it is now"""
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return [], 0
+
+        entries = []
+        for line in raw.split(b'\n'):
+            if not line:
+                continue
+            try:
+                clip_id, counter, delta = json.loads(line)
+            except (ValueError, TypeError):
+                # Torn trailing write from a crash; everything before it is intact
+                continue
+            entries.append((clip_id, counter, delta))
+        return entries, len(raw)
+
+    def _read_marker(self):
+        try:
+            with open(self.marker_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def replay(self, data_mtime):
+        """Return ``(increments, nbytes)`` not yet folded into the data file at ``data_mtime``.
+
+        ``nbytes`` is the journal length those increments cover.
+        """
+        with self._file_lock:
+            marker = self._read_marker()
+            if marker is not None:
+                if data_mtime != marker.get('data_mtime'):
+                    # The snapshot was rewritten after the marker, so it
+                    # already contains the first ``bytes`` of the journal
+                    self._trim(marker['bytes'])
+                # Otherwise the snapshot never landed; the whole journal applies
+                self._remove_marker()
+            return self._read_entries()
+
+    # ---- compaction ----------------------------------------------------
+
+    def begin_compaction(self, data_mtime, nbytes):
+        """Persist the marker for a snapshot about to fold the first ``nbytes`` of the journal"""
+        self.sync()
+        marker = {'bytes': nbytes, 'data_mtime': data_mtime}
+        tmp = self.marker_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(marker, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.marker_path)
+        return marker
+
+    def end_compaction(self, marker):
+        """Drop the folded prefix once the snapshot is safely on disk"""
+        self._trim(marker['bytes'])
+        self._remove_marker()
+
+    def abort_compaction(self):
+        self._remove_marker()
+
+    def _trim(self, nbytes):
+        with self._file_lock, self._lock:
+            if self.size() <= nbytes:
+                with open(self.path, 'wb'):
+                    pass
+            else:
+                with open(self.path, 'rb') as f:
+                    f.seek(nbytes)
+                    tail = f.read()
+                tmp = self.path + '.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            # The old descriptor may point at a replaced inode
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._unsynced = False
+
+    def _remove_marker(self):
+        try:
+            os.remove(self.marker_path)
+        except FileNotFoundError:
+            pass
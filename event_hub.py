@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""In-process pub/sub hub behind the ``/api/events`` Server-Sent Events stream.
+
+Every published event is serialized once into an SSE frame and appended to
+its topic's ring buffer. Subscribers hold nothing but a cursor (the sequence
+number of the next event they need), so no events are buffered per
+connection and publishing is O(1) however many tabs are open.
+
+Each open stream does occupy a request worker for as long as it stays
+connected: a thread under the threaded Flask server or gunicorn's
+``gthread`` workers, a whole process under sync workers. Idle viewers are
+only cheap on cooperative workers (``gunicorn -k gevent``, where the
+Condition below waits in a greenlet). ``max_subscribers`` (default
+``LPCP_SSE_MAX_SUBSCRIBERS`` or 64) must therefore stay below the worker
+threads or greenlets available, leaving room for ordinary requests; streams
+beyond it get a 503 with ``Retry-After`` and EventSource retries later.
+
+* Topics - a stream asks for ``?topics=clips,counters``; the rest are skipped.
+* Resume - ids are ``<epoch>-<seq>``, so a client that reconnects with
+  ``Last-Event-ID`` continues right after the last event it saw.
+* Backpressure - a subscriber that falls so far behind that its ring has
+  overwritten unsent events (or that resumes from another server run) gets a
+  ``reset`` event and should refetch its state; nothing is ever buffered
+  per connection.
+* Heartbeat - a comment line every ``heartbeat`` seconds keeps proxies from
+  closing idle streams and lets dead connections fail on write.
+
+Events are only delivered to viewers connected to the same process.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from flask import Response
+
+TOPICS = ('clips', 'counters', 'matches', 'standings', 'settings')
+
+MAX_SUBSCRIBERS = int(os.environ.get('LPCP_SSE_MAX_SUBSCRIBERS', 64))
+
+
+class _Topic:
+    __slots__ = ('events', 'evicted')
+
+    def __init__(self, history):
+        self.events = deque(maxlen=history)
+        # Sequence number of the newest event pushed out of the ring
+        self.evicted = -1
+
+
+class EventHub:
+    """Topic ring buffers shared by every SSE subscriber"""
+
+    def __init__(self, topics=TOPICS, history=512, heartbeat=15.0, retry_ms=3000, max_subscribers=MAX_SUBSCRIBERS):
+        self.history = history
+        self.heartbeat = heartbeat
+        self.retry_ms = retry_ms
+        self.max_subscribers = max_subscribers
+        self._topics = {name: _Topic(history) for name in topics}
+        self._cond = threading.Condition()
+        self._next = 0
+        # Ids from an earlier run must not resume into this one
+        self._epoch = os.urandom(4).hex()
+        self.subscribers = 0
+
+    def publish(self, topic, data):
+        """Append one event to ``topic`` and wake the subscribers"""
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        with self._cond:
+            seq = self._next
+            self._next += 1
+            ring = self._topics[topic]
+            if len(ring.events) == ring.events.maxlen:
+                ring.evicted = ring.events[0][0]
+            ring.events.append((seq, f"id: {self._epoch}-{seq}\nevent: {topic}\ndata: {payload}\n\n"))
+            self._cond.notify_all()
+        return seq
+
+    def _resume_point(self, last_event_id):
+        """Cursor for a (re)connecting client, or None if it must reset"""
+        if not last_event_id:
+            return self._next
+        epoch, _, seq = last_event_id.partition('-')
+        try:
+            cursor = int(seq) + 1
+        except ValueError:
+            return None
+        if epoch != self._epoch or cursor > self._next:
+            return None
+        return cursor
+
+    def _collect(self, cursor, topics):
+        """Frames at or after ``cursor``, or None if some were overwritten"""
+        frames = []
+        for name in topics:
+            ring = self._topics[name]
+            if ring.evicted >= cursor:
+                return None
+            for seq, frame in reversed(ring.events):
+                if seq < cursor:
+                    break
+                frames.append((seq, frame))
+        frames.sort()
+        return [frame for _, frame in frames]
+
+    def _reset_frame(self):
+        return f"id: {self._epoch}-{self._next - 1}\nevent: reset\ndata: {{}}\n\n"
+
+    def _reserve(self):
+        """Take a subscriber slot; False when all are in use"""
+        with self._cond:
+            if self.subscribers >= self.max_subscribers:
+                return False
+            self.subscribers += 1
+            return True
+
+    def _release(self):
+        with self._cond:
+            self.subscribers -= 1
+
+    def stream(self, topics=None, last_event_id=None):
+        """Generator of SSE frames for one subscriber"""
+        topics = list(topics or self._topics)
+        with self._cond:
+            cursor = self._resume_point(last_event_id)
+        yield f"retry: {self.retry_ms}\n\n"
+        last_write = time.monotonic()
+        while True:
+            with self._cond:
+                if cursor is None:
+                    frames = None
+                else:
+                    if cursor == self._next:
+                        self._cond.wait(max(self.heartbeat - (time.monotonic() - last_write), 0.01))
+                    frames = self._collect(cursor, topics)
+                if frames is None:
+                    frames = [self._reset_frame()]
+                cursor = self._next
+
+            if frames:
+                yield ''.join(frames)
+                last_write = time.monotonic()
+            elif time.monotonic() - last_write >= self.heartbeat:
+                yield ": ping\n\n"
+                last_write = time.monotonic()
+
+    def response(self, topics=None, last_event_id=None):
+        """Flask streaming response; raises ValueError on an unknown topic"""
+        if isinstance(topics, str):
+            topics = [t.strip() for t in topics.split(',') if t.strip()]
+        unknown = [t for t in topics or () if t not in self._topics]
+        if unknown:
+            raise ValueError(f"Unknown topic: {', '.join(unknown)}")
+        # Checked and counted under one lock; the slot is freed when the
+        # response closes, whether or not the stream ever started
+        if not self._reserve():
+            response = Response('Too many event subscribers', status=503)
+            response.headers['Retry-After'] = '30'
+            return response
+        response = Response(self.stream(topics, last_event_id), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        })
+        response.call_on_close(self._release)
+        return response
+
+
+def clip_listener(hub):
+    """ClipStore listener publishing clip and counter changes to ``hub``"""
+    def listener(event, clip, changes):
+        if event == 'increment':
+            field, delta = next(iter(changes.items()))
+            hub.publish('counters', {'type': 'counter', 'id': clip['id'], 'field': field,
+                                     'delta': delta, 'value': clip.get(field, 0)})
+        elif event == 'add':
+            hub.publish('clips', {'type': 'clip_added', 'clip': clip})
+        elif event == 'update':
+            hub.publish('clips', {'type': 'clip_updated', 'id': clip['id'],
+                                  'changes': {k: new for k, (old, new) in changes.items()}})
+        elif event == 'remove':
+            hub.publish('clips', {'type': 'clip_removed', 'id': clip['id']})
+        else:
+            hub.publish('clips', {'type': 'reload'})
+    return listener
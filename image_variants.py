@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Resized, re-encoded variants of team logos and thumbnails.
+
+``/api/images/img/Coiner FC.jpg?w=64&format=webp&q=80`` serves the logo
+scaled down to the next width bucket (never up) and re-encoded. ``format``
+is ``webp``, ``jpeg``, ``png`` or ``auto`` (WebP when the browser lists it
+in ``Accept``, else JPEG, or PNG for images with transparency), and ``q``
+is rounded to a multiple of 5 (PNG is lossless and ignores it).
+
+* Variants are named by the SHA-256 of the source bytes plus the variant
+  parameters, so a replaced logo never serves a stale variant, and that name
+  is the ETag.
+* Each variant is rendered once, in a process pool (Pillow work stays off
+  the request threads and the GIL); concurrent requests for a variant being
+  rendered wait on the same job, and a render still running after
+  ``render_timeout`` seconds answers 503 while it carries on in the pool.
+* ``.static_cache/img`` is an LRU cache bounded by ``max_bytes``: hits move
+  a variant to the young end (and touch its mtime, which orders the cache
+  again after a restart) and the least recently used files are deleted.
+* Responses are ``immutable`` when the URL carries ``?v=`` and otherwise
+  cached for a day and revalidated by ETag.
+
+Pillow is optional: without it the original file is served unchanged.
+"""
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as RenderTimeout
+
+from flask import Response, abort, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+from metrics import log_error
+from static_files import IMMUTABLE
+
+WIDTHS = (32, 64, 96, 128, 256, 512, 1024)
+FORMATS = {'webp': ('WEBP', 'image/webp'), 'jpeg': ('JPEG', 'image/jpeg'), 'png': ('PNG', 'image/png')}
+DEFAULT_QUALITY = 80
+
+# Directories (relative to the root) whose images may be resized
+SOURCES = ('img', 'uploads/thumbnails')
+
+DAY = 'public, max-age=86400'
+
+
+def width_bucket(width):
+    """Smallest bucket at least ``width`` wide (the largest one past it)"""
+    for bucket in WIDTHS:
+        if bucket >= width:
+            return bucket
+    return WIDTHS[-1]
+
+
+def render_variant(source, target, width, fmt, quality):
+    """Write ``source`` scaled to at most ``width`` px wide as ``fmt`` to ``target`` (runs in a worker)"""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        pil_format = FORMATS[fmt][0]
+        if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            background = Image.new('RGB', image.size, 'white')
+            rgba = image.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            image = background
+        elif pil_format != 'JPEG' and image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA')
+        options = {'optimize': True}
+        if pil_format in ('JPEG', 'WEBP'):
+            options['quality'] = quality
+        if pil_format == 'JPEG':
+            options['progressive'] = True
+        tmp = f"{target}.{os.getpid()}.tmp"
+        image.save(tmp, pil_format, **options)
+    os.replace(tmp, target)
+    return os.path.getsize(target)
+
+
+def _has_alpha(path):
+    with Image.open(path) as image:
+        return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+class ImageVariants:
+    """On-demand image variants in a size-bounded LRU disk cache"""
+
+    def __init__(self, root='.', cache_dir='.static_cache/img', max_bytes=64 * 1024 * 1024, max_workers=2,
+                 static_files=None, render_timeout=30):
+        self.root = os.path.abspath(root)
+        self.static_files = static_files  # serves the originals when Pillow is missing
+        self.cache_dir = os.path.join(self.root, cache_dir)
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.render_timeout = render_timeout
+        # Reentrant: a render that is already done runs its callback at once
+        self._lock = threading.RLock()
+        self._pool = None
+        self._sources = {}   # path -> ((mtime_ns, size), digest, has alpha)
+        self._cache = None   # variant name -> size, least recently used first
+        self._size = 0
+        self._rendering = {}  # variant name -> future, until the render finishes
+
+    # ---- cache bookkeeping ---------------------------------------------
+
+    def _load_cache(self):
+        if self._cache is not None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                st = entry.stat()
+                files.append((st.st_mtime_ns, entry.name, st.st_size))
+        self._cache = OrderedDict((name, size) for _, name, size in sorted(files))
+        self._size = sum(self._cache.values())
+
+    def _touch(self, name):
+        self._cache.move_to_end(name)
+        try:
+            os.utime(os.path.join(self.cache_dir, name))
+        except OSError:
+            self._size -= self._cache.pop(name)
+
+    def _add(self, name, size):
+        self._cache[name] = size
+        self._size += size
+        while self._size > self.max_bytes and len(self._cache) > 1:
+            old, old_size = self._cache.popitem(last=False)
+            self._size -= old_size
+            try:
+                os.remove(os.path.join(self.cache_dir, old))
+            except OSError:
+                pass
+
+    def _rendered(self, name, future):
+        """Done callback: retire the job and account for the new file"""
+        with self._lock:
+            self._rendering.pop(name, None)
+            if not future.cancelled() and future.exception() is None and name not in self._cache:
+                self._add(name, future.result())
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _source(self, path):
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._sources.get(path)
+        if cached is None or cached[0] != stamp:
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:32]
+            cached = self._sources[path] = (stamp, digest, _has_alpha(path))
+        return cached[1], cached[2]
+
+    # ---- public API ----------------------------------------------------
+
+    def variant(self, path, width, fmt, quality, accept_webp=False):
+        """``(path, format, name)`` of the cached variant, rendering it first if needed.
+
+        Raises RenderTimeout if the render outlasts ``render_timeout``.
+        """
+        digest, alpha = self._source(path)
+        if fmt == 'auto':
+            fmt = 'webp' if accept_webp else 'png' if alpha else 'jpeg'
+        # PNG is lossless: the quality would only split identical variants
+        name = f"{digest}-w{width}.png" if fmt == 'png' else f"{digest}-w{width}-q{quality}.{fmt}"
+        target = os.path.join(self.cache_dir, name)
+
+        with self._lock:
+            self._load_cache()
+            if name in self._cache and os.path.exists(target):
+                self._touch(name)
+                return target, fmt, name
+            future = self._rendering.get(name)
+            if future is None:
+                future = self._executor().submit(render_variant, path, target, width, fmt, quality)
+                self._rendering[name] = future
+                future.add_done_callback(lambda f: self._rendered(name, f))
+
+        future.result(timeout=self.render_timeout)
+        return target, fmt, name
+
+    def send(self, filename):
+        """Response for ``/api/images/<filename>`` (?w=, ?format=, ?q=, ?v=)"""
+        if not any(filename.startswith(prefix + '/') for prefix in SOURCES):
+            abort(404)
+        path = safe_join(self.root, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        try:
+            width = width_bucket(int(request.args.get('w', WIDTHS[-1])))
+            quality = min(max(round(int(request.args.get('q', DEFAULT_QUALITY)) / 5) * 5, 30), 95)
+        except ValueError:
+            abort(400)
+        fmt = request.args.get('format', 'auto').lower().replace('jpg', 'jpeg')
+        auto = fmt == 'auto'
+        if not auto and fmt not in FORMATS:
+            abort(400)
+        cache_control = IMMUTABLE if 'v' in request.args else DAY
+
+        if Image is None:
+            if self.static_files is not None:
+                return self.static_files.send(self.root, filename, cache_control)
+            response = send_file(path, mimetype=mimetypes.guess_type(path)[0], conditional=True)
+            response.headers['Cache-Control'] = cache_control
+            return response
+
+        accept_webp = 'image/webp' in request.headers.get('Accept', '')
+        for _ in range(2):
+            try:
+                target, variant_fmt, etag = self.variant(path, width, fmt, quality, accept_webp=accept_webp)
+            except RenderTimeout:
+                # Checked first: TimeoutError is an OSError on Python 3.11+
+                return self._retry_later()
+            except (OSError, ValueError) as e:
+                # Not an image Pillow can read
+                log_error('image_variant_failed', e, filename=filename)
+                abort(415)
+            # Opened under the lock, which eviction holds while deleting files;
+            # a variant evicted since variant() returned is rendered once more
+            with self._lock:
+                try:
+                    response = send_file(target, mimetype=FORMATS[variant_fmt][1], conditional=True, etag=etag,
+                                         max_age=None)
+                    break
+                except FileNotFoundError:
+                    continue
+        else:
+            return self._retry_later()
+        response.headers['Cache-Control'] = cache_control
+        if auto:
+            response.vary.add('Accept')
+        return response
+
+    @staticmethod
+    def _retry_later():
+        response = Response('Image is still being rendered, retry shortly', status=503)
+        response.headers['Retry-After'] = '5'
+        return response
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        # Outside the lock: the pending renders' callbacks need it
+        if pool is not None:
+            pool.shutdown(wait=True)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Validation and planning for ``POST /api/matches/batch``.
+
+A batch is a list of operations::
+
+    {"op": "create", "match": {...}}
+    {"op": "update", "id": 1754000000000, "match": {...changed fields...}}
+    {"op": "delete", "id": 1754000000000}
+
+``plan_batch`` checks every operation against the current matches (and the
+effect of the operations before it) and returns the ``(old, new)`` changes
+to commit in one write, plus one result per operation. If any operation is
+invalid nothing is planned: the batch is all-or-nothing.
+"""
+from datetime import datetime
+
+STATUSES = ('scheduled', 'live', 'finished')
+MAX_OPERATIONS = 1000
+
+
+def _is_blank(value):
+    return value is None or value == ''
+
+
+def _int_at_least(value, minimum):
+    if isinstance(value, bool):
+        return False
+    try:
+        return int(value) >= minimum and float(value) == int(value)
+    except (TypeError, ValueError):
+        return False
+
+
+def validate_match(match):
+    """Return the list of problems with a complete match record"""
+    errors = []
+    home, away = match.get('homeTeam'), match.get('awayTeam')
+    for field, team in (('homeTeam', home), ('awayTeam', away)):
+        if not isinstance(team, str) or not team.strip():
+            errors.append(f"{field} is required")
+    if isinstance(home, str) and home and home == away:
+        errors.append('homeTeam and awayTeam must be different')
+
+    if not _is_blank(match.get('matchday')) and not _int_at_least(match.get('matchday'), 1):
+        errors.append('matchday must be a positive integer')
+
+    status = match.get('status')
+    if not _is_blank(status) and status not in STATUSES:
+        errors.append(f"status must be one of {', '.join(STATUSES)}")
+
+    for field in ('homeScore', 'awayScore'):
+        value = match.get(field)
+        if not _is_blank(value) and not _int_at_least(value, 0):
+            errors.append(f"{field} must be a non-negative integer")
+        elif status == 'finished' and _is_blank(value):
+            errors.append(f"{field} is required for a finished match")
+
+    scorers = match.get('scorers')
+    if scorers is not None and (not isinstance(scorers, list) or not all(isinstance(e, dict) for e in scorers)):
+        errors.append('scorers must be a list of objects')
+
+    for field, fmt, example in (('date', '%Y-%m-%d', 'YYYY-MM-DD'), ('time', '%H:%M', 'HH:MM')):
+        value = match.get(field)
+        if _is_blank(value):
+            continue
+        try:
+            datetime.strptime(str(value)[:len(example)], fmt)
+        except ValueError:
+            errors.append(f"{field} must be {example}")
+    return errors
+
+
+def _match_id(value):
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    if isinstance(value, int):
+        return value
+    raise ValueError
+
+
+def plan_batch(operations, index):
+    """Return ``(changes, results)``; ``changes`` is None if any operation is invalid.
+
+    ``index`` is the MatchIndex (used for lookups and ``new_id``); call this
+    while holding the matches lock.
+    """
+    changes = []
+    results = []
+    working = {}  # id -> match as of the operations so far (None once deleted)
+
+    def lookup(match_id):
+        if match_id in working:
+            return working[match_id]
+        return index.get(match_id)
+
+    for i, operation in enumerate(operations):
+        op = operation.get('op') if isinstance(operation, dict) else None
+        result = {'index': i, 'op': op}
+        results.append(result)
+        errors = []
+
+        if op not in ('create', 'update', 'delete'):
+            errors.append("op must be 'create', 'update' or 'delete'")
+        elif op == 'create':
+            fields = operation.get('match')
+            if not isinstance(fields, dict):
+                errors.append('match must be an object')
+            else:
+                errors = validate_match(fields)
+                if not errors:
+                    new = dict(fields, id=index.new_id())
+                    working[new['id']] = new
+                    changes.append((None, new))
+                    result.update(status='created', id=new['id'], match=new)
+        else:
+            try:
+                match_id = _match_id(operation.get('id'))
+            except ValueError:
+                match_id = None
+                errors.append('id must be an integer')
+            current = lookup(match_id) if match_id is not None else None
+            if match_id is not None and current is None:
+                errors.append('Match not found')
+            elif current is not None and op == 'update':
+                fields = operation.get('match')
+                if not isinstance(fields, dict):
+                    errors.append('match must be an object')
+                else:
+                    new = dict(current, **fields)
+                    new['id'] = match_id
+                    errors = validate_match(new)
+                    if not errors:
+                        working[match_id] = new
+                        changes.append((current, new))
+                        result.update(status='updated', id=match_id, match=new)
+            elif current is not None:
+                working[match_id] = None
+                changes.append((current, None))
+                result.update(status='deleted', id=match_id)
+
+        if errors:
+            result.update(status='error', errors=errors)
+
+    if any(r['status'] == 'error' for r in results):
+        for result in results:
+            if result['status'] != 'error':
+                result['status'] = 'not_applied'
+        return None, results
+    return changes, results
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""In-memory secondary indexes over the stored matches.
+
+``matches_data.json`` is loaded once into an insertion-ordered id -> match
+map (so the stored order is kept), plus sorted key lists per matchday,
+status and team, and kickoff-ordered lists per status. Every list is kept
+sorted on insert with ``bisect``, so:
+
+* ``get`` is O(1) and ``query`` returns a bucket already in
+  ``(matchday, date)`` order, without filtering unrelated records
+* ``for_team``, ``upcoming`` and ``results`` read one bucket, and the last
+  two bisect into it by kickoff time
+
+``commit`` persists one change (add, replace or delete) through the
+server's save function, or rewrites just the edited record through ``patch``
+on backends that can, and then updates only the buckets that match touched.
+Given ``version`` (the storage backend's version for the matches domain),
+edits made outside the server rebuild the indexes on next use.
+"""
+import bisect
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime
+
+# Statuses that count as not yet played
+PENDING = ('scheduled', 'live')
+
+# Key of the sorted list covering every match
+_ALL = object()
+
+
+def matchday_of(match):
+    try:
+        return int(match.get('matchday') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def sort_key(match):
+    """API order: matchday, then date (id breaks ties)"""
+    return (matchday_of(match), str(match.get('date') or ''), str(match.get('id')))
+
+
+def kickoff(match):
+    """Sortable 'YYYY-MM-DDTHH:MM' from the date and optional time fields"""
+    date = str(match.get('date') or '')
+    time = match.get('time')
+    return f"{date[:10]}T{time}" if time and len(date) <= 10 else date
+
+
+def status_of(match):
+    return match.get('status') or 'scheduled'
+
+
+def _insert(buckets, name, key):
+    bisect.insort(buckets.setdefault(name, []), key)
+
+
+def _discard(buckets, name, key):
+    keys = buckets.get(name)
+    if not keys:
+        return
+    i = bisect.bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+    if not keys:
+        del buckets[name]
+
+
+class MatchIndex:
+    """Matches by id, matchday, status, team and kickoff"""
+
+    def __init__(self, load, version=None):
+        self._load_fn = load
+        self._version_fn = version
+        self._seen_version = None
+        self._lock = threading.RLock()
+        self._by_id = None
+        self._by_matchday = {}
+        self._by_status = {}
+        self._by_team = {}
+        self._by_kickoff = {}
+        self._ordered = {}
+        self._last_id = 0
+
+    # ---- bookkeeping ---------------------------------------------------
+
+    def _current_version(self):
+        return self._version_fn() if self._version_fn is not None else None
+
+    def _ensure_loaded(self):
+        if self._by_id is not None and self._version_fn is not None:
+            if self._current_version() != self._seen_version:
+                self._by_id = None
+        if self._by_id is None:
+            self._seen_version = self._current_version()
+            self._rebuild(self._load_fn())
+
+    def _rebuild(self, matches):
+        self._by_id = {}
+        self._by_matchday, self._by_status, self._by_team, self._by_kickoff = {}, {}, {}, {}
+        self._ordered = {}
+        for match in matches:
+            if 'id' in match:
+                self._index(match)
+
+    def _entries(self, match):
+        # The trailing id resolves a key back to its match
+        key = sort_key(match) + (match['id'],)
+        status = status_of(match)
+        yield self._ordered, _ALL, key
+        yield self._by_matchday, matchday_of(match), key
+        yield self._by_status, status, key
+        for team in {match.get('homeTeam'), match.get('awayTeam')} - {None, ''}:
+            yield self._by_team, team, key
+        yield self._by_kickoff, status, (kickoff(match), key)
+
+    def _index(self, match):
+        self._by_id[match['id']] = match
+        if isinstance(match['id'], int) and match['id'] > self._last_id:
+            self._last_id = match['id']
+        for buckets, name, key in self._entries(match):
+            _insert(buckets, name, key)
+
+    def _unindex(self, match):
+        for buckets, name, key in self._entries(match):
+            _discard(buckets, name, key)
+
+    def _resolve(self, keys):
+        return [self._by_id[key[-1]] for key in keys]
+
+    # ---- reads ---------------------------------------------------------
+
+    def all(self):
+        """Every match in stored order"""
+        with self._lock:
+            self._ensure_loaded()
+            return list(self._by_id.values())
+
+    def get(self, match_id):
+        with self._lock:
+            self._ensure_loaded()
+            return self._by_id.get(match_id)
+
+    def query(self, matchday=None, status=None):
+        """Matches filtered by matchday and/or status in (matchday, date) order"""
+        with self._lock:
+            self._ensure_loaded()
+            if matchday is not None:
+                keys = self._by_matchday.get(matchday, [])
+                if status is not None:
+                    keys = [k for k in keys if status_of(self._by_id[k[-1]]) == status]
+            elif status is not None:
+                keys = self._by_status.get(status, [])
+            else:
+                keys = self._ordered.get(_ALL, [])
+            return self._resolve(keys)
+
+    def matchdays(self):
+        """Every matchday that has at least one match, ascending"""
+        with self._lock:
+            self._ensure_loaded()
+            return sorted(self._by_matchday)
+
+    def for_team(self, team, status=None):
+        """Every match a team plays (home or away), in (matchday, date) order"""
+        with self._lock:
+            self._ensure_loaded()
+            matches = self._resolve(self._by_team.get(team, []))
+            if status is not None:
+                matches = [m for m in matches if status_of(m) == status]
+            return matches
+
+    def upcoming(self, limit=5, team=None, now=None):
+        """The next ``limit`` unplayed matches from ``now`` (ISO string) on"""
+        now = now or datetime.now().strftime('%Y-%m-%dT%H:%M')
+        with self._lock:
+            self._ensure_loaded()
+            if team is not None:
+                matches = [m for m in self._resolve(self._by_team.get(team, []))
+                           if status_of(m) in PENDING and kickoff(m) >= now]
+                matches.sort(key=lambda m: (kickoff(m), sort_key(m)))
+                return matches[:limit]
+            runs = []
+            for status in PENDING:
+                keys = self._by_kickoff.get(status, [])
+                runs.append(keys[bisect.bisect_left(keys, (now,)):])
+            return [self._by_id[key[-1]] for _, key in itertools.islice(heapq.merge(*runs), limit)]
+
+    def results(self, start=None, end=None, team=None):
+        """Finished matches with kickoff in [start, end] (ISO dates), oldest first"""
+        # 'YYYY-MM-DD' + '~' sorts after every time on that day
+        upper = end + '~' if end else None
+        with self._lock:
+            self._ensure_loaded()
+            if team is not None:
+                matches = [m for m in self._resolve(self._by_team.get(team, []))
+                           if status_of(m) == 'finished'
+                           and (not start or kickoff(m) >= start)
+                           and (not upper or kickoff(m) <= upper)]
+                matches.sort(key=lambda m: (kickoff(m), sort_key(m)))
+                return matches
+            keys = self._by_kickoff.get('finished', [])
+            lo = bisect.bisect_left(keys, (start,)) if start else 0
+            hi = bisect.bisect_right(keys, (upper,)) if upper else len(keys)
+            return [self._by_id[key[-1]] for _, key in keys[lo:hi]]
+
+    # ---- writes --------------------------------------------------------
+
+    def new_id(self):
+        """A fresh integer id: the current time in ms, bumped past every id in use.
+
+        Call it while holding the matches lock so concurrent workers see each
+        other's ids; successive calls never collide even within one millisecond.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            self._last_id = max(int(time.time() * 1000), self._last_id + 1)
+            return self._last_id
+
+    def commit(self, old, new, save, patch=None):
+        """Persist one change; see commit_many.
+
+        For an edit that keeps the id, ``patch(old, new)`` is tried first: it
+        writes only that record and returns True, False on failure, or None
+        to fall back to ``save``.
+        """
+        return self.commit_many([(old, new)], save, patch)
+
+    def commit_many(self, changes, save, patch=None):
+        """Persist a list of changes with one write and update the indexes they touch.
+
+        Each change is ``(old, new)``: the match before and after (None for an
+        add or a delete). ``save(matches)`` writes the full list and returns
+        False on failure, in which case nothing changes in memory.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            matches = dict(self._by_id)
+            for old, new in changes:
+                if old is not None and (new is None or new['id'] != old['id']):
+                    matches.pop(old['id'], None)
+                if new is not None:
+                    matches[new['id']] = new
+            written = None
+            if patch is not None and len(changes) == 1:
+                old, new = changes[0]
+                if old is not None and new is not None and old['id'] == new['id']:
+                    written = patch(old, new)
+            if written is None:
+                written = save(list(matches.values()))
+            if written is False:
+                return False
+
+            for old, new in changes:
+                if old is not None:
+                    current = self._by_id.get(old['id'])
+                    if current is not None:
+                        self._unindex(current)
+                        del self._by_id[old['id']]
+                if new is not None:
+                    current = self._by_id.get(new['id'])
+                    if current is not None:
+                        self._unindex(current)
+                    self._index(new)
+            self._by_id = matches
+            self._seen_version = self._current_version()
+            return True
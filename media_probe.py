@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""Off-request media probing for uploaded clips.
+
+Duration and resolution are read straight from container metadata, without
+decoding: the ``mvhd``/``tkhd`` boxes of MP4/MOV files and the Segment Info /
+Tracks elements of Matroska/WebM files. Poster thumbnails need one decoded
+frame, so they are produced with ``ffmpeg`` when it is installed and skipped
+otherwise.
+
+``MediaJobs`` runs the work in a process pool and writes the result back to
+the clip record (``processing_status`` goes pending -> ready/failed), so the
+upload request never waits on it. Existing clips can be processed with::
+
+    python media_probe.py backfill
+"""
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import log_error
+
+THUMBNAIL_WIDTH = 640
+
+
+# ---- MP4 / MOV (ISO base media) -----------------------------------------
+
+def _iter_boxes(f, start, end):
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            return
+        yield box_type, pos + header_size, pos + size
+        pos += size
+
+
+def _probe_mp4(f, file_size):
+    info = {'container': 'mp4'}
+    for box_type, start, end in _iter_boxes(f, 0, file_size):
+        if box_type != b'moov':
+            continue
+        for child, c_start, c_end in _iter_boxes(f, start, end):
+            if child == b'mvhd':
+                f.seek(c_start)
+                version = f.read(1)[0]
+                if version == 1:
+                    f.seek(c_start + 20)
+                    timescale, duration = struct.unpack('>IQ', f.read(12))
+                else:
+                    f.seek(c_start + 12)
+                    timescale, duration = struct.unpack('>II', f.read(8))
+                if timescale:
+                    info['duration_seconds'] = duration / timescale
+            elif child == b'trak' and 'width' not in info:
+                for sub, s_start, s_end in _iter_boxes(f, c_start, c_end):
+                    if sub == b'tkhd' and s_end - s_start >= 84:
+                        # Width and height are the last two 16.16 fixed-point fields
+                        f.seek(s_end - 8)
+                        width, height = struct.unpack('>II', f.read(8))
+                        if width and height:
+                            info['width'] = width >> 16
+                            info['height'] = height >> 16
+        break
+    return info
+
+
+# ---- Matroska / WebM (EBML) ---------------------------------------------
+
+EBML_HEADER = 0x1A45DFA3
+MKV_SEGMENT = 0x18538067
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_CLUSTER = 0x1F43B675
+
+
+def _read_vint(f, keep_marker):
+    first = f.read(1)
+    if not first:
+        return None, 0
+    first = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        return None, 0
+    value = first if keep_marker else first & (mask - 1)
+    rest = f.read(length - 1)
+    for byte in rest:
+        value = (value << 8) | byte
+    unknown = not keep_marker and value == (1 << (7 * length)) - 1
+    return (None if unknown else value), length
+
+
+def _iter_elements(f, start, end):
+    pos = start
+    while pos < end:
+        f.seek(pos)
+        element_id, id_len = _read_vint(f, keep_marker=True)
+        if element_id is None:
+            return
+        size, size_len = _read_vint(f, keep_marker=False)
+        if not size_len:
+            return
+        data_start = pos + id_len + size_len
+        data_end = end if size is None else data_start + size
+        yield element_id, data_start, data_end
+        pos = data_end
+
+
+def _read_uint(f, start, end):
+    f.seek(start)
+    return int.from_bytes(f.read(end - start), 'big')
+
+
+def _read_float(f, start, end):
+    f.seek(start)
+    raw = f.read(end - start)
+    return struct.unpack('>f' if len(raw) == 4 else '>d', raw)[0]
+
+
+def _probe_mkv(f, file_size):
+    info = {'container': 'matroska'}
+    for element_id, start, end in _iter_elements(f, 0, file_size):
+        if element_id == EBML_HEADER:
+            continue
+        if element_id != MKV_SEGMENT:
+            break
+        timecode_scale = 1000000
+        duration = None
+        for child, c_start, c_end in _iter_elements(f, start, min(end, file_size)):
+            if child == MKV_INFO:
+                for sub, s_start, s_end in _iter_elements(f, c_start, c_end):
+                    if sub == MKV_TIMECODE_SCALE:
+                        timecode_scale = _read_uint(f, s_start, s_end)
+                    elif sub == MKV_DURATION:
+                        duration = _read_float(f, s_start, s_end)
+            elif child == MKV_TRACKS:
+                for entry, e_start, e_end in _iter_elements(f, c_start, c_end):
+                    if entry != MKV_TRACK_ENTRY or 'width' in info:
+                        continue
+                    for sub, s_start, s_end in _iter_elements(f, e_start, e_end):
+                        if sub != MKV_VIDEO:
+                            continue
+                        for field, v_start, v_end in _iter_elements(f, s_start, s_end):
+                            if field == MKV_PIXEL_WIDTH:
+                                info['width'] = _read_uint(f, v_start, v_end)
+                            elif field == MKV_PIXEL_HEIGHT:
+                                info['height'] = _read_uint(f, v_start, v_end)
+            elif child == MKV_CLUSTER:
+                # Media data starts here; headers are done
+                break
+        if duration is not None:
+            info['duration_seconds'] = duration * timecode_scale / 1e9
+        break
+    return info
+
+
+def probe(path):
+    """Read duration/resolution from container headers without decoding"""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        head = f.read(12)
+        if head[:4] == b'\x1a\x45\xdf\xa3':
+            return _probe_mkv(f, file_size)
+        if head[4:8] in (b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip'):
+            return _probe_mp4(f, file_size)
+    return {'container': 'unknown'}
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def make_thumbnail(video_path, thumbnail_path, at_seconds=1.0):
+    """Grab one poster frame with ffmpeg; returns False when unavailable"""
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        return False
+    result = subprocess.run(
+        [ffmpeg, '-v', 'error', '-y', '-ss', f"{at_seconds:.2f}", '-i', video_path,
+         '-frames:v', '1', '-vf', f"scale={THUMBNAIL_WIDTH}:-2", thumbnail_path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60)
+    return result.returncode == 0 and os.path.exists(thumbnail_path)
+
+
+def process_media(video_path, thumbnail_path):
+    """Worker entry point: probe the file and render its poster"""
+    info = probe(video_path)
+    fields = {}
+    if 'duration_seconds' in info:
+        fields['duration'] = format_duration(info['duration_seconds'])
+        fields['duration_seconds'] = round(info['duration_seconds'], 3)
+    if 'width' in info and 'height' in info:
+        fields['width'] = info['width']
+        fields['height'] = info['height']
+
+    at = min(1.0, info.get('duration_seconds', 0) / 2)
+    if make_thumbnail(video_path, thumbnail_path, at):
+        fields['thumbnail'] = os.path.basename(thumbnail_path)
+    return fields
+
+
+class MediaJobs:
+    """Process-pool job queue that fills clip metadata after upload"""
+
+    def __init__(self, clip_store, videos_folder, thumbnails_folder, max_workers=2):
+        self.clip_store = clip_store
+        self.videos_folder = videos_folder
+        self.thumbnails_folder = thumbnails_folder
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition()
+        self._pending = 0
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def submit(self, clip):
+        """Queue a clip for probing; returns the future"""
+        clip_id = clip['id']
+        video_path = os.path.join(self.videos_folder, clip['filename'])
+        thumbnail_path = os.path.join(self.thumbnails_folder, f"{clip_id}.jpg")
+        if clip.get('processing_status') != 'pending':
+            # New uploads are stored pending already; only backfilled clips change
+            self.clip_store.update(clip_id, {'processing_status': 'pending'})
+
+        with self._idle:
+            self._pending += 1
+        future = self._executor().submit(process_media, video_path, thumbnail_path)
+        future.add_done_callback(lambda f: self._finish(clip_id, f))
+        return future
+
+    def _finish(self, clip_id, future):
+        try:
+            fields = future.result()
+            fields['processing_status'] = 'ready'
+        except Exception as e:
+            log_error('media_probe_failed', e, clip_id=clip_id)
+            fields = {'processing_status': 'failed'}
+        if fields.get('thumbnail'):
+            fields['thumbnail_url'] = f"/uploads/thumbnails/{fields['thumbnail']}"
+        try:
+            self.clip_store.update(clip_id, fields)
+        finally:
+            with self._idle:
+                self._pending -= 1
+                self._idle.notify_all()
+
+    def wait(self):
+        """Block until every queued job has written its result"""
+        with self._idle:
+            self._idle.wait_for(lambda: self._pending == 0)
+
+    def backfill(self, force=False):
+        """Process every local clip that was never (successfully) probed"""
+        count = 0
+        for clip in self.clip_store.all():
+            if not clip.get('filename') or (clip.get('processing_status') == 'ready' and not force):
+                continue
+            if not os.path.exists(os.path.join(self.videos_folder, clip['filename'])):
+                continue
+            self.submit(clip)
+            count += 1
+        self.wait()
+        return count
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'backfill':
+        print("Uso: python media_probe.py backfill [--force]")
+        sys.exit(1)
+
+    import server
+    count = server.media_jobs.backfill(force='--force' in sys.argv)
+    server.media_jobs.shutdown()
+    server.clip_store.flush()
+    print(f"✅ {count} clips procesados")
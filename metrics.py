@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Request/storage instrumentation and sampled structured logging.
+
+``init_app(app)`` times every request into per-route latency histograms and
+counts responses by status, and adds a Prometheus text endpoint at
+``/metrics``. Storage backends report each load/save with its byte size and
+duration through ``observe_io``.
+
+``log_event`` writes one JSON line per event to the ``lpcp`` logger. Routine
+per-request events are sampled (``LPCP_LOG_SAMPLE``, default 0.01); errors
+are always written.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from flask import Response, g, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+LOG_SAMPLE = float(os.environ.get('LPCP_LOG_SAMPLE', '0.01'))
+
+logger = logging.getLogger('lpcp')
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    """Process-wide counters and histograms keyed by label tuples"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+            return '{' + body + '}'
+
+        lines = []
+        with self._lock:
+            seen = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} counter")
+                    seen.add(name)
+                lines.append(f"{name}{fmt(labels)} {value}")
+            for (name, labels), hist in sorted(self.histograms.items(), key=lambda kv: kv[0]):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} histogram")
+                    seen.add(name)
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {hist.count}")
+                lines.append(f"{name}_sum{fmt(labels)} {hist.total:.6f}")
+                lines.append(f"{name}_count{fmt(labels)} {hist.count}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def log_event(event, sample=None, level=logging.INFO, **fields):
+    """Write a structured log line; ``sample`` is the keep probability"""
+    rate = LOG_SAMPLE if sample is None else sample
+    if rate < 1.0 and random.random() >= rate:
+        return
+    record = {'ts': round(time.time(), 3), 'event': event}
+    record.update(fields)
+    logger.log(level, json.dumps(record, ensure_ascii=False, default=str))
+
+
+def log_error(event, error, **fields):
+    log_event(event, sample=1.0, level=logging.ERROR, error=str(error), **fields)
+
+
+def observe_io(op, domain, nbytes, seconds):
+    """Record one storage load/save"""
+    labels = (('op', op), ('domain', domain))
+    registry.inc('lpcp_storage_operations_total', labels)
+    registry.inc('lpcp_storage_bytes_total', labels, nbytes)
+    registry.observe('lpcp_storage_duration_seconds', labels, seconds)
+    registry.observe('lpcp_storage_size_bytes', labels, nbytes, SIZE_BUCKETS)
+
+
+def init_app(app):
+    """Install request timing hooks and the /metrics endpoint"""
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = response.status_code
+
+        registry.inc('lpcp_http_requests_total', (('method', request.method), ('route', route), ('status', status)))
+        registry.observe('lpcp_http_request_duration_seconds', (('method', request.method), ('route', route)), elapsed)
+        if status >= 500:
+            registry.inc('lpcp_http_errors_total', (('method', request.method), ('route', route)))
+
+        log_event('request', sample=1.0 if status >= 500 else None,
+                  method=request.method, route=route, path=request.path,
+                  status=status, ms=round(elapsed * 1000, 2))
+        return response
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Player and club statistics from match events, with top-k leaderboards.
+
+A match may record who scored and who kept goal::
+
+    {"homeTeam": "ACP 507", "awayTeam": "Coiner FC", "homeScore": 2, ...,
+     "scorers": [{"playerId": 12, "team": "ACP 507", "assistPlayerId": 4,
+                  "minute": 33, "ownGoal": false}, ...],
+     "homeGoalkeeperId": 1, "awayGoalkeeperId": 21}
+
+Goals and assists count from finished and live matches; a clean sheet is a
+finished match in which the keeper's side conceded nothing. An own goal
+counts for the team it was scored for but for no player.
+
+Every match change subtracts the match's old contribution and adds its new
+one, so totals never need a season scan. Each leaderboard (scorers, assists,
+goalkeepers) is a heap of ``(-value, player)`` entries with lazy deletion:
+a change pushes a fresh entry and older entries for that player are skipped
+(and dropped) when they surface. A top-k query pops k live entries and
+pushes them back, O((k + stale) log n); the heap is rebuilt once stale
+entries outnumber live ones.
+"""
+import heapq
+import threading
+
+from match_index import status_of
+from standings_engine import match_result
+
+METRICS = ('goals', 'assists', 'cleanSheets')
+
+LEADERBOARDS = {'scorers': 'goals', 'assists': 'assists', 'goalkeepers': 'cleanSheets'}
+
+
+def _player_id(value):
+    if value == '' or isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+
+def contributions(match):
+    """``[(player or None, team or None, metric)]`` credited by one match"""
+    if not match:
+        return []
+    status = status_of(match)
+    items = []
+    if status in ('finished', 'live'):
+        scorers = match.get('scorers')
+        # Malformed event lists (stored before validation) credit nobody
+        for event in scorers if isinstance(scorers, list) else ():
+            if not isinstance(event, dict):
+                continue
+            team = event.get('team') if isinstance(event.get('team'), str) else None
+            scorer = None if event.get('ownGoal') else _player_id(event.get('playerId'))
+            items.append((scorer, team, 'goals'))
+            assist = _player_id(event.get('assistPlayerId'))
+            if assist is not None and not event.get('ownGoal'):
+                items.append((assist, team, 'assists'))
+
+    result = match_result(match)
+    if result is not None:
+        home, away, home_goals, away_goals = result
+        for team, keeper, conceded in ((home, match.get('homeGoalkeeperId'), away_goals),
+                                       (away, match.get('awayGoalkeeperId'), home_goals)):
+            if conceded == 0:
+                items.append((_player_id(keeper), team, 'cleanSheets'))
+    return items
+
+
+class _Leaderboard:
+    """Top-k over a changing {player: value} map, by lazy-deletion heap"""
+
+    def __init__(self):
+        self._values = {}
+        self._heap = []
+
+    def set(self, player, value):
+        if value:
+            self._values[player] = value
+            heapq.heappush(self._heap, (-value, str(player), player))
+        else:
+            self._values.pop(player, None)
+        if len(self._heap) > 2 * len(self._values) + 64:
+            self._heap = [(-v, str(p), p) for p, v in self._values.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, k):
+        live = []
+        while self._heap and len(live) < k:
+            entry = heapq.heappop(self._heap)
+            neg, _, player = entry
+            # Stale (superseded) and duplicate entries are dropped for good
+            if self._values.get(player) == -neg and not any(e[2] == player for e in live):
+                live.append(entry)
+        for entry in live:
+            heapq.heappush(self._heap, entry)
+        return [(player, -neg) for neg, _, player in live]
+
+
+class PlayerStats:
+    """Per-player and per-club goals, assists and clean sheets"""
+
+    def __init__(self, matches, version=None):
+        self._matches = matches
+        self._version = version
+        self._seen_version = None
+        self._lock = threading.RLock()
+        self._players = None  # player id -> {metric: value}
+        self._clubs = {}      # team -> {metric: value}
+        self._boards = {}
+
+    # ---- bookkeeping ---------------------------------------------------
+
+    def _current_version(self):
+        return self._version() if self._version is not None else None
+
+    def _ensure_loaded(self):
+        if self._players is not None and self._version is not None:
+            if self._current_version() != self._seen_version:
+                self._players = None
+        if self._players is None:
+            self._seen_version = self._current_version()
+            self._players, self._clubs = {}, {}
+            self._boards = {metric: _Leaderboard() for metric in METRICS}
+            for match in self._matches.all():
+                self._apply(match, +1)
+
+    def _apply(self, match, sign):
+        for player, team, metric in contributions(match):
+            if team:
+                club = self._clubs.setdefault(team, dict.fromkeys(METRICS, 0))
+                club[metric] += sign
+                if not any(club.values()):
+                    del self._clubs[team]
+            if player is not None:
+                totals = self._players.setdefault(player, dict.fromkeys(METRICS, 0))
+                totals[metric] += sign
+                self._boards[metric].set(player, totals[metric])
+                if not any(totals.values()):
+                    del self._players[player]
+
+    # ---- public API ----------------------------------------------------
+
+    def apply_match_changes(self, changes):
+        """Move each ``(old, new)`` match's contribution from old to new"""
+        with self._lock:
+            if self._players is None:
+                return
+            for old, new in changes:
+                self._apply(old, -1)
+                self._apply(new, +1)
+            self._seen_version = self._current_version()
+
+    def leaderboard(self, board, limit=10):
+        """``[(player id, value)]``, best first, for scorers/assists/goalkeepers"""
+        metric = LEADERBOARDS.get(board)
+        if metric is None:
+            raise ValueError(f"Unknown leaderboard: {board} (expected {', '.join(LEADERBOARDS)})")
+        with self._lock:
+            self._ensure_loaded()
+            return self._boards[metric].top(limit)
+
+    def player(self, player_id):
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._players.get(_player_id(player_id)) or dict.fromkeys(METRICS, 0))
+
+    def clubs(self):
+        """``{team: {goals, assists, cleanSheets}}``"""
+        with self._lock:
+            self._ensure_loaded()
+            return {team: dict(totals) for team, totals in sorted(self._clubs.items())}
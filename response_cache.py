@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Serialized-response cache for read-mostly API GETs.
+
+Each data domain (clips, standings, matches, settings) has a version number
+that is bumped by its ``save_*_data`` function. A cached entry stores the
+response bytes together with the versions it was built from, keyed by route
+plus the normalized query arguments the route actually reads. The ETag is
+derived from that key and those versions, so ``If-None-Match`` is answered
+with a 304 without running the view. Entries live in a bounded LRU.
+
+When ``external_version`` is given (the storage backend's per-domain
+version), it is folded into the key as well, so files edited by hand
+outside the server still invalidate their cached responses.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+
+class ResponseCache:
+    """LRU of serialized GET responses invalidated by domain versions"""
+
+    def __init__(self, max_entries=512, external_version=None):
+        self.max_entries = max_entries
+        self._external_version = external_version
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        # Distinguishes ETags across restarts, when versions start over
+        self._epoch = os.urandom(4).hex()
+        self.hits = 0
+        self.misses = 0
+
+    def bump(self, domain):
+        """Invalidate every entry built from ``domain``"""
+        with self._lock:
+            self._versions[domain] = self._versions.get(domain, 0) + 1
+
+    def _etag(self, key, versions):
+        raw = repr((self._epoch, key, versions)).encode('utf-8')
+        return hashlib.sha1(raw).hexdigest()[:20]
+
+    def _respond(self, body, etag, mimetype):
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def cached(self, domains, args=()):
+        """Decorate a GET view whose output depends on ``domains`` and query ``args``"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*view_args, **view_kwargs):
+                key = (request.path,) + tuple(request.args.get(name) for name in args)
+                external = ()
+                if self._external_version is not None:
+                    external = tuple(self._external_version(d) for d in domains)
+                with self._lock:
+                    versions = tuple(self._versions.get(d, 0) for d in domains) + external
+                    entry = self._entries.get(key)
+                    if entry is not None and entry[0] == versions:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        return self._respond(entry[1], entry[2], entry[3])
+                    self.misses += 1
+
+                response = make_response(view(*view_args, **view_kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+
+                body = response.get_data()
+                etag = self._etag(key, versions)
+                with self._lock:
+                    self._entries[key] = (versions, body, etag, response.mimetype)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                return self._respond(body, etag, response.mimetype)
+            return wrapper
+        return decorator
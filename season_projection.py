@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Monte Carlo projection of the final table and classification zones.
+
+Starting from the current standings, every remaining (scheduled or live)
+match is simulated ``simulations`` times at once: goals are drawn as NumPy
+arrays of shape (seasons, matches), folded into per-team points and goals
+with two matrix products, and every simulated season is ranked in one
+``lexsort`` with the tiebreak order of the standings table (points, goal
+difference, goals for; ties beyond that keep the current table order).
+
+Outcome models:
+
+* ``poisson`` - each side's goals are Poisson, with the rate scaled by the
+                team's attack (goals for per game) and the opponent's
+                defence (goals against per game) relative to the league
+                average, shrunk towards average for teams with few games,
+                times ``home_advantage`` for the home side
+* ``equal``   - every team scores at the league-average rate
+
+NumPy is optional: without it ``available()`` is False and the server
+answers 503.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from match_index import PENDING, status_of
+from standings_engine import match_result
+
+MODELS = ('poisson', 'equal')
+MAX_SIMULATIONS = 100000
+
+# Seasons simulated per chunk, to bound memory
+CHUNK = 10000
+
+# Games of league-average form added to every team's record
+PRIOR_GAMES = 3
+
+# Goals per team per game when nothing has been played yet
+DEFAULT_RATE = 1.4
+
+DEFAULT_ZONES = [
+    {'id': 1, 'name': 'Clasificación Directa', 'positions': '1-4', 'color': '#00ff88'},
+    {'id': 2, 'name': 'Repechaje', 'positions': '5-8', 'color': '#ffa500'},
+    {'id': 3, 'name': 'Eliminación', 'positions': '9-12', 'color': '#ff4757'},
+]
+
+
+def available():
+    return np is not None
+
+
+def zone_range(zone):
+    """``(first, last)`` 1-based positions of a zone, from 'positions': '1-4' or start/endPosition"""
+    if zone.get('startPosition') is not None:
+        return int(zone['startPosition']), int(zone.get('endPosition', zone['startPosition']))
+    first, _, last = str(zone.get('positions', '')).partition('-')
+    return int(first), int(last or first)
+
+
+def _rates(rows, fixtures, model, home_advantage):
+    """Expected (home, away) goals for every fixture"""
+    played = np.array([row['played'] for row in rows], dtype=float)
+    scored = np.array([row['goalsFor'] for row in rows], dtype=float)
+    conceded = np.array([row['goalsAgainst'] for row in rows], dtype=float)
+    games = played.sum()
+    average = scored.sum() / games if games else DEFAULT_RATE
+    average = average or DEFAULT_RATE
+
+    home = np.array([h for h, _ in fixtures], dtype=int)
+    away = np.array([a for _, a in fixtures], dtype=int)
+    if model == 'equal':
+        base = np.full(len(fixtures), average)
+        return base * home_advantage, base
+
+    attack = (scored + PRIOR_GAMES * average) / ((played + PRIOR_GAMES) * average)
+    defence = (conceded + PRIOR_GAMES * average) / ((played + PRIOR_GAMES) * average)
+    return (average * attack[home] * defence[away] * home_advantage,
+            average * attack[away] * defence[home])
+
+
+def project(table, matches, points, zones=None, simulations=20000, model='poisson',
+            home_advantage=1.1, seed=None):
+    """Simulate the rest of the season; see the module docstring.
+
+    ``table`` is the ranked standings, ``matches`` every match (finished ones
+    are skipped), ``points`` the (win, draw, loss) settings.
+    """
+    if np is None:
+        raise RuntimeError('NumPy is not installed')
+    if model not in MODELS:
+        raise ValueError(f"Unknown model: {model} (expected {', '.join(MODELS)})")
+    if not 1 <= simulations <= MAX_SIMULATIONS:
+        raise ValueError(f"simulations must be between 1 and {MAX_SIMULATIONS}")
+
+    rows = list(table)
+    teams = {row['team']: i for i, row in enumerate(rows)}
+    fixtures = []
+    for match in matches:
+        if status_of(match) not in PENDING or match_result(match) is not None:
+            continue
+        home, away = match.get('homeTeam'), match.get('awayTeam')
+        for team in (home, away):
+            if team and team not in teams:
+                teams[team] = len(rows)
+                rows.append({'team': team, 'played': 0, 'points': 0, 'goalsFor': 0, 'goalsAgainst': 0})
+        if home and away and home != away:
+            fixtures.append((teams[home], teams[away]))
+
+    n_teams, n_matches = len(rows), len(fixtures)
+    win, draw, loss = points
+    base_points = np.array([row['points'] for row in rows], dtype=float)
+    base_for = np.array([row['goalsFor'] for row in rows], dtype=float)
+    base_against = np.array([row['goalsAgainst'] for row in rows], dtype=float)
+
+    # One-hot (matches x teams) maps of who plays at home and away
+    home_of = np.zeros((n_matches, n_teams))
+    away_of = np.zeros((n_matches, n_teams))
+    if n_matches:
+        home_of[np.arange(n_matches), [h for h, _ in fixtures]] = 1
+        away_of[np.arange(n_matches), [a for _, a in fixtures]] = 1
+    home_rate, away_rate = _rates(rows, fixtures, model, home_advantage) if n_matches else (None, None)
+
+    rng = np.random.default_rng(seed)
+    counts = np.zeros((n_teams, n_teams), dtype=np.int64)
+    total_points = np.zeros(n_teams)
+    order_key = np.arange(n_teams)
+    done = 0
+    while done < simulations:
+        size = min(CHUNK, simulations - done)
+        season_points = np.tile(base_points, (size, 1))
+        goals_for = np.tile(base_for, (size, 1))
+        goals_against = np.tile(base_against, (size, 1))
+        if n_matches:
+            home_goals = rng.poisson(home_rate, size=(size, n_matches))
+            away_goals = rng.poisson(away_rate, size=(size, n_matches))
+            home_points = np.where(home_goals > away_goals, win, np.where(home_goals == away_goals, draw, loss))
+            away_points = np.where(away_goals > home_goals, win, np.where(home_goals == away_goals, draw, loss))
+            season_points += home_points @ home_of + away_points @ away_of
+            goals_for += home_goals @ home_of + away_goals @ away_of
+            goals_against += away_goals @ home_of + home_goals @ away_of
+
+        # lexsort: last key is primary; negate for descending
+        ranked = np.lexsort((np.broadcast_to(order_key, (size, n_teams)),
+                             -goals_for, -(goals_for - goals_against), -season_points), axis=-1)
+        positions = np.empty_like(ranked)
+        np.put_along_axis(positions, ranked, np.broadcast_to(order_key, (size, n_teams)), axis=-1)
+        counts += np.bincount((order_key * n_teams + positions).ravel(),
+                              minlength=n_teams * n_teams).reshape(n_teams, n_teams)
+        total_points += season_points.sum(axis=0)
+        done += size
+
+    probabilities = counts / simulations
+    zones = zones or DEFAULT_ZONES
+    projected = []
+    for i, row in enumerate(rows):
+        team_zones = {}
+        for zone in zones:
+            try:
+                first, last = zone_range(zone)
+            except (TypeError, ValueError):
+                continue
+            team_zones[zone.get('name', f'{first}-{last}')] = round(float(probabilities[i, max(first - 1, 0):last].sum()), 4)
+        projected.append({
+            'team': row['team'],
+            'position': row.get('position', i + 1),
+            'points': row['points'],
+            'expectedPoints': round(float(total_points[i] / simulations), 2),
+            'positionProbabilities': [round(float(p), 4) for p in probabilities[i]],
+            'zones': team_zones,
+        })
+    return {
+        'simulations': simulations,
+        'model': model,
+        'remainingMatches': n_matches,
+        'zones': zones,
+        'teams': projected,
+    }
@@ -1,21 +1,36 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify, send_from_directory, render_template_string
+from flask import Flask, request, jsonify, render_template_string
 import os
-import json
 import uuid
 from datetime import datetime
 from werkzeug.utils import secure_filename
 import webbrowser
 import threading
 import time
+from clip_store import ClipStore, encode_cursor, decode_cursor
+from counter_journal import CounterJournal
+from chunked_upload import UploadSessions, UploadError
+from media_probe import MediaJobs
+from static_files import StaticFiles, configure_sendfile, IMMUTABLE
+from image_variants import ImageVariants
+from storage import JsonBackend
+from event_hub import EventHub, clip_listener
+from clip_stats import ClipStats
+from clip_search import ClipSearch
+from clip_trending import ClipTrending
+from data_export import export_response, iter_clips, COLUMNS as EXPORT_COLUMNS
+import metrics
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
+configure_sendfile(app)
+metrics.init_app(app)
 
 # Configuration
 UPLOAD_FOLDER = 'uploads/videos'
 THUMBNAILS_FOLDER = 'uploads/thumbnails'
 DATA_FILE = 'clips_data.json'
+COUNTERS_FILE = 'clips_counters.log'
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
 PORT = 8000
 
@@ -26,88 +41,127 @@ os.makedirs(THUMBNAILS_FOLDER, exist_ok=True)
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Atomic, lock-protected JSON snapshots shared with any other worker
+storage = JsonBackend({'clips': DATA_FILE})
+
 def load_clips_data():
     """Load clips data from JSON file"""
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+    data = storage.load('clips')
+    return data if data is not None else []
 
-def save_clips_data(data):
+def save_clips_data(data, expected_version=None):
     """Save clips data to JSON file"""
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    storage.save('clips', data, expected_version=expected_version)
+
+upload_sessions = UploadSessions(UPLOAD_FOLDER, app.config['MAX_CONTENT_LENGTH'])
+
+clip_store = ClipStore(DATA_FILE, load_clips_data, save_clips_data, category_field='category',
+                       journal=CounterJournal(COUNTERS_FILE),
+                       version=lambda: storage.version('clips'),
+                       lock=lambda: storage.lock('clips'))
+
+# Live clip and counter events for /api/events subscribers
+event_hub = EventHub(topics=('clips', 'counters'))
+clip_store.add_listener(clip_listener(event_hub))
+
+clip_stats = ClipStats(clip_store)
+clip_search = ClipSearch(clip_store)
+
+# Time-decayed trending feed, re-ranked as views and likes land
+clip_trending = ClipTrending(clip_store)
+
+# Duration, resolution and thumbnails are filled in off-request
+media_jobs = MediaJobs(clip_store, UPLOAD_FOLDER, THUMBNAILS_FOLDER)
+
+# Hashed, precompressed static assets (built in the background at startup)
+static_files = StaticFiles('.')
+static_files.build_in_background()
 
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    return static_files.send('.', 'index.html')
 
 @app.route('/<path:filename>')
 def serve_static(filename):
-    return send_from_directory('.', filename)
+    cache_control = 'public, max-age=86400' if filename.startswith('img/') else 'no-cache'
+    return static_files.send('.', filename, cache_control)
 
+# Uploaded files are named by clip id and never change
 @app.route('/uploads/videos/<filename>')
 def serve_video(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    return static_files.send(UPLOAD_FOLDER, filename, IMMUTABLE)
 
 @app.route('/uploads/thumbnails/<filename>')
 def serve_thumbnail(filename):
-    return send_from_directory(THUMBNAILS_FOLDER, filename)
+    return static_files.send(THUMBNAILS_FOLDER, filename, IMMUTABLE)
+
+# Resized, re-encoded logos and thumbnails, rendered once into an LRU disk cache
+image_variants = ImageVariants('.', static_files=static_files)
+
+@app.route('/api/images/<path:filename>')
+def serve_image_variant(filename):
+    """Logo or thumbnail variant: ?w= (width), ?format=webp|jpeg|png|auto, ?q= (quality), ?v= (immutable)"""
+    return image_variants.send(filename)
 
 @app.route('/api/clips', methods=['GET'])
 def get_clips():
     """Get all clips with pagination and filtering"""
-    clips = load_clips_data()
-    
     # Filter by category if specified
     category = request.args.get('category')
-    if category and category != 'all':
-        clips = [clip for clip in clips if clip.get('category') == category]
-    
-    # Sort by date (newest first)
-    clips.sort(key=lambda x: x.get('upload_date', ''), reverse=True)
-    
-    # Pagination
-    page = int(request.args.get('page', 1))
+    category = category if category and category != 'all' else None
     per_page = int(request.args.get('per_page', 12))
-    start = (page - 1) * per_page
-    end = start + per_page
+    total = clip_store.count(category)
     
-    return jsonify({
-        'clips': clips[start:end],
-        'total': len(clips),
-        'page': page,
-        'per_page': per_page,
-        'has_more': end < len(clips)
-    })
+    if 'after' in request.args:
+        # Keyset pagination: stable while new clips are uploaded
+        token = request.args.get('after')
+        try:
+            after = decode_cursor(token) if token else None
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        clips, has_more = clip_store.page_after(category, after, per_page)
+        result = {
+            'clips': clips,
+            'total': total,
+            'per_page': per_page,
+            'has_more': has_more
+        }
+    else:
+        # Pagination (newest first)
+        page = int(request.args.get('page', 1))
+        start = (page - 1) * per_page
+        end = start + per_page
+        clips = clip_store.page(category, start, per_page)
+        result = {
+            'clips': clips,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'has_more': end < total
+        }
+    
+    result['next_cursor'] = encode_cursor(clips[-1]) if clips and result['has_more'] else None
+    return jsonify(result)
 
 @app.route('/api/clips/<clip_id>', methods=['GET'])
 def get_clip(clip_id):
     """Get specific clip details"""
-    clips = load_clips_data()
-    clip = next((c for c in clips if c['id'] == clip_id), None)
+    # Increment view count
+    clip = clip_store.increment(clip_id, 'views')
     
     if not clip:
         return jsonify({'error': 'Clip not found'}), 404
     
-    # Increment view count
-    clip['views'] = clip.get('views', 0) + 1
-    save_clips_data(clips)
-    
     return jsonify(clip)
 
 @app.route('/api/clips/<clip_id>/like', methods=['POST'])
 def like_clip(clip_id):
     """Toggle like on a clip"""
-    clips = load_clips_data()
-    clip = next((c for c in clips if c['id'] == clip_id), None)
+    clip = clip_store.increment(clip_id, 'likes')
     
     if not clip:
         return jsonify({'error': 'Clip not found'}), 404
     
-    clip['likes'] = clip.get('likes', 0) + 1
-    save_clips_data(clips)
-    
     return jsonify({'likes': clip['likes']})
 
 @app.route('/api/upload', methods=['POST'])
@@ -133,48 +187,214 @@ def upload_clip():
     file_path = os.path.join(UPLOAD_FOLDER, new_filename)
     file.save(file_path)
     
-    # Create clip data
-    clip_data = {
+    clip_data = build_clip_record(clip_id, filename, new_filename, request.form, os.path.getsize(file_path))
+    
+    # Save to data file
+    clip_store.add(clip_data)
+    media_jobs.submit(clip_data)
+    
+    return jsonify({
+        'success': True,
+        'clip_id': clip_id,
+        'message': 'Clip uploaded successfully!'
+    })
+
+def build_clip_record(clip_id, original_filename, new_filename, form, file_size):
+    """Create the stored clip data for an uploaded file"""
+    return {
         'id': clip_id,
-        'title': request.form.get('clipTitle', ''),
-        'description': request.form.get('clipDescription', ''),
-        'club': request.form.get('clubSelect', ''),
+        'title': form.get('clipTitle', ''),
+        'description': form.get('clipDescription', ''),
+        'club': form.get('clubSelect', ''),
         'filename': new_filename,
-        'original_filename': filename,
+        'original_filename': original_filename,
         'upload_date': datetime.now().isoformat(),
         'views': 0,
         'likes': 0,
         'category': 'goals',  # Default category
-        'duration': '0:00',   # Would need video processing to get real duration
-        'file_size': os.path.getsize(file_path)
+        'duration': '0:00',   # Filled in by the media probe worker
+        'file_size': file_size,
+        'processing_status': 'pending'
     }
+
+def upload_error_response(error):
+    body = {'error': str(error)}
+    body.update(error.extra)
+    return jsonify(body), error.status
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable chunked upload"""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename', ''))
     
-    # Save to data file
-    clips = load_clips_data()
-    clips.append(clip_data)
-    save_clips_data(clips)
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    
+    try:
+        size = int(data.get('size', 0))
+        metadata = {key: data.get(key, '') for key in ('clipTitle', 'clipDescription', 'clubSelect')}
+        session = upload_sessions.create(filename, size, metadata)
+    except ValueError:
+        return jsonify({'error': 'Invalid file size'}), 400
+    except UploadError as e:
+        return upload_error_response(e)
+    
+    return jsonify({
+        'upload_id': session['id'],
+        'offset': 0,
+        'max_chunk': upload_sessions.max_chunk
+    }), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """Report how many bytes of an upload have been received"""
+    try:
+        session = upload_sessions.status(upload_id)
+    except UploadError as e:
+        return upload_error_response(e)
+    
+    return jsonify({'upload_id': upload_id, 'offset': session['offset'], 'size': session['size']})
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def append_upload_chunk(upload_id):
+    """Append a raw chunk at ?offset=N, streamed straight to disk"""
+    try:
+        offset = int(request.args.get('offset', -1))
+        new_offset = upload_sessions.append(upload_id, offset, request.stream, request.content_length)
+    except ValueError:
+        return jsonify({'error': 'Invalid offset'}), 400
+    except UploadError as e:
+        return upload_error_response(e)
+    
+    return jsonify({'upload_id': upload_id, 'offset': new_offset})
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """Finish a chunked upload and register the clip"""
+    try:
+        session, part_path, digest = upload_sessions.finalize(upload_id)
+    except UploadError as e:
+        return upload_error_response(e)
+    
+    # Same content already uploaded: keep the existing clip
+    existing = clip_store.get_by_sha256(digest)
+    if existing:
+        os.remove(part_path)
+        return jsonify({
+            'success': True,
+            'clip_id': existing['id'],
+            'duplicate': True,
+            'message': 'Clip already uploaded'
+        })
+    
+    clip_id = str(uuid.uuid4())
+    filename = session['filename']
+    new_filename = f"{clip_id}.{filename.rsplit('.', 1)[1].lower()}"
+    os.replace(part_path, os.path.join(UPLOAD_FOLDER, new_filename))
+    
+    clip_data = build_clip_record(clip_id, filename, new_filename, session['metadata'], session['size'])
+    clip_data['sha256'] = digest
+    clip_store.add(clip_data)
+    media_jobs.submit(clip_data)
     
     return jsonify({
         'success': True,
         'clip_id': clip_id,
+        'duplicate': False,
         'message': 'Clip uploaded successfully!'
     })
 
-@app.route('/api/stats', methods=['GET'])
-def get_stats():
-    """Get overall statistics"""
-    clips = load_clips_data()
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    """Cancel a chunked upload and discard its data"""
+    try:
+        upload_sessions.abort(upload_id)
+    except UploadError as e:
+        return upload_error_response(e)
+    
+    return jsonify({'success': True})
+
+@app.route('/api/clips/search', methods=['GET'])
+def search_clips():
+    """Search clips by title, description and club (?q=&category=&limit=&offset=)"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing search query (q)'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be numbers'}), 400
+    category = request.args.get('category')
+    category = category if category and category != 'all' else None
     
-    total_clips = len(clips)
-    total_views = sum(clip.get('views', 0) for clip in clips)
-    total_likes = sum(clip.get('likes', 0) for clip in clips)
+    prefix = request.args.get('prefix', '1') != '0'
+    total, hits = clip_search.search(query, prefix=prefix, category=category, limit=limit, offset=offset)
+    return jsonify({
+        'query': query,
+        'total': total,
+        'clips': [dict(clip, score=round(score, 4)) for clip, score in hits]
+    })
+
+@app.route('/api/clips/trending', methods=['GET'])
+def trending_clips():
+    """Clips ranked by views and likes decayed by age (?club= or ?category=, limit, offset)"""
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be numbers'}), 400
+    category = request.args.get('category')
+    category = category if category and category != 'all' else None
+    club = request.args.get('club') or None
+    if club and category:
+        return jsonify({'error': 'Filter by club or by category, not both'}), 400
     
+    total, feed = clip_trending.top(limit=limit, offset=offset, club=club, clip_type=category)
+
     return jsonify({
-        'total_clips': total_clips,
-        'total_views': total_views,
-        'total_likes': total_likes
+        'total': total,
+        'clips': [dict(clip, trendingScore=round(score, 4)) for clip, score in feed]
     })
 
+@app.route('/api/export/clips', methods=['GET'])
+def export_clips():
+    """Stream clips as ?format=ndjson|csv (&gzip=1, from, to, club, category)"""
+    args = request.args
+    category = args.get('category')
+    category = category if category and category != 'all' else None
+    records = iter_clips(clip_store, category=category, club=args.get('club') or None,
+                         start=args.get('from') or None, end=args.get('to') or None)
+    columns = [clip_store.category_field if c == 'type' else c for c in EXPORT_COLUMNS['clips']]
+    try:
+        return export_response('clips', records, args.get('format', 'ndjson'),
+                               args.get('gzip', '0') not in ('0', '', 'false'), columns)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get overall statistics"""
+    return jsonify(clip_stats.totals())
+
+@app.route('/api/stats/breakdown', methods=['GET'])
+def get_stats_breakdown():
+    """Clips, views and likes per club, category and upload day (?by=club|type|day)"""
+    try:
+        return jsonify(clip_stats.breakdown(request.args.get('by')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/events', methods=['GET'])
+def event_stream():
+    """Stream clip and counter change events (Server-Sent Events)"""
+    try:
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+        return event_hub.response(request.args.get('topics'), last_event_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 def open_browser():
     """Open browser after a short delay"""
     time.sleep(1.5)
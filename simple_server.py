@@ -1,110 +1,178 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify
 import os
-import json
 from datetime import datetime
+from clip_store import ClipStore, encode_cursor, decode_cursor
+from counter_journal import CounterJournal
+from storage import get_storage, StaleWriteError
+from standings_engine import StandingsEngine
+from static_files import StaticFiles, configure_sendfile, IMMUTABLE
+from image_variants import ImageVariants
+from response_cache import ResponseCache
+from event_hub import EventHub, clip_listener
+from clip_stats import ClipStats
+from clip_search import ClipSearch
+from clip_trending import ClipTrending
+from match_index import MatchIndex, matchday_of, status_of, kickoff
+from standings_history import StandingsHistory
+import season_projection
+from player_stats import PlayerStats, LEADERBOARDS
+from data_export import export_response, iter_clips, COLUMNS as EXPORT_COLUMNS
+from match_batch import plan_batch, validate_match, MAX_OPERATIONS
+from tournament_store import TournamentStore
+import metrics
+from metrics import log_event, log_error
 
 app = Flask(__name__)
+configure_sendfile(app)
+metrics.init_app(app)
 
 # Configuration
 PORT = 8000
 DATA_FILE = 'clips_data.json'
+COUNTERS_FILE = 'clips_counters.log'
 STANDINGS_FILE = 'standings_data.json'
 MATCHES_FILE = 'matches_data.json'
 SETTINGS_FILE = 'league_settings.json'
+TOURNAMENT_FILE = os.path.join('data', 'tournament.json')
+
+storage = get_storage({
+    'clips': DATA_FILE,
+    'standings': STANDINGS_FILE,
+    'matches': MATCHES_FILE,
+    'settings': SETTINGS_FILE,
+})
+
+# Serialized GET responses, invalidated by the save_*_data functions
+# (and by files edited on disk, through the storage version)
+response_cache = ResponseCache(external_version=storage.version)
+
+# Live change events pushed to /api/events subscribers
+event_hub = EventHub()
+
+# Loaders fall back to defaults only when nothing was ever saved; a file
+# that exists but cannot be read raises, so it is never replaced by an
+# empty list on the next save.
 
 def load_clips_data():
-    """Load clips data from JSON file"""
+    """Load clips data from storage"""
     try:
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
+        data = storage.load('clips')
     except Exception as e:
-        print(f"Error loading clips data: {e}")
-        return []
+        log_error('storage_load_failed', e, domain='clips')
+        raise
+    return data if data is not None else []
 
-def save_clips_data(data):
-    """Save clips data to JSON file"""
+def save_clips_data(data, expected_version=None):
+    """Save clips data to storage (refused if the stored version moved on)"""
     try:
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        storage.save('clips', data, expected_version=expected_version)
+        response_cache.bump('clips')
         return True
+    except StaleWriteError:
+        raise
     except Exception as e:
-        print(f"Error saving clips data: {e}")
+        log_error('storage_save_failed', e, domain='clips')
         return False
 
+clip_store = ClipStore(DATA_FILE, load_clips_data, save_clips_data,
+                       journal=CounterJournal(COUNTERS_FILE),
+                       version=lambda: storage.version('clips'),
+                       lock=lambda: storage.lock('clips'))
+
+def invalidate_clip_responses(event, clip, changes):
+    # Counters reach the cache when the journal is compacted into a save
+    if event != 'increment':
+        response_cache.bump('clips')
+
+clip_store.add_listener(invalidate_clip_responses)
+clip_store.add_listener(clip_listener(event_hub))
+
+# Totals and per-club/type/day breakdowns kept up to date by the store
+clip_stats = ClipStats(clip_store)
+
+# Accent-insensitive full-text index over title, description and club
+clip_search = ClipSearch(clip_store)
+
+# Time-decayed trending feed, re-ranked as views and likes land
+clip_trending = ClipTrending(clip_store)
+
 def load_standings_data():
-    """Load standings data from JSON file"""
+    """Load standings data from storage"""
     try:
-        if os.path.exists(STANDINGS_FILE):
-            with open(STANDINGS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return initialize_default_standings()
+        data = storage.load('standings')
     except Exception as e:
-        print(f"Error loading standings data: {e}")
-        return initialize_default_standings()
+        log_error('storage_load_failed', e, domain='standings')
+        raise
+    return data if data is not None else initialize_default_standings()
 
 def save_standings_data(data):
-    """Save standings data to JSON file"""
+    """Save standings data to storage"""
     try:
-        with open(STANDINGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        storage.save('standings', data)
+        response_cache.bump('standings')
         return True
     except Exception as e:
-        print(f"Error saving standings data: {e}")
+        log_error('storage_save_failed', e, domain='standings')
         return False
 
 def load_matches_data():
-    """Load matches data from JSON file"""
+    """Load matches data from storage"""
     try:
-        if os.path.exists(MATCHES_FILE):
-            with open(MATCHES_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
+        data = storage.load('matches')
     except Exception as e:
-        print(f"Error loading matches data: {e}")
-        return []
+        log_error('storage_load_failed', e, domain='matches')
+        raise
+    return data if data is not None else []
 
 def save_matches_data(data):
-    """Save matches data to JSON file"""
+    """Save matches data to storage"""
     try:
-        with open(MATCHES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        storage.save('matches', data)
+        response_cache.bump('matches')
         return True
     except Exception as e:
-        print(f"Error saving matches data: {e}")
+        log_error('storage_save_failed', e, domain='matches')
+        return False
+
+def patch_match_data(old, new):
+    """Rewrite one edited match in place (NDJSON backend); None when a full save is needed"""
+    if not hasattr(storage, 'patch_record') or set(old) - set(new):
+        return None
+    fields = {k: v for k, v in new.items() if old.get(k) != v}
+    try:
+        if storage.patch_record('matches', new['id'], fields) is None:
+            return None
+        response_cache.bump('matches')
+        return True
+    except Exception as e:
+        log_error('storage_save_failed', e, domain='matches')
         return False
 
 def load_settings_data():
-    """Load league settings from JSON file"""
-    try:
-        if os.path.exists(SETTINGS_FILE):
-            with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {
-            'seasonName': 'Temporada 2025',
-            'pointsWin': 3,
-            'pointsDraw': 1,
-            'pointsLoss': 0
-        }
+    """Load league settings from storage"""
+    try:
+        data = storage.load('settings')
     except Exception as e:
-        print(f"Error loading settings data: {e}")
-        return {
-            'seasonName': 'Temporada 2025',
-            'pointsWin': 3,
-            'pointsDraw': 1,
-            'pointsLoss': 0
-        }
+        log_error('storage_load_failed', e, domain='settings')
+        raise
+    if data is not None:
+        return data
+    return {
+        'seasonName': 'Temporada 2025',
+        'pointsWin': 3,
+        'pointsDraw': 1,
+        'pointsLoss': 0
+    }
 
 def save_settings_data(data):
-    """Save league settings to JSON file"""
+    """Save league settings to storage"""
     try:
-        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        storage.save('settings', data)
+        response_cache.bump('settings')
         return True
     except Exception as e:
-        print(f"Error saving settings data: {e}")
+        log_error('storage_save_failed', e, domain='settings')
         return False
 
 def initialize_default_standings():
@@ -140,140 +208,263 @@ def initialize_default_standings():
     
     return standings
 
+# Matches by id, matchday, status, team and kickoff
+match_index = MatchIndex(load_matches_data, version=lambda: storage.version('matches'))
+
+standings_engine = StandingsEngine(load_standings_data, save_standings_data, load_settings_data,
+                                   version=lambda: storage.version('standings'),
+                                   lock=lambda: storage.lock('standings'))
+
+# Table after any matchday, from per-round cumulative snapshots
+standings_history = StandingsHistory(standings_engine, match_index, version=lambda: storage.version('matches'))
+
+# Goals, assists and clean sheets from match events, with top-k leaderboards
+player_stats = PlayerStats(match_index, version=lambda: storage.version('matches'))
+
+def apply_match_changes(changes):
+    """Feed committed ``(old, new)`` match changes to everything derived from matches.
+
+    The matches are already saved, so a failing consumer is logged and never
+    fails the request or keeps the others from seeing the change.
+    """
+    for consumer in (standings_engine, standings_history, player_stats):
+        try:
+            consumer.apply_match_changes(changes)
+        except Exception as e:
+            log_error('match_change_failed', e, consumer=type(consumer).__name__)
+
+def publish_standings(table, reordered):
+    event_hub.publish('standings', {'type': 'table', 'reordered': reordered, 'standings': table})
+
+standings_engine.add_listener(publish_standings)
+
+# Teams, players, clubs and the playoff bracket from the Node server's
+# data/tournament.json, parsed and saved one section at a time
+tournament_store = TournamentStore(TOURNAMENT_FILE)
+
+# Hashed, precompressed static assets (built in the background at startup)
+static_files = StaticFiles('.')
+static_files.build_in_background()
+
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    return static_files.send('.', 'index.html')
 
 @app.route('/<path:filename>')
 def serve_static(filename):
-    return send_from_directory('.', filename)
+    cache_control = 'public, max-age=86400' if filename.startswith('img/') else 'no-cache'
+    return static_files.send('.', filename, cache_control)
 
 @app.route('/uploads/<filename>')
 def serve_upload(filename):
-    return send_from_directory('uploads', filename)
+    return static_files.send('uploads', filename, IMMUTABLE)
 
+# Uploaded files are named by clip id and never change
 @app.route('/uploads/videos/<filename>')
 def serve_video(filename):
-    return send_from_directory('uploads/videos', filename)
+    return static_files.send('uploads/videos', filename, IMMUTABLE)
 
 @app.route('/uploads/thumbnails/<filename>')
 def serve_thumbnail(filename):
-    return send_from_directory('uploads/thumbnails', filename)
+    return static_files.send('uploads/thumbnails', filename, IMMUTABLE)
+
+# Resized, re-encoded logos and thumbnails, rendered once into an LRU disk cache
+image_variants = ImageVariants('.', static_files=static_files)
+
+@app.route('/api/images/<path:filename>')
+def serve_image_variant(filename):
+    """Logo or thumbnail variant: ?w= (width), ?format=webp|jpeg|png|auto, ?q= (quality), ?v= (immutable)"""
+    return image_variants.send(filename)
 
 @app.route('/api/clips', methods=['GET'])
+@response_cache.cached(['clips'], args=('category', 'page', 'per_page', 'after'))
 def get_clips():
     """Get all clips with pagination and filtering"""
     try:
-        clips = load_clips_data()
-        
         # Filter by category if specified
         category = request.args.get('category', 'all')
-        if category and category != 'all':
-            clips = [clip for clip in clips if clip.get('type') == category]
+        category = category if category and category != 'all' else None
+        per_page = int(request.args.get('per_page', 12))
+        total = clip_store.count(category)
         
-        # Sort by date (newest first)
-        clips.sort(key=lambda x: x.get('upload_date', ''), reverse=True)
+        if 'after' in request.args:
+            # Keyset pagination: stable while new clips are uploaded
+            token = request.args.get('after')
+            try:
+                after = decode_cursor(token) if token else None
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            clips, has_more = clip_store.page_after(category, after, per_page)
+            result = {
+                'clips': clips,
+                'total': total,
+                'per_page': per_page,
+                'has_more': has_more
+            }
+        else:
+            # Simple pagination (newest first)
+            page = int(request.args.get('page', 1))
+            start = (page - 1) * per_page
+            end = start + per_page
+            clips = clip_store.page(category, start, per_page)
+            result = {
+                'clips': clips,
+                'total': total,
+                'page': page,
+                'per_page': per_page,
+                'has_more': end < total
+            }
         
-        # Simple pagination
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 12))
-        start = (page - 1) * per_page
-        end = start + per_page
-        
-        result = {
-            'clips': clips[start:end],
-            'total': len(clips),
-            'page': page,
-            'per_page': per_page,
-            'has_more': end < len(clips)
-        }
+        result['next_cursor'] = encode_cursor(clips[-1]) if clips and result['has_more'] else None
         
-        print(f"📤 Enviando respuesta API: {json.dumps(result, indent=2, ensure_ascii=False)}")
+        log_event('clips_listed', count=len(clips), total=total, category=category)
         return jsonify(result)
     except Exception as e:
-        print(f"Error in get_clips: {e}")
+        log_error('route_failed', e, route='get_clips')
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/stats', methods=['GET'])
-def get_stats():
-    """Get overall statistics"""
+@app.route('/api/clips/search', methods=['GET'])
+def search_clips():
+    """Search clips by title, description and club (?q=&category=&limit=&offset=)"""
     try:
-        clips = load_clips_data()
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Missing search query (q)'}), 400
+        try:
+            limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+            offset = max(int(request.args.get('offset', 0)), 0)
+        except ValueError:
+            return jsonify({'error': 'limit and offset must be numbers'}), 400
+        category = request.args.get('category')
+        category = category if category and category != 'all' else None
         
-        total_clips = len(clips)
-        total_views = sum(clip.get('views', 0) for clip in clips)
-        total_likes = sum(clip.get('likes', 0) for clip in clips)
+        # Whole words match exactly; the last word also as a prefix (type-ahead)
+        prefix = request.args.get('prefix', '1') != '0'
+        total, hits = clip_search.search(query, prefix=prefix, category=category, limit=limit, offset=offset)
         
+        log_event('clips_searched', query=query, total=total)
         return jsonify({
-            'total_clips': total_clips,
-            'total_views': total_views,
-            'total_likes': total_likes
+            'query': query,
+            'total': total,
+            'clips': [dict(clip, score=round(score, 4)) for clip, score in hits]
         })
     except Exception as e:
-        print(f"Error in get_stats: {e}")
+        log_error('route_failed', e, route='search_clips')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/clips/trending', methods=['GET'])
+def trending_clips():
+    """Clips ranked by views and likes decayed by age (?club= or ?category=, limit, offset)"""
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+            offset = max(int(request.args.get('offset', 0)), 0)
+        except ValueError:
+            return jsonify({'error': 'limit and offset must be numbers'}), 400
+        category = request.args.get('category')
+        category = category if category and category != 'all' else None
+        club = request.args.get('club') or None
+        if club and category:
+            return jsonify({'error': 'Filter by club or by category, not both'}), 400
+        
+        total, feed = clip_trending.top(limit=limit, offset=offset, club=club, clip_type=category)
+        
+        log_event('clips_trending', total=total, club=club, category=category)
+        return jsonify({
+            'total': total,
+            'clips': [dict(clip, trendingScore=round(score, 4)) for clip, score in feed]
+        })
+    except Exception as e:
+        log_error('route_failed', e, route='trending_clips')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get overall statistics"""
+    try:
+        # Maintained incrementally, so views and likes are always current
+        return jsonify(clip_stats.totals())
+    except Exception as e:
+        log_error('route_failed', e, route='get_stats')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stats/breakdown', methods=['GET'])
+def get_stats_breakdown():
+    """Clips, views and likes per club, type and upload day (?by=club|type|day)"""
+    try:
+        return jsonify(clip_stats.breakdown(request.args.get('by')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log_error('route_failed', e, route='get_stats_breakdown')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/stats/rebuild', methods=['POST'])
+def rebuild_stats():
+    """Recompute the aggregates from the clip records and report any drift"""
+    try:
+        drift = clip_stats.check()
+        if drift:
+            log_event('stats_drift', sample=1.0, buckets=len(drift))
+        return jsonify({'success': True, 'drift': drift, 'stats': clip_stats.totals()})
+    except Exception as e:
+        log_error('route_failed', e, route='rebuild_stats')
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/clips/<clip_id>', methods=['GET'])
 def get_clip_details(clip_id):
     """Get details for a specific clip"""
     try:
-        clips = load_clips_data()
-        clip = next((c for c in clips if c['id'] == clip_id), None)
+        # Increment view count
+        clip = clip_store.increment(clip_id, 'views')
         
         if not clip:
             return jsonify({'error': 'Clip not found'}), 404
         
-        # Increment view count
-        clip['views'] = clip.get('views', 0) + 1
-        save_clips_data(clips)
-        
-        print(f"📹 Clip details requested: {clip['title']} (views: {clip['views']})")
+        log_event('clip_viewed', clip_id=clip_id, views=clip['views'])
         return jsonify(clip)
         
     except Exception as e:
-        print(f"Error in get_clip_details: {e}")
+        log_error('route_failed', e, route='get_clip_details')
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/clips/<clip_id>/like', methods=['POST'])
 def like_clip(clip_id):
     """Toggle like on a clip"""
     try:
-        clips = load_clips_data()
-        clip = next((c for c in clips if c['id'] == clip_id), None)
+        clip = clip_store.increment(clip_id, 'likes')
         
         if not clip:
             return jsonify({'error': 'Clip not found'}), 404
         
-        clip['likes'] = clip.get('likes', 0) + 1
-        
-        if save_clips_data(clips):
-            return jsonify({'success': True, 'likes': clip['likes']})
-        else:
-            return jsonify({'error': 'Failed to save data'}), 500
+        return jsonify({'success': True, 'likes': clip['likes']})
             
     except Exception as e:
-        print(f"Error in like_clip: {e}")
+        log_error('route_failed', e, route='like_clip')
         return jsonify({'error': str(e)}), 500
 
 # Standings API endpoints
 @app.route('/api/standings', methods=['GET'])
+@response_cache.cached(['standings', 'matches', 'settings'], args=('matchday',))
 def get_standings():
-    """Get current standings table"""
+    """Get current standings table, or the table after ?matchday=N"""
     try:
-        standings = load_standings_data()
-        
-        # Sort standings by points, then goal difference
-        standings.sort(key=lambda x: (-x['points'], -x['goalDifference'], -x['goalsFor']))
-        
-        # Update positions
-        for i, team in enumerate(standings):
-            team['position'] = i + 1
+        matchday = request.args.get('matchday')
+        if matchday is not None:
+            try:
+                matchday = int(matchday)
+            except ValueError:
+                return jsonify({'error': 'matchday must be an integer'}), 400
+            standings = standings_history.table(matchday)
+        else:
+            # Ranked by points, goal difference, goals for (cached between changes)
+            standings = standings_engine.table()
         
-        print(f"📊 Standings requested: {len(standings)} teams")
+        log_event('standings_listed', teams=len(standings), matchday=matchday)
         return jsonify(standings)
         
     except Exception as e:
-        print(f"Error in get_standings: {e}")
+        log_error('route_failed', e, route='get_standings')
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/standings', methods=['PUT'])
@@ -285,14 +476,15 @@ def update_standings():
         if not isinstance(new_standings, list):
             return jsonify({'error': 'Invalid data format'}), 400
         
-        if save_standings_data(new_standings):
-            print(f"📊 Standings updated: {len(new_standings)} teams")
-            return jsonify({'success': True, 'message': 'Standings updated successfully'})
-        else:
+        # The engine saves under its own locks (see StandingsEngine)
+        if not standings_engine.replace_table(new_standings):
             return jsonify({'error': 'Failed to save standings'}), 500
+        
+        log_event('standings_updated', sample=1.0, teams=len(new_standings))
+        return jsonify({'success': True, 'message': 'Standings updated successfully'})
             
     except Exception as e:
-        print(f"Error in update_standings: {e}")
+        log_error('route_failed', e, route='update_standings')
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/standings/reset', methods=['POST'])
@@ -301,41 +493,133 @@ def reset_standings():
     try:
         default_standings = initialize_default_standings()
         
-        if save_standings_data(default_standings):
-            print("📊 Standings reset to default")
-            return jsonify({'success': True, 'message': 'Standings reset successfully', 'standings': default_standings})
-        else:
+        if not standings_engine.replace_table(default_standings):
             return jsonify({'error': 'Failed to reset standings'}), 500
+        
+        log_event('standings_reset', sample=1.0)
+        return jsonify({'success': True, 'message': 'Standings reset successfully', 'standings': default_standings})
             
     except Exception as e:
-        print(f"Error in reset_standings: {e}")
+        log_error('route_failed', e, route='reset_standings')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/standings/rebuild', methods=['POST'])
+def rebuild_standings():
+    """Recompute the standings table from every finished match"""
+    try:
+        standings = standings_engine.rebuild(load_standings_data(), match_index.all())
+        log_event('standings_rebuilt', sample=1.0, teams=len(standings))
+        return jsonify({'success': True, 'standings': standings})
+        
+    except Exception as e:
+        log_error('route_failed', e, route='rebuild_standings')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/standings/timeline/<path:team>', methods=['GET'])
+def get_standings_timeline(team):
+    """Position and points of one team after every matchday"""
+    try:
+        timeline = standings_history.timeline(team)
+        if not timeline:
+            return jsonify({'error': 'Team not found'}), 404
+        return jsonify({'team': team, 'timeline': timeline})
+        
+    except Exception as e:
+        log_error('route_failed', e, route='get_standings_timeline')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/standings/projection', methods=['GET'])
+@response_cache.cached(['standings', 'matches', 'settings'], args=('simulations', 'model', 'home_advantage', 'seed'))
+def get_standings_projection():
+    """Probability of each team finishing in each classification zone"""
+    if not season_projection.available():
+        return jsonify({'error': 'Season projection requires NumPy (pip install numpy)'}), 503
+    try:
+        try:
+            simulations = int(request.args.get('simulations', 20000))
+            home_advantage = float(request.args.get('home_advantage', 1.1))
+            seed = request.args.get('seed')
+            seed = int(seed) if seed is not None else None
+        except ValueError:
+            return jsonify({'error': 'simulations, home_advantage and seed must be numbers'}), 400
+        
+        settings = load_settings_data()
+        projection = season_projection.project(
+            standings_engine.table(), match_index.all(), standings_engine.points(),
+            zones=settings.get('classificationZones'), simulations=simulations,
+            model=request.args.get('model', 'poisson'), home_advantage=home_advantage, seed=seed)
+        log_event('standings_projected', simulations=simulations, remaining=projection['remainingMatches'])
+        return jsonify(projection)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log_error('route_failed', e, route='get_standings_projection')
         return jsonify({'error': str(e)}), 500
 
 # Matches API endpoints
 @app.route('/api/matches', methods=['GET'])
+@response_cache.cached(['matches'], args=('matchday', 'status'))
 def get_matches():
     """Get all matches with optional filtering"""
     try:
-        matches = load_matches_data()
-        
-        # Filter by matchday if specified
+        # Filter by matchday / status (MatchIndex buckets, no scan of every match)
         matchday = request.args.get('matchday')
-        if matchday and matchday != 'all':
-            matches = [m for m in matches if m.get('matchday') == int(matchday)]
+        matchday = int(matchday) if matchday and matchday != 'all' else None
         
-        # Filter by status if specified
         status = request.args.get('status')
-        if status and status != 'all':
-            matches = [m for m in matches if m.get('status') == status]
+        status = status if status and status != 'all' else None
         
-        # Sort by date and matchday
-        matches.sort(key=lambda x: (x.get('matchday', 0), x.get('date', '')))
+        # Sorted by matchday and date, straight from the indexes
+        matches = match_index.query(matchday=matchday, status=status)
         
-        print(f"⚽ Matches requested: {len(matches)} matches")
+        log_event('matches_listed', count=len(matches), matchday=matchday, status=status)
         return jsonify(matches)
         
     except Exception as e:
-        print(f"Error in get_matches: {e}")
+        log_error('route_failed', e, route='get_matches')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/matches/team/<path:team>', methods=['GET'])
+@response_cache.cached(['matches'], args=('status',))
+def get_team_matches(team):
+    """Every fixture (home or away) for one team"""
+    try:
+        status = request.args.get('status')
+        status = status if status and status != 'all' else None
+        return jsonify(match_index.for_team(team, status=status))
+    except Exception as e:
+        log_error('route_failed', e, route='get_team_matches')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/matches/upcoming', methods=['GET'])
+def get_upcoming_matches():
+    """Next N unplayed matches by kickoff (?limit=5&team=)"""
+    try:
+        limit = min(max(int(request.args.get('limit', 5)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+    try:
+        return jsonify(match_index.upcoming(limit=limit, team=request.args.get('team')))
+    except Exception as e:
+        log_error('route_failed', e, route='get_upcoming_matches')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/matches/results', methods=['GET'])
+@response_cache.cached(['matches'], args=('from', 'to', 'team'))
+def get_match_results():
+    """Finished matches in a date range (?from=YYYY-MM-DD&to=YYYY-MM-DD&team=)"""
+    try:
+        start, end = request.args.get('from'), request.args.get('to')
+        for value in (start, end):
+            if value:
+                try:
+                    datetime.strptime(value[:10], '%Y-%m-%d')
+                except ValueError:
+                    return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+        return jsonify(match_index.results(start=start, end=end, team=request.args.get('team')))
+    except Exception as e:
+        log_error('route_failed', e, route='get_match_results')
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/matches', methods=['POST'])
@@ -343,21 +627,60 @@ def create_match():
     """Create a new match"""
     try:
         match_data = request.json
-        matches = load_matches_data()
         
-        # Add ID and timestamp
-        match_data['id'] = int(datetime.now().timestamp() * 1000)
+        if not isinstance(match_data, dict):
+            return jsonify({'error': 'Invalid data format'}), 400
+        errors = validate_match(match_data)
+        if errors:
+            return jsonify({'error': '; '.join(errors), 'errors': errors}), 400
         
-        matches.append(match_data)
+        # Read-modify-write under the cross-process lock so concurrent
+        # workers never drop each other's matches
+        with storage.lock('matches'):
+            # Timestamp-based ID, bumped past every ID in use
+            match_data['id'] = match_index.new_id()
+            
+            if not match_index.commit(None, match_data, save_matches_data):
+                return jsonify({'error': 'Failed to save match'}), 500
         
-        if save_matches_data(matches):
-            print(f"⚽ Match created: {match_data.get('homeTeam')} vs {match_data.get('awayTeam')}")
-            return jsonify({'success': True, 'match': match_data})
-        else:
-            return jsonify({'error': 'Failed to save match'}), 500
+        event_hub.publish('matches', {'type': 'match_created', 'match': match_data})
+        apply_match_changes([(None, match_data)])
+        log_event('match_created', sample=1.0, match_id=match_data['id'], home=match_data.get('homeTeam'), away=match_data.get('awayTeam'))
+        return jsonify({'success': True, 'match': match_data})
             
     except Exception as e:
-        print(f"Error in create_match: {e}")
+        log_error('route_failed', e, route='create_match')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/matches/batch', methods=['POST'])
+def batch_matches():
+    """Create, update and delete many matches with one validated write"""
+    try:
+        payload = request.get_json(silent=True)
+        operations = payload.get('operations') if isinstance(payload, dict) else payload
+        
+        if not isinstance(operations, list) or not operations:
+            return jsonify({'error': 'Expected a non-empty list of operations'}), 400
+        if len(operations) > MAX_OPERATIONS:
+            return jsonify({'error': f'At most {MAX_OPERATIONS} operations per batch'}), 400
+        
+        # Validate everything, then apply all of it or none of it
+        with storage.lock('matches'):
+            changes, results = plan_batch(operations, match_index)
+            if changes is None:
+                return jsonify({'success': False, 'results': results}), 400
+            if not match_index.commit_many(changes, save_matches_data):
+                return jsonify({'error': 'Failed to save matches'}), 500
+        
+        summary = {status: [r['id'] for r in results if r['status'] == status]
+                   for status in ('created', 'updated', 'deleted')}
+        event_hub.publish('matches', dict(summary, type='matches_batch'))
+        apply_match_changes(changes)
+        log_event('matches_batch', sample=1.0, **{k: len(v) for k, v in summary.items()})
+        return jsonify({'success': True, 'results': results})
+        
+    except Exception as e:
+        log_error('route_failed', e, route='batch_matches')
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/matches/<int:match_id>', methods=['PUT'])
@@ -365,61 +688,68 @@ def update_match(match_id):
     """Update an existing match"""
     try:
         match_data = request.json
-        matches = load_matches_data()
         
-        # Find and update the match
-        match_index = next((i for i, m in enumerate(matches) if m['id'] == match_id), None)
-        
-        if match_index is None:
-            return jsonify({'error': 'Match not found'}), 404
+        if not isinstance(match_data, dict):
+            return jsonify({'error': 'Invalid data format'}), 400
         
-        matches[match_index].update(match_data)
+        with storage.lock('matches'):
+            previous = match_index.get(match_id)
+            
+            if previous is None:
+                return jsonify({'error': 'Match not found'}), 404
+            
+            updated = dict(previous, **match_data)
+            updated['id'] = match_id
+            errors = validate_match(updated)
+            if errors:
+                return jsonify({'error': '; '.join(errors), 'errors': errors}), 400
+            
+            if not match_index.commit(previous, updated, save_matches_data, patch_match_data):
+                return jsonify({'error': 'Failed to save match'}), 500
         
-        if save_matches_data(matches):
-            print(f"⚽ Match updated: {matches[match_index].get('homeTeam')} vs {matches[match_index].get('awayTeam')}")
-            return jsonify({'success': True, 'match': matches[match_index]})
-        else:
-            return jsonify({'error': 'Failed to save match'}), 500
+        event_hub.publish('matches', {'type': 'match_updated', 'match': updated})
+        apply_match_changes([(previous, updated)])
+        log_event('match_updated', sample=1.0, match_id=match_id)
+        return jsonify({'success': True, 'match': updated})
             
     except Exception as e:
-        print(f"Error in update_match: {e}")
+        log_error('route_failed', e, route='update_match')
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/matches/<int:match_id>', methods=['DELETE'])
 def delete_match(match_id):
     """Delete a match"""
     try:
-        matches = load_matches_data()
-        
-        # Find and remove the match
-        match_index = next((i for i, m in enumerate(matches) if m['id'] == match_id), None)
-        
-        if match_index is None:
-            return jsonify({'error': 'Match not found'}), 404
-        
-        deleted_match = matches.pop(match_index)
+        with storage.lock('matches'):
+            deleted_match = match_index.get(match_id)
+            
+            if deleted_match is None:
+                return jsonify({'error': 'Match not found'}), 404
+            
+            if not match_index.commit(deleted_match, None, save_matches_data):
+                return jsonify({'error': 'Failed to save matches'}), 500
         
-        if save_matches_data(matches):
-            print(f"⚽ Match deleted: {deleted_match.get('homeTeam')} vs {deleted_match.get('awayTeam')}")
-            return jsonify({'success': True, 'message': 'Match deleted successfully'})
-        else:
-            return jsonify({'error': 'Failed to save matches'}), 500
+        event_hub.publish('matches', {'type': 'match_deleted', 'id': match_id})
+        apply_match_changes([(deleted_match, None)])
+        log_event('match_deleted', sample=1.0, match_id=match_id)
+        return jsonify({'success': True, 'message': 'Match deleted successfully'})
             
     except Exception as e:
-        print(f"Error in delete_match: {e}")
+        log_error('route_failed', e, route='delete_match')
         return jsonify({'error': str(e)}), 500
 
 # Settings API endpoints
 @app.route('/api/settings', methods=['GET'])
+@response_cache.cached(['settings'])
 def get_settings():
     """Get league settings"""
     try:
         settings = load_settings_data()
-        print(f"⚙️ Settings requested")
+        log_event('settings_read')
         return jsonify(settings)
         
     except Exception as e:
-        print(f"Error in get_settings: {e}")
+        log_error('route_failed', e, route='get_settings')
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/settings', methods=['PUT'])
@@ -428,16 +758,322 @@ def update_settings():
     try:
         settings_data = request.json
         
-        if save_settings_data(settings_data):
-            print(f"⚙️ Settings updated")
-            return jsonify({'success': True, 'settings': settings_data})
-        else:
-            return jsonify({'error': 'Failed to save settings'}), 500
+        with storage.lock('settings'):
+            if not save_settings_data(settings_data):
+                return jsonify({'error': 'Failed to save settings'}), 500
+        # Outside the settings lock, which the engine may take while loading;
+        # re-reading the settings keeps the last of concurrent saves in effect
+        standings_engine.update_points()
+        
+        event_hub.publish('settings', {'type': 'settings_updated', 'settings': settings_data})
+        log_event('settings_updated', sample=1.0)
+        return jsonify({'success': True, 'settings': settings_data})
             
     except Exception as e:
-        print(f"Error in update_settings: {e}")
+        log_error('route_failed', e, route='update_settings')
+        return jsonify({'error': str(e)}), 500
+
+# Teams, players, clubs and playoffs (data/tournament.json)
+@app.route('/api/teams', methods=['GET'])
+def get_teams():
+    """Get all teams"""
+    try:
+        return jsonify(tournament_store.get('teams', []))
+    except Exception as e:
+        log_error('route_failed', e, route='get_teams')
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/teams/<team_id>', methods=['GET'])
+def get_team(team_id):
+    """Get a team by id"""
+    try:
+        team = tournament_store.find('teams', team_id)
+        if team is None:
+            return jsonify({'error': 'Team not found'}), 404
+        return jsonify(team)
+    except Exception as e:
+        log_error('route_failed', e, route='get_team')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/players', methods=['GET'])
+def get_players():
+    """Get all players"""
+    try:
+        return jsonify(tournament_store.get('players', []))
+    except Exception as e:
+        log_error('route_failed', e, route='get_players')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/players/club/<club_id>', methods=['GET'])
+def get_club_players(club_id):
+    """Get the players of one club"""
+    try:
+        players = tournament_store.get('players', [])
+        return jsonify([p for p in players if str(p.get('clubId')) == club_id])
+    except Exception as e:
+        log_error('route_failed', e, route='get_club_players')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/players/<player_id>', methods=['GET'])
+def get_player(player_id):
+    """Get a player by id"""
+    try:
+        player = tournament_store.find('players', player_id)
+        if player is None:
+            return jsonify({'error': 'Player not found'}), 404
+        return jsonify(player)
+    except Exception as e:
+        log_error('route_failed', e, route='get_player')
+        return jsonify({'error': str(e)}), 500
+
+def _player_club(fields):
+    """The club named by clubId (or teamId), or None if it does not exist"""
+    club_id = fields.get('clubId', fields.get('teamId'))
+    if club_id in (None, ''):
+        return None
+    return tournament_store.find('clubs', club_id)
+
+@app.route('/api/players', methods=['POST'])
+def create_player():
+    """Register a new player"""
+    try:
+        player_data = request.get_json(silent=True) or {}
+        name = str(player_data.get('name') or player_data.get('playerName') or '').strip()
+        if not name:
+            return jsonify({'error': 'Player name is required'}), 400
+        
+        # Only the players section is rewritten; clips and matches are untouched
+        with tournament_store.lock():
+            club = _player_club(player_data)
+            if club is None:
+                return jsonify({'error': 'Club not found'}), 400
+            players = list(tournament_store.get('players', []))
+            player = {
+                'age': None,
+                'position': '',
+                'number': None,
+                'nationality': 'Panamá',
+                'photo': '',
+                **{k: v for k, v in player_data.items() if k not in ('playerName', 'teamId')},
+                'id': max((p['id'] for p in players if isinstance(p.get('id'), int)), default=0) + 1,
+                'name': name,
+                'clubId': club['id'],
+                'clubName': club.get('name'),
+                'registeredAt': datetime.now().isoformat(),
+            }
+            players.append(player)
+            tournament_store.save('players', players)
+        
+        log_event('player_created', sample=1.0, player_id=player['id'], club_id=club['id'])
+        return jsonify(player)
+    except Exception as e:
+        log_error('route_failed', e, route='create_player')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/players/<player_id>', methods=['PUT'])
+def update_player(player_id):
+    """Update an existing player"""
+    try:
+        player_data = request.get_json(silent=True) or {}
+        
+        with tournament_store.lock():
+            previous = tournament_store.find('players', player_id)
+            if previous is None:
+                return jsonify({'error': 'Player not found'}), 404
+            
+            updated = dict(previous, **{k: v for k, v in player_data.items() if k not in ('playerName', 'teamId')})
+            updated['id'] = previous['id']
+            if player_data.get('playerName'):
+                updated['name'] = str(player_data['playerName']).strip()
+            if 'clubId' in player_data or 'teamId' in player_data:
+                club = _player_club(player_data)
+                if club is None:
+                    return jsonify({'error': 'Club not found'}), 400
+                updated['clubId'], updated['clubName'] = club['id'], club.get('name')
+            
+            players = [updated if p is previous else p for p in tournament_store.get('players', [])]
+            tournament_store.save('players', players)
+        
+        log_event('player_updated', sample=1.0, player_id=updated['id'])
+        return jsonify(updated)
+    except Exception as e:
+        log_error('route_failed', e, route='update_player')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/players/<player_id>', methods=['DELETE'])
+def delete_player(player_id):
+    """Delete a player"""
+    try:
+        with tournament_store.lock():
+            player = tournament_store.find('players', player_id)
+            if player is None:
+                return jsonify({'error': 'Player not found'}), 404
+            tournament_store.save('players', [p for p in tournament_store.get('players', []) if p is not player])
+        
+        log_event('player_deleted', sample=1.0, player_id=player['id'])
+        return jsonify({'success': True, 'message': 'Player deleted successfully'})
+    except Exception as e:
+        log_error('route_failed', e, route='delete_player')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/players/<player_id>/stats', methods=['GET'])
+def get_player_stats(player_id):
+    """Goals, assists and clean sheets of one player"""
+    try:
+        return jsonify(dict(player_stats.player(player_id), playerId=player_id))
+    except Exception as e:
+        log_error('route_failed', e, route='get_player_stats')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/leaderboards/<board>', methods=['GET'])
+def get_leaderboard(board):
+    """Top players: scorers, assists or goalkeepers (clean sheets)"""
+    try:
+        if board not in LEADERBOARDS:
+            return jsonify({'error': f"Unknown leaderboard: {board}"}), 404
+        try:
+            limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        
+        leaders = []
+        for rank, (player_id, value) in enumerate(player_stats.leaderboard(board, limit), 1):
+            player = tournament_store.find('players', player_id) or {}
+            leaders.append({'rank': rank, 'playerId': player_id, 'name': player.get('name'),
+                            'club': player.get('clubName'), LEADERBOARDS[board]: value})
+        return jsonify(leaders)
+    except Exception as e:
+        log_error('route_failed', e, route='get_leaderboard')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/leaderboards/clubs', methods=['GET'])
+def get_club_leaderboard():
+    """Goals, assists and clean sheets per team"""
+    try:
+        return jsonify(player_stats.clubs())
+    except Exception as e:
+        log_error('route_failed', e, route='get_club_leaderboard')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/clubs', methods=['GET'])
+def get_clubs():
+    """Get all clubs"""
+    try:
+        return jsonify(tournament_store.get('clubs', []))
+    except Exception as e:
+        log_error('route_failed', e, route='get_clubs')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/clubs/<club_id>', methods=['GET'])
+def get_club(club_id):
+    """Get a club by id"""
+    try:
+        club = tournament_store.find('clubs', club_id)
+        if club is None:
+            return jsonify({'error': 'Club not found'}), 404
+        return jsonify(club)
+    except Exception as e:
+        log_error('route_failed', e, route='get_club')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/playoffs/bracket', methods=['GET'])
+def get_bracket():
+    """Get the current playoff bracket (null if none)"""
+    try:
+        return jsonify(tournament_store.get('tournament.currentBracket'))
+    except Exception as e:
+        log_error('route_failed', e, route='get_bracket')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/playoffs/bracket', methods=['POST'])
+def create_bracket():
+    """Create (or replace) the playoff bracket"""
+    try:
+        bracket_data = request.get_json(silent=True) or {}
+        if not all(bracket_data.get(field) for field in ('format', 'teams', 'matches')):
+            return jsonify({'error': 'format, teams and matches are required'}), 400
+        
+        bracket = {
+            'format': bracket_data['format'],
+            'teams': bracket_data['teams'],
+            'matches': bracket_data['matches'],
+            'createdAt': bracket_data.get('createdAt') or datetime.now().isoformat(),
+        }
+        tournament_store.save('tournament.currentBracket', bracket)
+        log_event('bracket_created', sample=1.0, format=bracket['format'])
+        return jsonify({'success': True, 'bracket': bracket})
+    except Exception as e:
+        log_error('route_failed', e, route='create_bracket')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/playoffs/bracket', methods=['DELETE'])
+def delete_bracket():
+    """Delete the playoff bracket"""
+    try:
+        tournament_store.save('tournament.currentBracket', None)
+        log_event('bracket_deleted', sample=1.0)
+        return jsonify({'success': True, 'message': 'Bracket deleted'})
+    except Exception as e:
+        log_error('route_failed', e, route='delete_bracket')
+        return jsonify({'error': str(e)}), 500
+
+# Bulk exports (streamed)
+@app.route('/api/export/<domain>', methods=['GET'])
+def export_data(domain):
+    """Stream clips, matches or standings as ?format=ndjson|csv (&gzip=1)"""
+    try:
+        args = request.args
+        fmt = args.get('format', 'ndjson')
+        compress = args.get('gzip', '0') not in ('0', '', 'false')
+        start, end = args.get('from') or None, args.get('to') or None
+        
+        if domain == 'clips':
+            category = args.get('category')
+            category = category if category and category != 'all' else None
+            records = iter_clips(clip_store, category=category, club=args.get('club') or None, start=start, end=end)
+            columns = [clip_store.category_field if c == 'type' else c for c in EXPORT_COLUMNS['clips']]
+        elif domain == 'matches':
+            try:
+                matchday = int(args['matchday']) if args.get('matchday') else None
+            except ValueError:
+                return jsonify({'error': 'matchday must be an integer'}), 400
+            team = args.get('team') or None
+            matches = match_index.for_team(team) if team else match_index.query(matchday=matchday)
+            # 'YYYY-MM-DD' + '~' sorts after every time on that day
+            records = (m for m in matches
+                       if (matchday is None or matchday_of(m) == matchday)
+                       and (not args.get('status') or status_of(m) == args['status'])
+                       and (not start or kickoff(m) >= start)
+                       and (not end or kickoff(m) <= end + '~'))
+            columns = None
+        elif domain == 'standings':
+            try:
+                matchday = int(args['matchday']) if args.get('matchday') else None
+            except ValueError:
+                return jsonify({'error': 'matchday must be an integer'}), 400
+            records = iter(standings_history.table(matchday) if matchday is not None else standings_engine.table())
+            columns = None
+        else:
+            return jsonify({'error': f"Unknown export: {domain} (expected clips, matches or standings)"}), 404
+        
+        log_event('data_exported', sample=1.0, domain=domain, format=fmt, gzip=compress)
+        return export_response(domain, records, fmt, compress, columns)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        log_error('route_failed', e, route='export_data')
+        return jsonify({'error': str(e)}), 500
+
+# Live updates (Server-Sent Events)
+@app.route('/api/events', methods=['GET'])
+def event_stream():
+    """Stream change events; ?topics=clips,counters,matches,standings,settings"""
+    try:
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+        return event_hub.response(request.args.get('topics'), last_event_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 if __name__ == '__main__':
     print(f"🚀 Servidor Flask simple iniciado en http://localhost:{PORT}")
     print(f"📁 Sirviendo archivos desde: {os.getcwd()}")
@@ -17,8 +17,56 @@ document.addEventListener('DOMContentLoaded', function() {
     console.log('✅ Página de posiciones inicializada');
 });
 
+// Server-Sent Events channel used by the Python servers (no socket.io there)
+function setupEventStream() {
+    if (!window.EventSource) return;
+    console.log('📡 Conectando al canal de eventos...');
+    
+    const events = new EventSource('/api/events?topics=matches,standings');
+    
+    events.addEventListener('standings', (e) => {
+        const data = JSON.parse(e.data);
+        console.log('📊 Actualizando tabla de posiciones...');
+        standingsData = data.standings;
+        if (document.querySelector('#table.active')) {
+            loadStandingsTable();
+        }
+    });
+    
+    const refreshMatches = () => {
+        console.log('⚽ Actualizando partidos...');
+        loadMatchesData().then(() => {
+            if (document.querySelector('#fixtures.active')) {
+                loadFixtures();
+            }
+            if (document.querySelector('#results.active')) {
+                loadResults();
+            }
+            if (document.querySelector('#schedule.active')) {
+                loadSchedule();
+            }
+        });
+    };
+    events.addEventListener('matches', refreshMatches);
+    
+    // El servidor perdió eventos que no llegamos a recibir: recargar todo
+    events.addEventListener('reset', () => {
+        loadStandingsData().then(() => {
+            if (document.querySelector('#table.active')) {
+                loadStandingsTable();
+            }
+        });
+        refreshMatches();
+    });
+}
+
 // WebSocket connection for real-time updates
 function setupWebSocket() {
+    if (typeof io === 'undefined') {
+        setupEventStream();
+        return;
+    }
+    
     console.log('🔌 Estableciendo conexión WebSocket...');
     
     const socket = io();
@@ -228,6 +276,12 @@ let playersStatsData = []; // Estadísticas de jugadores
 let totalGoals = 0;
 let totalAssists = 0;
 
+// Los servidores Python sirven los logos redimensionados (WebP si el navegador lo acepta)
+function logoUrl(path, width = 64) {
+    if (typeof io !== 'undefined' || !path || !path.startsWith('img/')) return path;
+    return `/api/images/${path.split('/').map(encodeURIComponent).join('/')}?w=${width}`;
+}
+
 // Función para obtener el número máximo de jornadas dinámicamente
 function getMaxMatchdays() {
     if (!fixturesData || fixturesData.length === 0) {
@@ -960,7 +1014,7 @@ async function loadStandingsTable() {
             <td class="position">${teamData.position}</td>
             <td class="team">
                 <div class="team-info">
-                    <img src="${logoPath}" alt="${teamInfo.name}" class="team-logo" onerror="this.onerror=null; this.src='img/default-team.png'">
+                    <img src="${logoUrl(logoPath)}" alt="${teamInfo.name}" class="team-logo" onerror="this.onerror=null; this.src='img/default-team.png'">
                     <span class="team-name">${teamInfo.name}</span>
                 </div>
             </td>
@@ -1250,7 +1304,7 @@ function createMatchCard(match) {
         return `
             <div class="team-logo-container">
                 <img 
-                    src="${teamInfo.logo}" 
+                    src="${logoUrl(teamInfo.logo)}" 
                     alt="${teamInfo.name}" 
                     class="team-logo" 
                     onerror="this.onerror=null; this.src='${transparentPixel}';"
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Standings table maintained from match results.
+
+The stored table (``standings_data.json``) is the engine's state. When a
+match is created, edited or deleted, only that match's old contribution is
+removed and its new one applied to the two teams involved; the whole season
+is replayed only on an explicit ``rebuild``. The ranked table is cached and
+re-sorted once per change, so GETs never sort. Given a ``version``
+callable (the storage backend's version for the standings domain), a table
+edited outside the server is picked up on the next read; given ``lock`` (the
+backend's cross-process lock), every mutation re-checks that version and
+writes while holding it, so several workers never overwrite each other's
+deltas.
+
+A failed table write never fails the match write that caused it: the
+engine keeps the updated table in memory (it is the one consistent with the
+matches), logs the error and retries the write on the next read or change,
+ignoring the stale file until the write lands.
+
+The engine owns its locking: every method takes the engine's own lock
+first and the backend lock second. Callers must not hold the standings
+lock when calling in, or they would take the two in the opposite order.
+"""
+import contextlib
+import threading
+
+from metrics import log_error
+
+
+def _new_row(team, team_id=None):
+    return {
+        'position': 0,
+        'team': team,
+        'teamId': team_id,
+        'played': 0,
+        'won': 0,
+        'drawn': 0,
+        'lost': 0,
+        'goalsFor': 0,
+        'goalsAgainst': 0,
+        'goalDifference': 0,
+        'points': 0
+    }
+
+
+def match_result(match):
+    """Return (home, away, home_goals, away_goals) for a finished match, else None"""
+    if not match or match.get('status') != 'finished':
+        return None
+    home, away = match.get('homeTeam'), match.get('awayTeam')
+    if not home or not away:
+        return None
+    try:
+        return home, away, int(match.get('homeScore')), int(match.get('awayScore'))
+    except (TypeError, ValueError):
+        return None
+
+
+def rank_key(row):
+    """Tiebreak order: points, goal difference, goals for"""
+    return (-row['points'], -row['goalDifference'], -row['goalsFor'])
+
+
+class StandingsEngine:
+    """Incrementally updated, cached standings table"""
+
+    def __init__(self, load_table, save_table, load_settings, version=None, lock=None):
+        self._load_table = load_table
+        self._save_table = save_table
+        self._load_settings = load_settings
+        self._version = version
+        self._file_lock = lock or contextlib.nullcontext
+        self._seen_version = None
+        self._lock = threading.RLock()
+        self._rows = None
+        self._points = None
+        self._ranked = None
+        self._listeners = []
+        self._order = None
+        self._unsaved = False
+
+    def _current_version(self):
+        return self._version() if self._version is not None else None
+
+    def _ensure_loaded(self):
+        if self._unsaved:
+            # Memory is ahead of the file: write it again rather than reload
+            with self._file_lock():
+                self._write()
+            return
+        if self._rows is not None and self._version is not None:
+            if self._current_version() != self._seen_version:
+                self._rows = None
+        if self._rows is None:
+            self._seen_version = self._current_version()
+            self._set_rows(self._load_table())
+            self._set_points(self._load_settings())
+
+    def _set_rows(self, rows):
+        self._rows = {}
+        for row in rows:
+            self._rows[row['team']] = dict(_new_row(row['team']), **row)
+        self._ranked = None
+        self._order = tuple(row['team'] for row in self._rank())
+
+    def _set_points(self, settings):
+        self._points = (
+            settings.get('pointsWin', 3),
+            settings.get('pointsDraw', 1),
+            settings.get('pointsLoss', 0)
+        )
+
+    def _row(self, team):
+        row = self._rows.get(team)
+        if row is None:
+            row = self._rows[team] = _new_row(team)
+        return row
+
+    def _apply(self, result, sign):
+        home, away, home_goals, away_goals = result
+        win, draw, loss = self._points
+        for team, scored, conceded in ((home, home_goals, away_goals), (away, away_goals, home_goals)):
+            row = self._row(team)
+            row['played'] += sign
+            row['goalsFor'] += sign * scored
+            row['goalsAgainst'] += sign * conceded
+            row['goalDifference'] = row['goalsFor'] - row['goalsAgainst']
+            if scored > conceded:
+                row['won'] += sign
+                row['points'] += sign * win
+            elif scored == conceded:
+                row['drawn'] += sign
+                row['points'] += sign * draw
+            else:
+                row['lost'] += sign
+                row['points'] += sign * loss
+
+    def _rank(self):
+        ranked = sorted(self._rows.values(), key=rank_key)
+        for i, row in enumerate(ranked):
+            row['position'] = i + 1
+        self._ranked = ranked
+        return ranked
+
+    def _write(self):
+        """Save the ranked table; on failure keep it marked unsaved for a retry"""
+        try:
+            saved = self._save_table(self._rank()) is not False
+        except Exception as e:
+            log_error('standings_save_failed', e)
+            saved = False
+        self._unsaved = not saved
+        if saved:
+            self._seen_version = self._current_version()
+        return saved
+
+    def _persist(self):
+        self._write()
+        self._notify()
+
+    def add_listener(self, listener):
+        """Call ``listener(table, reordered)`` after every change to the table"""
+        self._listeners.append(listener)
+
+    def _notify(self):
+        table = self._ranked if self._ranked is not None else self._rank()
+        order = tuple(row['team'] for row in table)
+        reordered = order != self._order
+        self._order = order
+        for listener in self._listeners:
+            try:
+                listener(table, reordered)
+            except Exception as e:
+                log_error('listener_failed', e, source='standings')
+
+    # ---- public API ----------------------------------------------------
+
+    def points(self):
+        """(win, draw, loss) points in effect"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._points
+
+    def table(self):
+        """Ranked table; sorted only after a change"""
+        with self._lock:
+            self._ensure_loaded()
+            return self._ranked if self._ranked is not None else self._rank()
+
+    def apply_match_change(self, old, new):
+        """Apply the result delta of one match mutation (old/new may be None)"""
+        return self.apply_match_changes([(old, new)])
+
+    def apply_match_changes(self, changes):
+        """Apply several ``(old, new)`` match deltas with a single table write"""
+        with self._lock, self._file_lock():
+            self._ensure_loaded()
+            changed = False
+            for old, new in changes:
+                before, after = match_result(old), match_result(new)
+                if before == after:
+                    continue
+                if before is not None:
+                    self._apply(before, -1)
+                if after is not None:
+                    self._apply(after, +1)
+                changed = True
+            if not changed:
+                return False
+            self._ranked = None
+            self._persist()
+            return True
+
+    def replace_table(self, rows):
+        """Save and adopt a table written wholesale (manual update or reset); False if not saved"""
+        with self._lock, self._file_lock():
+            if not self._save_table(rows):
+                return False
+            self._unsaved = False
+            self._set_rows(rows)
+            self._seen_version = self._current_version()
+            if self._points is None:
+                self._set_points(self._load_settings())
+            self._order = None
+            self._notify()
+            return True
+
+    def update_points(self, settings=None):
+        """Re-score every row after pointsWin/Draw/Loss changed (reloading the settings if not given)"""
+        with self._lock, self._file_lock():
+            self._ensure_loaded()
+            self._set_points(settings if settings is not None else self._load_settings())
+            win, draw, loss = self._points
+            for row in self._rows.values():
+                row['points'] = row['won'] * win + row['drawn'] * draw + row['lost'] * loss
+            self._ranked = None
+            self._persist()
+
+    def rebuild(self, roster, matches):
+        """Recompute the table from scratch from every finished match"""
+        with self._lock, self._file_lock():
+            self._rows = {}
+            for row in roster:
+                self._rows[row['team']] = _new_row(row['team'], row.get('teamId'))
+            self._set_points(self._load_settings())
+            for match in matches:
+                result = match_result(match)
+                if result is not None:
+                    self._apply(result, +1)
+            self._ranked = None
+            self._persist()
+            return self._ranked
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""The standings table as it stood after any matchday.
+
+For every matchday with matches, a cumulative snapshot holds each team's
+played, won, drawn, lost, goals for and goals against up to and including
+that round: the previous snapshot plus that round's finished matches, so a
+snapshot costs one round of matches, never a replay of the season. Points
+come from the W/D/L counts and the current points settings, so changing
+pointsWin/Draw/Loss needs no recomputation, and ranked tables are cached per
+matchday.
+
+``invalidate(matchdays)`` drops only the snapshots from the earliest edited
+round onward; they are recomputed on the next read. Given ``version`` (the
+storage version of the matches domain), matches edited outside the server
+drop every snapshot.
+
+Historical tables come from match results alone; manual edits to the stored
+table (``PUT /api/standings``) only affect the current one.
+"""
+import bisect
+import threading
+
+from match_index import matchday_of
+from standings_engine import _new_row, match_result, rank_key
+
+# Per-team counters in a snapshot
+PLAYED, WON, DRAWN, LOST, GOALS_FOR, GOALS_AGAINST = range(6)
+
+
+class StandingsHistory:
+    """Per-matchday cumulative standings snapshots"""
+
+    def __init__(self, engine, matches, version=None):
+        self._engine = engine
+        self._matches = matches
+        self._version = version
+        self._seen_version = None
+        self._lock = threading.RLock()
+        self._rounds = None    # matchdays, ascending
+        self._snapshots = []   # cumulative {team: (played, won, drawn, lost, gf, ga)} per round
+        self._tables = {}      # round index -> ((points, roster), ranked rows)
+
+    # ---- bookkeeping ---------------------------------------------------
+
+    def _current_version(self):
+        return self._version() if self._version is not None else None
+
+    def _ensure_rounds(self):
+        if self._rounds is not None and self._version is not None:
+            if self._current_version() != self._seen_version:
+                self._rounds = None
+        if self._rounds is None:
+            self._seen_version = self._current_version()
+            self._rounds = self._matches.matchdays()
+            self._snapshots = []
+            self._tables = {}
+
+    def _snapshot(self, i):
+        """Cumulative counters after round ``i``, computing missing ones from the last valid"""
+        while len(self._snapshots) <= i:
+            n = len(self._snapshots)
+            counters = {team: list(row) for team, row in (self._snapshots[n - 1] if n else {}).items()}
+            for match in self._matches.query(matchday=self._rounds[n], status='finished'):
+                result = match_result(match)
+                if result is None:
+                    continue
+                home, away, home_goals, away_goals = result
+                for team, scored, conceded in ((home, home_goals, away_goals), (away, away_goals, home_goals)):
+                    row = counters.get(team)
+                    if row is None:
+                        row = counters[team] = [0] * 6
+                    row[PLAYED] += 1
+                    row[GOALS_FOR] += scored
+                    row[GOALS_AGAINST] += conceded
+                    row[WON if scored > conceded else DRAWN if scored == conceded else LOST] += 1
+            self._snapshots.append({team: tuple(row) for team, row in counters.items()})
+        return self._snapshots[i]
+
+    def _table(self, i):
+        """Ranked rows after round ``i`` (``-1``: before the first round)"""
+        # Points settings and the roster come from the current table
+        points = self._engine.points()
+        current = {row['team']: row.get('teamId') for row in self._engine.table()}
+        key = (points, tuple(current.items()))
+        cached = self._tables.get(i)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        win, draw, loss = points
+        counters = self._snapshot(i) if i >= 0 else {}
+        rows = []
+        for team in list(current) + [team for team in counters if team not in current]:
+            row = _new_row(team, current.get(team))
+            c = counters.get(team)
+            if c is not None:
+                row.update(played=c[PLAYED], won=c[WON], drawn=c[DRAWN], lost=c[LOST],
+                           goalsFor=c[GOALS_FOR], goalsAgainst=c[GOALS_AGAINST],
+                           goalDifference=c[GOALS_FOR] - c[GOALS_AGAINST],
+                           points=c[WON] * win + c[DRAWN] * draw + c[LOST] * loss)
+            rows.append(row)
+        rows.sort(key=rank_key)
+        for position, row in enumerate(rows, 1):
+            row['position'] = position
+        self._tables[i] = (key, rows)
+        return rows
+
+    # ---- public API ----------------------------------------------------
+
+    def apply_match_changes(self, changes):
+        """Invalidate the rounds touched by ``(old, new)`` match changes"""
+        self.invalidate([matchday_of(match) for change in changes for match in change if match is not None])
+
+    def invalidate(self, matchdays):
+        """Forget the snapshots from the earliest of ``matchdays`` onward"""
+        with self._lock:
+            if self._rounds is None:
+                return
+            first = bisect.bisect_left(self._rounds, min(matchdays)) if matchdays else 0
+            del self._snapshots[first:]
+            for i in [i for i in self._tables if i >= first]:
+                del self._tables[i]
+            # Rounds before the edit keep their indexes; later ones may shift
+            self._rounds = self._matches.matchdays()
+            self._seen_version = self._current_version()
+
+    def table(self, matchday):
+        """The ranked table after every match up to and including ``matchday``"""
+        with self._lock:
+            self._ensure_rounds()
+            return self._table(bisect.bisect_right(self._rounds, matchday) - 1)
+
+    def timeline(self, team):
+        """``[{matchday, position, points, played}]`` for ``team``, one entry per matchday"""
+        with self._lock:
+            self._ensure_rounds()
+            timeline = []
+            for i, matchday in enumerate(self._rounds):
+                for row in self._table(i):
+                    if row['team'] == team:
+                        timeline.append({'matchday': matchday, 'position': row['position'],
+                                         'points': row['points'], 'played': row['played']})
+                        break
+            return timeline
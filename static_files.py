@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Static asset and media serving for the Flask servers.
+
+* Text assets (js/css/html/json/svg) get a strong ETag from their content
+  hash and precompressed gzip (and brotli, if the ``brotli`` module is
+  installed) variants written to ``.static_cache``. The variant is picked
+  from ``Accept-Encoding``; the cache is built in the background at startup
+  and refreshed per file when its mtime/size change.
+* ``Cache-Control`` is ``immutable`` for fingerprinted names
+  (``app.1a2b3c4d.js``) or URLs carrying ``?v=``, and ``no-cache``
+  (revalidate, usually a 304) otherwise.
+* Everything goes through ``send_file(conditional=True)``, which answers
+  Range requests with 206 for video scrubbing. The body is handed to the
+  server's ``wsgi.file_wrapper``, so gunicorn and similar servers send it
+  with zero-copy ``sendfile``. With ``LPCP_X_SENDFILE=1`` the app only sets
+  ``X-Sendfile`` and a fronting nginx/Apache streams the file.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = {'.html', '.css', '.js', '.json', '.svg', '.txt', '.xml', '.map'}
+FINGERPRINT_RE = re.compile(r'\.[0-9a-f]{8,}\.\w+$')
+SKIP_DIRS = {'.git', '.static_cache', 'node_modules', 'uploads', '__pycache__'}
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+class StaticFiles:
+    """Content-hashed, precompressed static file responses"""
+
+    def __init__(self, root='.', cache_dir='.static_cache', min_size=512):
+        self.root = os.path.abspath(root)
+        self.cache_dir = os.path.join(self.root, cache_dir)
+        self.min_size = min_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    # ---- precompressed variants ----------------------------------------
+
+    def _variant_path(self, digest, encoding):
+        return os.path.join(self.cache_dir, f"{digest}.{encoding}")
+
+    def _build_entry(self, path, st):
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        variants = {}
+
+        if len(data) >= self.min_size:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            encoders = [('gzip', lambda d: gzip.compress(d, 9, mtime=0))]
+            if brotli is not None:
+                encoders.insert(0, ('br', lambda d: brotli.compress(d, quality=11)))
+            for encoding, compress in encoders:
+                variant = self._variant_path(digest, encoding)
+                if not os.path.exists(variant):
+                    packed = compress(data)
+                    if len(packed) >= len(data):
+                        continue
+                    tmp = f"{variant}.{os.getpid()}.tmp"
+                    with open(tmp, 'wb') as f:
+                        f.write(packed)
+                    os.replace(tmp, variant)
+                variants[encoding] = variant
+
+        return {'stat': (st.st_mtime_ns, st.st_size), 'etag': digest, 'variants': variants}
+
+    def _entry(self, path, st):
+        entry = self._entries.get(path)
+        if entry is None or entry['stat'] != (st.st_mtime_ns, st.st_size):
+            entry = self._build_entry(path, st)
+            with self._lock:
+                self._entries[path] = entry
+        return entry
+
+    def build(self):
+        """Hash and precompress every text asset under the root"""
+        count = 0
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.')]
+            for name in filenames:
+                if os.path.splitext(name)[1].lower() not in COMPRESSIBLE:
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    self._entry(path, os.stat(path))
+                    count += 1
+                except OSError:
+                    pass
+        return count
+
+    def build_in_background(self):
+        threading.Thread(target=self.build, daemon=True).start()
+
+    # ---- responses -----------------------------------------------------
+
+    def send(self, directory, filename, cache_control=REVALIDATE):
+        """Serve ``directory/filename`` with ETag, Range and cache headers"""
+        path = safe_join(os.path.abspath(directory), filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+        st = os.stat(path)
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        compressible = os.path.splitext(path)[1].lower() in COMPRESSIBLE
+
+        body_path, etag, encoding = path, True, None
+        if compressible:
+            entry = self._entry(path, st)
+            etag = entry['etag']
+            encoding = request.accept_encodings.best_match(list(entry['variants']))
+            if encoding:
+                body_path = entry['variants'][encoding]
+                etag = f"{etag}-{encoding}"
+
+        response = send_file(body_path, mimetype=mimetype, conditional=True,
+                             etag=etag, last_modified=st.st_mtime, max_age=None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if compressible:
+            response.vary.add('Accept-Encoding')
+
+        if FINGERPRINT_RE.search(filename) or 'v' in request.args:
+            cache_control = IMMUTABLE
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+
+def configure_sendfile(app):
+    """Let a fronting web server stream files when LPCP_X_SENDFILE=1"""
+    app.config['USE_X_SENDFILE'] = os.environ.get('LPCP_X_SENDFILE') == '1'
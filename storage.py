@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""Pluggable persistence for the league data used by simple_server.py.
+
+Three backends share one small interface (``load``/``save``/``version``/
+``lock`` per domain); filtering and sorting happen in the in-memory
+ClipStore and MatchIndex, not in the backend:
+
+* ``JsonBackend``   - one pretty-printed JSON file per domain (the default,
+                      identical on disk to what the server always wrote)
+* ``NdjsonBackend`` - one compact record per line plus an id -> offset index,
+                      read through ``mmap`` so one record can be fetched or
+                      patched without parsing the rest
+* ``SqliteBackend`` - a single WAL-mode SQLite database, one table per
+                      domain with a versioned, transactional rewrite
+
+Select with ``LPCP_STORAGE=json|ndjson|sqlite`` (``LPCP_SQLITE_PATH`` sets
+the database file). Existing data is copied between formats with::
+
+    python storage.py migrate [lpcp.db]             # json -> sqlite
+    python storage.py convert json ndjson           # and back: ndjson json
+
+Several worker processes may share one data directory. ``lock(domain)`` is a
+cross-process advisory lock (``flock`` on a ``.lock`` sidecar) to hold
+around a read-modify-write, JSON snapshots are committed atomically
+(temp file, fsync, rename), and ``save(..., expected_version=v)`` raises
+``StaleWriteError`` instead of overwriting a newer version.
+"""
+import json
+import mmap
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks are process-local only
+    fcntl = None
+
+from metrics import observe_io
+
+DOMAINS = ('clips', 'standings', 'matches', 'settings')
+
+JSON_FILES = {
+    'clips': 'clips_data.json',
+    'standings': 'standings_data.json',
+    'matches': 'matches_data.json',
+    'settings': 'league_settings.json',
+}
+
+SQLITE_PATH = 'lpcp.db'
+
+
+class StaleWriteError(Exception):
+    """The domain changed since the version the caller read"""
+
+    def __init__(self, domain, expected, actual):
+        super().__init__(f"{domain} changed on disk (expected version {expected}, found {actual})")
+        self.domain = domain
+        self.expected = expected
+        self.actual = actual
+
+
+class CorruptDataError(ValueError):
+    """A stored document exists but cannot be parsed"""
+
+
+class FileLock:
+    """Reentrant exclusive lock shared by threads and processes.
+
+    Threads of one process serialize on an RLock; processes on ``flock`` of
+    ``path``. The descriptor is reopened after a fork so a parent and child
+    never share (and thus bypass) the same lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+        self._pid = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        try:
+            if self._depth == 0:
+                if self._fd is None or self._pid != os.getpid():
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                    self._pid = os.getpid()
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX)
+            self._depth += 1
+        except BaseException:
+            self._lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+
+def atomic_write(path, raw):
+    """Replace ``path`` with ``raw`` so readers see the old or the new file, never a torn one"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+class JsonBackend:
+    """One JSON document per domain"""
+
+    name = 'json'
+
+    def __init__(self, files=None):
+        self.files = dict(JSON_FILES, **(files or {}))
+        self._locks = {domain: FileLock(path + '.lock') for domain, path in self.files.items()}
+
+    def lock(self, domain):
+        """Cross-process lock to hold around a read-modify-write of ``domain``"""
+        return self._locks[domain]
+
+    def load(self, domain):
+        """Return the stored document, or None if it was never saved.
+
+        Raises CorruptDataError rather than guessing when the file exists but
+        is not valid JSON.
+        """
+        path = self.files[domain]
+        start = time.perf_counter()
+        try:
+            with open(path, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            raise CorruptDataError(f"{path} is not valid JSON: {e}") from e
+        observe_io('load', domain, len(raw), time.perf_counter() - start)
+        return data
+
+    def save(self, domain, data, expected_version=None):
+        """Atomically replace the document; with ``expected_version``, only if still current"""
+        path = self.files[domain]
+        start = time.perf_counter()
+        raw = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        with self.lock(domain):
+            before = self.version(domain)
+            if expected_version is not None and before != expected_version:
+                raise StaleWriteError(domain, expected_version, before)
+            atomic_write(path, raw)
+            # The mtime is the version; keep it strictly increasing even when
+            # two commits land within one filesystem timestamp tick
+            after = self.version(domain)
+            if before is not None and after is not None and after <= before:
+                os.utime(path, ns=(before + 1, before + 1))
+        observe_io('save', domain, len(raw), time.perf_counter() - start)
+
+    def version(self, domain):
+        try:
+            return os.stat(self.files[domain]).st_mtime_ns
+        except OSError:
+            return None
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    domain TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clips (
+    pos INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS matches (
+    pos INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS standings (
+    pos INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    pos INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+-- Query indexes from older databases; nothing reads through them
+DROP INDEX IF EXISTS clips_id;
+DROP INDEX IF EXISTS clips_type_date;
+DROP INDEX IF EXISTS clips_club_date;
+DROP INDEX IF EXISTS clips_date;
+DROP INDEX IF EXISTS matches_id;
+DROP INDEX IF EXISTS matches_day_date;
+DROP INDEX IF EXISTS matches_status_day_date;
+"""
+
+
+def _dumps(record):
+    return json.dumps(record, ensure_ascii=False)
+
+
+class SqliteBackend:
+    """All domains in one SQLite database (WAL mode)"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._locks = {domain: FileLock(f'{path}.{domain}.lock') for domain in DOMAINS}
+        with self._conn() as conn:
+            conn.executescript(_SCHEMA)
+
+    def lock(self, domain):
+        """Cross-process lock to hold around a read-modify-write of ``domain``"""
+        return self._locks[domain]
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def version(self, domain):
+        row = self._conn().execute('SELECT version FROM meta WHERE domain = ?', (domain,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, domain):
+        conn = self._conn()
+        if self.version(domain) is None:
+            return None
+        start = time.perf_counter()
+        rows = conn.execute(f'SELECT data FROM {domain} ORDER BY pos').fetchall()
+        records = [json.loads(r[0]) for r in rows]
+        observe_io('load', domain, sum(len(r[0]) for r in rows), time.perf_counter() - start)
+        if domain == 'settings':
+            return records[0] if records else {}
+        return records
+
+    def save(self, domain, data, expected_version=None):
+        records = [data] if domain == 'settings' else data
+        rows = [(i, _dumps(r)) for i, r in enumerate(records)]
+        insert = f'INSERT INTO {domain} (pos, data) VALUES (?, ?)'
+
+        start = time.perf_counter()
+        conn = self._conn()
+        with conn:
+            # Take the write lock up front so the version check and the
+            # rewrite are one atomic step
+            conn.execute('BEGIN IMMEDIATE')
+            if expected_version is not None:
+                current = self.version(domain)
+                if current != expected_version:
+                    raise StaleWriteError(domain, expected_version, current)
+            conn.execute(f'DELETE FROM {domain}')
+            conn.executemany(insert, rows)
+            conn.execute(
+                'INSERT INTO meta (domain, version) VALUES (?, 1) '
+                'ON CONFLICT(domain) DO UPDATE SET version = version + 1',
+                (domain,))
+        observe_io('save', domain, sum(len(r[-1]) for r in rows), time.perf_counter() - start)
+
+
+class NdjsonBackend(JsonBackend):
+    """One compact JSON record per line, located through an id -> offset index.
+
+    ``<name>.ndjson`` holds one record per line (settings is a single line).
+    The ``.idx`` sidecar starts with a header naming the data file's inode
+    and then lists ``[key, offset, length]`` per record, in stored order; the
+    key is the record's ``id`` (its position for domains without ids). Index
+    entries are kept in memory as plain tuples and records are read through
+    ``mmap``, so ``get_record`` parses one line and ``patch_record`` appends
+    the new version of one record (and one index line) instead of rewriting
+    the file. A full ``save`` writes both files compactly again.
+
+    A repeated key is stored as ``#<position>`` so it never hides the earlier
+    record. Patch lines are written as ``{"#patch": key, "record": ...}`` so
+    a rescan can tell a new version of a record from a duplicate.
+
+    The index is only a cache: if it does not describe the data file (other
+    inode, different size, a crash between the two writes) it is rebuilt by
+    scanning the lines.
+    """
+
+    name = 'ndjson'
+
+    def __init__(self, files=None):
+        files = dict(JSON_FILES, **(files or {}))
+        super().__init__({domain: os.path.splitext(path)[0] + '.ndjson' for domain, path in files.items()})
+        # domain -> ((inode, size) of the data file, {key: (offset, length)})
+        self._indexes = {}
+
+    def _index_path(self, domain):
+        return self.files[domain] + '.idx'
+
+    @staticmethod
+    def _encode(record):
+        return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    @staticmethod
+    def _key(record, pos):
+        if isinstance(record, dict) and record.get('id') is not None:
+            return record['id']
+        return pos
+
+    # ---- index ---------------------------------------------------------
+
+    @staticmethod
+    def _unwrap(item):
+        if isinstance(item, dict) and '#patch' in item:
+            return item['record']
+        return item
+
+    def _scan(self, path):
+        """Rebuild the index from the data lines, keying duplicates as ``save`` does"""
+        entries = {}
+        offset = 0
+        pos = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                length = len(line.rstrip(b'\n'))
+                if length:
+                    try:
+                        record = json.loads(line)
+                    except ValueError as e:
+                        raise CorruptDataError(f"{path} has an invalid line at byte {offset}: {e}") from e
+                    if isinstance(record, dict) and '#patch' in record:
+                        # A newer version of a record: replaces it, keeps its position
+                        entries[record['#patch']] = (offset, length)
+                    else:
+                        key = self._key(record, pos)
+                        if key in entries:
+                            key = f'#{pos}'
+                        entries[key] = (offset, length)
+                        pos += 1
+                offset += len(line)
+        return entries
+
+    def _read_index(self, domain, stat):
+        try:
+            with open(self._index_path(domain), 'rb') as f:
+                header = json.loads(f.readline() or b'null')
+                if not isinstance(header, dict) or header.get('inode') != stat.st_ino:
+                    return None
+                entries = {}
+                end = 0
+                for line in f:
+                    key, offset, length = json.loads(line)
+                    entries[key] = (offset, length)
+                    end = max(end, offset + length + 1)
+        except (OSError, ValueError, TypeError):
+            return None
+        return entries if end == stat.st_size else None
+
+    def _write_index(self, domain, inode, entries):
+        lines = [json.dumps({'inode': inode}).encode('utf-8')]
+        lines += [json.dumps([key, offset, length]).encode('utf-8') for key, (offset, length) in entries.items()]
+        atomic_write(self._index_path(domain), b'\n'.join(lines) + b'\n')
+
+    def _index(self, domain):
+        """``(stat, entries)`` for the current data file, or None if it does not exist"""
+        path = self.files[domain]
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stamp = (stat.st_ino, stat.st_size)
+        cached = self._indexes.get(domain)
+        if cached is not None and cached[0] == stamp:
+            return stat, cached[1]
+        entries = self._read_index(domain, stat)
+        if entries is None:
+            with self.lock(domain):
+                entries = self._scan(path)
+                self._write_index(domain, stat.st_ino, entries)
+        self._indexes[domain] = (stamp, entries)
+        return stat, entries
+
+    # ---- records -------------------------------------------------------
+
+    def _read(self, domain, spans):
+        path = self.files[domain]
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                try:
+                    return [self._unwrap(json.loads(mm[offset:offset + length])) for offset, length in spans]
+                except ValueError as e:
+                    raise CorruptDataError(f"{path} does not match its index: {e}") from e
+
+    def load(self, domain):
+        """Return the stored document, or None if it was never saved"""
+        start = time.perf_counter()
+        index = self._index(domain)
+        if index is None:
+            return None
+        stat, entries = index
+        records = self._read(domain, entries.values())
+        observe_io('load', domain, stat.st_size, time.perf_counter() - start)
+        if domain == 'settings':
+            return records[0] if records else {}
+        return records
+
+    def get_record(self, domain, key):
+        """Parse and return the single record stored under ``key``, or None"""
+        index = self._index(domain)
+        if index is None or key not in index[1]:
+            return None
+        record, = self._read(domain, [index[1][key]])
+        if self._key(record, key) != key and not str(key).startswith('#'):
+            # Index out of step with the data: rebuild it and try once more
+            self._indexes.pop(domain, None)
+            os.remove(self._index_path(domain))
+            index = self._index(domain)
+            if key not in index[1]:
+                return None
+            record, = self._read(domain, [index[1][key]])
+        return record
+
+    def patch_record(self, domain, key, fields, expected_version=None):
+        """Update one record in place of a full rewrite; return it, or None if missing.
+
+        The new version is appended to the data file and the index, leaving
+        the old line as dead space until the next full ``save``.
+        """
+        path = self.files[domain]
+        start = time.perf_counter()
+        with self.lock(domain):
+            before = self.version(domain)
+            if expected_version is not None and before != expected_version:
+                raise StaleWriteError(domain, expected_version, before)
+            record = self.get_record(domain, key)
+            if record is None:
+                return None
+            record.update(fields)
+            raw = self._encode({'#patch': key, 'record': record})
+
+            stat, entries = self._index(domain)
+            with open(path, 'ab') as f:
+                f.write(raw + b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+            entry = (stat.st_size, len(raw))
+            with open(self._index_path(domain), 'ab') as f:
+                f.write(json.dumps([key, *entry]).encode('utf-8') + b'\n')
+            entries[key] = entry
+            self._indexes[domain] = ((stat.st_ino, stat.st_size + len(raw) + 1), entries)
+
+            after = self.version(domain)
+            if before is not None and after is not None and after <= before:
+                os.utime(path, ns=(before + 1, before + 1))
+        observe_io('save', domain, len(raw), time.perf_counter() - start)
+        return record
+
+    def save(self, domain, data, expected_version=None):
+        """Atomically rewrite the records and a fresh index"""
+        path = self.files[domain]
+        start = time.perf_counter()
+        records = [data] if domain == 'settings' else data
+        lines = [self._encode(record) for record in records]
+        raw = b''.join(line + b'\n' for line in lines)
+        entries = {}
+        offset = 0
+        for pos, (record, line) in enumerate(zip(records, lines)):
+            key = self._key(record, pos)
+            if key in entries:
+                # A repeated id must not hide the earlier record
+                key = f'#{pos}'
+            entries[key] = (offset, len(line))
+            offset += len(line) + 1
+
+        with self.lock(domain):
+            before = self.version(domain)
+            if expected_version is not None and before != expected_version:
+                raise StaleWriteError(domain, expected_version, before)
+            atomic_write(path, raw)
+            stat = os.stat(path)
+            self._write_index(domain, stat.st_ino, entries)
+            self._indexes[domain] = ((stat.st_ino, stat.st_size), entries)
+            after = self.version(domain)
+            if before is not None and after is not None and after <= before:
+                os.utime(path, ns=(before + 1, before + 1))
+        observe_io('save', domain, len(raw), time.perf_counter() - start)
+
+
+def get_storage(files=None):
+    """Build the backend selected by LPCP_STORAGE"""
+    kind = os.environ.get('LPCP_STORAGE', 'json').lower()
+    if kind == 'sqlite':
+        return SqliteBackend(os.environ.get('LPCP_SQLITE_PATH', SQLITE_PATH))
+    if kind == 'ndjson':
+        return NdjsonBackend(files)
+    if kind != 'json':
+        raise ValueError(f"Unknown LPCP_STORAGE backend: {kind}")
+    return JsonBackend(files)
+
+
+BACKENDS = {'json': JsonBackend, 'ndjson': NdjsonBackend, 'sqlite': SqliteBackend}
+
+
+def convert(source, target):
+    """Copy every domain stored in ``source`` into ``target``; return record counts"""
+    copied = {}
+    for domain in DOMAINS:
+        data = source.load(domain)
+        if data is None:
+            continue
+        target.save(domain, data)
+        copied[domain] = len(data) if isinstance(data, list) else 1
+    return copied
+
+
+def migrate_json_to_sqlite(files=None, db_path=SQLITE_PATH):
+    """Copy every existing JSON domain file into a SQLite database"""
+    return convert(JsonBackend(files), SqliteBackend(db_path))
+
+
+def _backend(kind, db_path=SQLITE_PATH):
+    if kind == 'sqlite':
+        return SqliteBackend(db_path)
+    return BACKENDS[kind]()
+
+
+if __name__ == '__main__':
+    usage = ("Uso: python storage.py migrate [archivo.db]\n"
+             "     python storage.py convert <origen> <destino> [archivo.db]   (json, ndjson, sqlite)")
+    args = sys.argv[1:]
+    if args[:1] == ['migrate'] and len(args) <= 2:
+        source, target = 'json', 'sqlite'
+        db_path = args[1] if len(args) > 1 else SQLITE_PATH
+    elif args[:1] == ['convert'] and len(args) in (3, 4) and set(args[1:3]) <= set(BACKENDS) and args[1] != args[2]:
+        source, target = args[1], args[2]
+        db_path = args[3] if len(args) > 3 else SQLITE_PATH
+    else:
+        print(usage)
+        sys.exit(1)
+
+    where = db_path if target == 'sqlite' else target
+    for domain, count in convert(_backend(source, db_path), _backend(target, db_path)).items():
+        print(f"✅ {domain}: {count} registros copiados a {where}")
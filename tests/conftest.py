@@ -0,0 +1,25 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """A fresh simple_server module whose data files live in ``tmp_path``"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('LPCP_STORAGE', 'json')
+    sys.modules.pop('simple_server', None)
+    module = importlib.import_module('simple_server')
+    module.app.config['TESTING'] = True
+    yield module
+    sys.modules.pop('simple_server', None)
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
@@ -0,0 +1,50 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from chunked_upload import UploadError, UploadSessions
+
+
+def test_upload_in_chunks_and_finalize(tmp_path):
+    sessions = UploadSessions(str(tmp_path), max_size=1024)
+    data = b'0123456789' * 10
+    session = sessions.create('clip.mp4', len(data))
+    assert sessions.append(session['id'], 0, io.BytesIO(data[:60]), 60) == 60
+    with pytest.raises(UploadError) as error:
+        sessions.append(session['id'], 0, io.BytesIO(data[60:]), 40)
+    assert error.value.status == 409 and error.value.extra['offset'] == 60
+    sessions.append(session['id'], 60, io.BytesIO(data[60:]), 40)
+
+    _, part_path, digest = sessions.finalize(session['id'])
+    assert digest == hashlib.sha256(data).hexdigest()
+    with open(part_path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_idle_sessions_expire_and_free_their_slots(tmp_path):
+    sessions = UploadSessions(str(tmp_path), max_size=1024, max_sessions=2, ttl=60, sweep_interval=0)
+    stale = [sessions.create('clip.mp4', 10) for _ in range(2)]
+    with pytest.raises(UploadError) as error:
+        sessions.create('clip.mp4', 10)
+    assert error.value.status == 429
+
+    for session in stale:
+        session['last_activity'] -= 120
+    fresh = sessions.create('clip.mp4', 10)
+    assert fresh['id'] not in [s['id'] for s in stale]
+    assert sorted(os.listdir(sessions.partial_folder)) == sorted([f"{fresh['id']}.json", f"{fresh['id']}.part"])
+    with pytest.raises(UploadError) as error:
+        sessions.status(stale[0]['id'])
+    assert error.value.status == 404
+
+
+def test_orphaned_files_from_before_a_restart_are_swept(tmp_path):
+    old = UploadSessions(str(tmp_path), max_size=1024)
+    session = old.create('clip.mp4', 10)
+    for name in os.listdir(old.partial_folder):
+        os.utime(os.path.join(old.partial_folder, name), (0, 0))
+
+    UploadSessions(str(tmp_path), max_size=1024, ttl=60).create('clip.mp4', 10)
+    assert not any(name.startswith(session['id']) for name in os.listdir(old.partial_folder))
@@ -0,0 +1,47 @@
+from clip_store import ClipStore
+from counter_journal import CounterJournal
+
+
+def make_store(tmp_path, clips):
+    saved = []
+    store = ClipStore(str(tmp_path / 'clips.json'), lambda: [dict(c) for c in clips],
+                      lambda data, expected_version=None: saved.append(list(data)) or True,
+                      journal=CounterJournal(str(tmp_path / 'counters.log')), flush_delay=60)
+    return store, saved
+
+
+def clip(clip_id, date, **fields):
+    return dict({'id': clip_id, 'upload_date': date, 'type': 'goles', 'views': 0}, **fields)
+
+
+def test_pages_are_newest_first(tmp_path):
+    store, _ = make_store(tmp_path, [clip('a', '2025-01-01'), clip('b', '2025-01-03'), clip('c', '2025-01-02')])
+    assert [c['id'] for c in store.page(limit=2)] == ['b', 'c']
+    first, has_more = store.page_after(None, None, 2)
+    rest, _ = store.page_after(None, ('2025-01-02', 'c'), 2)
+    assert has_more and [c['id'] for c in first + rest] == ['b', 'c', 'a']
+    store.close()
+
+
+def test_sha256_lookup_follows_adds_updates_and_removes(tmp_path):
+    store, _ = make_store(tmp_path, [clip('a', '2025-01-01', sha256='aa')])
+    assert store.get_by_sha256('aa')['id'] == 'a'
+    store.add(clip('b', '2025-01-02', sha256='bb'))
+    assert store.get_by_sha256('bb')['id'] == 'b'
+    store.update('b', {'sha256': 'cc'})
+    assert store.get_by_sha256('bb') is None and store.get_by_sha256('cc')['id'] == 'b'
+    store.remove('a')
+    assert store.get_by_sha256('aa') is None
+    store.close()
+
+
+def test_journaled_increments_survive_a_reload(tmp_path):
+    store, saved = make_store(tmp_path, [clip('a', '2025-01-01')])
+    store.increment('a', 'views')
+    store.increment('a', 'views')
+    assert store.get('a')['views'] == 2
+    store.reload()
+    assert store.get('a')['views'] == 2
+    store.compact()
+    assert saved and saved[-1][0]['views'] == 2
+    store.close()
@@ -0,0 +1,41 @@
+from counter_journal import CounterJournal
+
+
+def test_replay_returns_appended_increments(tmp_path):
+    journal = CounterJournal(str(tmp_path / 'counters.log'))
+    journal.append('a', 'views')
+    journal.append('a', 'likes', 2)
+    entries, nbytes = journal.replay(None)
+    assert [tuple(e) for e in entries] == [('a', 'views', 1), ('a', 'likes', 2)]
+    assert nbytes == journal.size()
+
+
+def test_crash_after_the_snapshot_skips_the_folded_prefix(tmp_path):
+    journal = CounterJournal(str(tmp_path / 'counters.log'))
+    journal.append('a', 'views')
+    marker = journal.begin_compaction(data_mtime=100, nbytes=journal.size())
+    journal.append('a', 'views', 5)
+    # The snapshot landed (mtime moved on) but the journal was never trimmed
+    entries, _ = CounterJournal(journal.path).replay(200)
+    assert [tuple(e) for e in entries] == [('a', 'views', 5)]
+    assert marker['bytes'] > 0
+
+
+def test_crash_before_the_snapshot_keeps_the_whole_journal(tmp_path):
+    journal = CounterJournal(str(tmp_path / 'counters.log'))
+    journal.append('a', 'views')
+    journal.begin_compaction(data_mtime=100, nbytes=journal.size())
+    journal.append('a', 'views', 5)
+    entries, _ = CounterJournal(journal.path).replay(100)
+    assert [tuple(e) for e in entries] == [('a', 'views', 1), ('a', 'views', 5)]
+
+
+def test_append_after_a_torn_line_starts_a_new_line(tmp_path):
+    path = str(tmp_path / 'counters.log')
+    with open(path, 'wb') as f:
+        f.write(b'["a", "views", 1]\n["a", "vi')
+    journal = CounterJournal(path)
+    written = journal.append('a', 'likes', 2)
+    entries, nbytes = journal.replay(None)
+    assert [tuple(e) for e in entries] == [('a', 'views', 1), ('a', 'likes', 2)]
+    assert nbytes == journal.size() == len(b'["a", "views", 1]\n["a", "vi') + written
@@ -0,0 +1,44 @@
+import threading
+
+from event_hub import EventHub
+
+
+def test_stream_delivers_events_after_the_cursor():
+    hub = EventHub(heartbeat=0.05)
+    stream = hub.stream(['clips'])
+    assert next(stream).startswith('retry:')
+    hub.publish('counters', {'skip': True})
+    hub.publish('clips', {'type': 'clip_added'})
+    frame = next(stream)
+    assert 'event: clips' in frame and 'clip_added' in frame and 'skip' not in frame
+
+
+def test_subscriber_cap_holds_under_concurrent_subscribes():
+    hub = EventHub(max_subscribers=5)
+    barrier = threading.Barrier(20)
+    responses = []
+
+    def subscribe():
+        barrier.wait()
+        responses.append(hub.response())
+
+    threads = [threading.Thread(target=subscribe) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(r.status_code for r in responses) == [200] * 5 + [503] * 15
+    assert hub.subscribers == 5
+    for response in responses:
+        response.close()
+    assert hub.subscribers == 0
+
+
+def test_events_route_frees_its_slot_when_the_client_disconnects(server, client):
+    response = client.get('/api/events?topics=clips', buffered=False)
+    assert response.status_code == 200
+    assert next(response.response).startswith(b'retry:')
+    assert server.event_hub.subscribers == 1
+    response.close()
+    assert server.event_hub.subscribers == 0
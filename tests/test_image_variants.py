@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask
+
+import image_variants
+from image_variants import ImageVariants
+
+Image = pytest.importorskip('PIL.Image')
+
+
+@pytest.fixture
+def variants(tmp_path):
+    (tmp_path / 'img').mkdir()
+    Image.new('RGBA', (300, 150), (255, 0, 0, 128)).save(tmp_path / 'img' / 'logo.png')
+    variants = ImageVariants(str(tmp_path), max_workers=1)
+    # Threads instead of processes so the tests can slow the renderer down
+    variants._pool = ThreadPoolExecutor(max_workers=2)
+    app = Flask(__name__)
+    app.add_url_rule('/api/images/<path:filename>', 'images', variants.send)
+    variants.client = app.test_client()
+    yield variants
+    variants.shutdown()
+
+
+def test_resizes_and_revalidates(variants):
+    response = variants.client.get('/api/images/img/logo.png?w=100&format=webp')
+    assert response.status_code == 200 and response.mimetype == 'image/webp'
+    assert response.headers['Cache-Control'] == 'public, max-age=86400'
+    etag = response.headers['ETag']
+    assert variants.client.get('/api/images/img/logo.png?w=100&format=webp',
+                               headers={'If-None-Match': etag}).status_code == 304
+    assert variants.client.get('/api/images/data/clips.json').status_code == 404
+    assert variants.client.get('/api/images/img/logo.png?format=gif').status_code == 400
+
+
+def test_slow_render_answers_503_without_a_duplicate_job(variants, monkeypatch):
+    release = threading.Event()
+    calls = []
+    render = image_variants.render_variant
+
+    def slow_render(*args):
+        calls.append(args)
+        release.wait(10)
+        return render(*args)
+
+    monkeypatch.setattr(image_variants, 'render_variant', slow_render)
+    variants.render_timeout = 0.2
+
+    response = variants.client.get('/api/images/img/logo.png?w=64&format=png')
+    assert response.status_code == 503 and response.headers['Retry-After']
+    assert variants.client.get('/api/images/img/logo.png?w=64&format=png').status_code == 503
+    assert len(calls) == 1
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while variants._rendering and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert variants._rendering == {} and len(variants._cache) == 1
+    assert variants.client.get('/api/images/img/logo.png?w=64&format=png').status_code == 200
+    assert len(calls) == 1
+
+
+def test_lru_evicts_the_oldest_variants(variants):
+    variants.max_bytes = 1
+    for width in (32, 64, 128):
+        assert variants.client.get(f'/api/images/img/logo.png?w={width}&format=png').status_code == 200
+    # The newest variant always stays, even above the budget
+    assert list(variants._cache) == [name for name in variants._cache if '-w128.' in name]
+
+
+def test_png_variants_ignore_quality(variants):
+    first = variants.client.get('/api/images/img/logo.png?w=64&format=png&q=50')
+    second = variants.client.get('/api/images/img/logo.png?w=64&format=png&q=90')
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert list(variants._cache) == [name for name in variants._cache if name.endswith('-w64.png')]
+
+
+def test_variant_evicted_before_sending_is_rendered_again(variants, monkeypatch):
+    assert variants.client.get('/api/images/img/logo.png?w=64&format=png').status_code == 200
+    variant = variants.variant
+    evicted = []
+
+    def variant_then_evict(*args, **kwargs):
+        target, fmt, name = variant(*args, **kwargs)
+        if not evicted:
+            # Another request's render evicts the file before send_file opens it
+            with variants._lock:
+                variants._size -= variants._cache.pop(name)
+                os.remove(target)
+            evicted.append(name)
+        return target, fmt, name
+
+    monkeypatch.setattr(variants, 'variant', variant_then_evict)
+    response = variants.client.get('/api/images/img/logo.png?w=64&format=png')
+    assert response.status_code == 200 and response.mimetype == 'image/png'
+    assert evicted and evicted[0] in variants._cache
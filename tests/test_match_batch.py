@@ -0,0 +1,47 @@
+from match_batch import plan_batch, validate_match
+from match_index import MatchIndex
+
+STORED = [{'id': 1, 'homeTeam': 'A', 'awayTeam': 'B', 'matchday': 1, 'status': 'scheduled'}]
+
+
+def index():
+    return MatchIndex(lambda: [dict(m) for m in STORED])
+
+
+def test_validate_match_reports_every_problem():
+    errors = validate_match({'homeTeam': 'A', 'awayTeam': 'A', 'matchday': 0, 'status': 'finished',
+                             'homeScore': -1, 'date': '01/02/2025', 'scorers': {}})
+    assert errors == [
+        'homeTeam and awayTeam must be different',
+        'matchday must be a positive integer',
+        'homeScore must be a non-negative integer',
+        'awayScore is required for a finished match',
+        'scorers must be a list of objects',
+        'date must be YYYY-MM-DD',
+    ]
+    assert validate_match({'homeTeam': 'A', 'awayTeam': 'B', 'matchday': '2', 'date': '2025-02-01'}) == []
+
+
+def test_plan_applies_operations_in_order():
+    changes, results = plan_batch([
+        {'op': 'create', 'match': {'homeTeam': 'C', 'awayTeam': 'D'}},
+        {'op': 'update', 'id': 1, 'match': {'status': 'finished', 'homeScore': 1, 'awayScore': 1}},
+        {'op': 'update', 'id': '1', 'match': {'homeScore': 2}},
+        {'op': 'delete', 'id': 1},
+    ], index())
+    assert [r['status'] for r in results] == ['created', 'updated', 'updated', 'deleted']
+    old, new = changes[2]
+    assert old['homeScore'] == 1 and new['homeScore'] == 2
+    assert changes[3] == (new, None)
+
+
+def test_one_bad_operation_rejects_the_batch():
+    changes, results = plan_batch([
+        {'op': 'update', 'id': 1, 'match': {'status': 'done'}},
+        {'op': 'delete', 'id': 99},
+        {'op': 'create', 'match': {'homeTeam': 'C', 'awayTeam': 'D'}},
+        {'op': 'rename'},
+    ], index())
+    assert changes is None
+    assert [r['status'] for r in results] == ['error', 'error', 'not_applied', 'error']
+    assert results[1]['errors'] == ['Match not found']
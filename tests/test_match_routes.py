@@ -0,0 +1,53 @@
+import importlib
+import sys
+
+from storage import NdjsonBackend
+
+
+def match(**fields):
+    return dict({'homeTeam': 'A', 'awayTeam': 'B', 'matchday': 1, 'status': 'scheduled'}, **fields)
+
+
+def test_create_update_and_delete_a_match(client):
+    created = client.post('/api/matches', json=match()).get_json()['match']
+    updated = client.put(f"/api/matches/{created['id']}", json={'status': 'finished', 'homeScore': 2, 'awayScore': 0})
+    assert updated.status_code == 200
+
+    table = {row['team']: row for row in client.get('/api/standings').get_json()}
+    assert table['A']['points'] == 3 and table['B']['played'] == 1
+    assert client.delete(f"/api/matches/{created['id']}").status_code == 200
+    table = {row['team']: row for row in client.get('/api/standings').get_json()}
+    assert table['A']['points'] == 0
+
+
+def test_batch_is_all_or_nothing(client):
+    response = client.post('/api/matches/batch', json=[
+        {'op': 'create', 'match': match()},
+        {'op': 'create', 'match': match(awayTeam='A')},
+    ])
+    assert response.status_code == 400
+    assert [r['status'] for r in response.get_json()['results']] == ['not_applied', 'error']
+    assert client.get('/api/matches').get_json() == []
+
+
+def test_ndjson_match_edits_patch_one_record(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('LPCP_STORAGE', 'ndjson')
+    sys.modules.pop('simple_server', None)
+    server = importlib.import_module('simple_server')
+    try:
+        client = server.app.test_client()
+        first = client.post('/api/matches', json=match()).get_json()['match']
+        client.post('/api/matches', json=match(homeTeam='C', awayTeam='D'))
+        lines = (tmp_path / 'matches_data.ndjson').read_text().count('\n')
+
+        response = client.put(f"/api/matches/{first['id']}", json={'date': '2025-03-01'})
+        assert response.status_code == 200
+        # Appended one line instead of rewriting both matches
+        assert (tmp_path / 'matches_data.ndjson').read_text().count('\n') == lines + 1
+
+        stored = NdjsonBackend(server.storage.files).load('matches')
+        assert [m.get('date') for m in stored] == ['2025-03-01', None]
+        assert server.storage.get_record('matches', first['id'])['date'] == '2025-03-01'
+    finally:
+        sys.modules.pop('simple_server', None)
@@ -0,0 +1,39 @@
+from player_stats import contributions
+
+
+def finished(**fields):
+    return dict({'homeTeam': 'A', 'awayTeam': 'B', 'status': 'finished', 'homeScore': 1, 'awayScore': 0}, **fields)
+
+
+def test_contributions_credit_scorer_assist_and_clean_sheet():
+    match = finished(scorers=[{'playerId': '7', 'team': 'A', 'assistPlayerId': 4}], homeGoalkeeperId=1)
+    assert sorted(contributions(match), key=repr) == sorted(
+        [(7, 'A', 'goals'), (4, 'A', 'assists'), (1, 'A', 'cleanSheets')], key=repr)
+
+
+def test_contributions_skip_malformed_scorers():
+    assert contributions(finished(scorers=5)) == [(None, 'A', 'cleanSheets')]
+    events = [5, {'playerId': [1], 'team': {'x': 1}}, {'playerId': 3, 'team': 'A'}]
+    assert contributions(finished(scorers=events)) == [
+        (None, None, 'goals'), (3, 'A', 'goals'), (None, 'A', 'cleanSheets')]
+
+
+def test_match_routes_reject_bad_scorers(client):
+    response = client.post('/api/matches', json=finished(scorers=5))
+    assert response.status_code == 400
+    assert 'scorers' in response.get_json()['error']
+
+    created = client.post('/api/matches', json=finished(scorers=[{'playerId': 3, 'team': 'A'}]))
+    assert created.status_code == 200
+    match_id = created.get_json()['match']['id']
+    assert client.put(f'/api/matches/{match_id}', json={'scorers': 'x'}).status_code == 400
+
+    response = client.get('/api/leaderboards/clubs')
+    assert response.status_code == 200
+    assert response.get_json()['A']['goals'] == 1
+
+
+def test_leaderboards_survive_a_stored_bad_scorers_value(server, client):
+    server.save_matches_data([dict(finished(scorers=5), id=1)])
+    assert client.get('/api/leaderboards/clubs').status_code == 200
+    assert client.get('/api/leaderboards/scorers').status_code == 200
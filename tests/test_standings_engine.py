@@ -0,0 +1,131 @@
+import threading
+
+import pytest
+
+from standings_engine import StandingsEngine
+from storage import FileLock
+
+SETTINGS = {'pointsWin': 3, 'pointsDraw': 1, 'pointsLoss': 0}
+
+
+def finished(match_id, home, away, home_score, away_score):
+    return {'id': match_id, 'homeTeam': home, 'awayTeam': away, 'status': 'finished',
+            'homeScore': home_score, 'awayScore': away_score}
+
+
+def make_engine(tmp_path, saved=None):
+    saved = saved if saved is not None else []
+    engine = StandingsEngine(lambda: [], lambda rows: saved.append(rows) or True, lambda: SETTINGS,
+                             lock=lambda: file_lock)
+    file_lock = FileLock(str(tmp_path / 'standings.lock'))
+    return engine, saved
+
+
+def run_concurrently(*targets, timeout=10):
+    threads = [threading.Thread(target=target, daemon=True) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout)
+    return [thread for thread in threads if thread.is_alive()]
+
+
+def test_apply_match_changes_scores_both_teams(tmp_path):
+    engine, saved = make_engine(tmp_path)
+    engine.apply_match_changes([(None, finished(1, 'A', 'B', 2, 1))])
+    table = {row['team']: row for row in engine.table()}
+    assert table['A']['points'] == 3 and table['B']['points'] == 0
+    assert [row['team'] for row in saved[-1]] == ['A', 'B']
+
+    engine.apply_match_changes([(finished(1, 'A', 'B', 2, 1), finished(1, 'A', 'B', 1, 1))])
+    table = {row['team']: row for row in engine.table()}
+    assert table['A']['points'] == 1 and table['B']['points'] == 1 and table['A']['played'] == 1
+
+
+def test_replace_table_and_match_changes_do_not_deadlock(tmp_path):
+    engine, _ = make_engine(tmp_path)
+    rows = [{'team': 'A', 'points': 0}, {'team': 'B', 'points': 0}]
+
+    def replace():
+        for _ in range(200):
+            engine.replace_table(rows)
+
+    def apply():
+        for i in range(200):
+            engine.apply_match_changes([(None, finished(i, 'A', 'B', 1, 0))])
+
+    assert run_concurrently(replace, apply) == []
+
+
+def test_standings_put_and_finished_match_post_do_not_deadlock(client):
+    table = [{'team': 'A', 'points': 0}, {'team': 'B', 'points': 0}]
+    statuses = []
+
+    def put():
+        for _ in range(20):
+            statuses.append(client.put('/api/standings', json=table).status_code)
+
+    def post():
+        for _ in range(20):
+            match = {'homeTeam': 'A', 'awayTeam': 'B', 'status': 'finished', 'homeScore': 1, 'awayScore': 0}
+            statuses.append(client.post('/api/matches', json=match).status_code)
+
+    assert run_concurrently(put, post) == []
+    assert statuses == [200] * 40
+
+
+def test_failed_save_keeps_the_table_and_retries(tmp_path):
+    stored = [{'team': 'A', 'points': 0}, {'team': 'B', 'points': 0}]
+    saves = []
+    engine = StandingsEngine(lambda: stored, lambda rows: bool(saves.append(rows)) or len(saves) > 1,
+                             lambda: SETTINGS)
+
+    engine.apply_match_changes([(None, finished(1, 'A', 'B', 3, 0))])
+    assert len(saves) == 1
+    # The read retries the write, and the change was never dropped
+    assert [row['points'] for row in engine.table()] == [3, 0]
+    assert len(saves) == 2 and saves[-1][0]['points'] == 3
+    engine.table()
+    assert len(saves) == 2
+
+
+def test_failed_standings_save_does_not_fail_the_match(server, client, monkeypatch):
+    save = server.storage.save
+
+    def failing_save(domain, *args, **kwargs):
+        if domain == 'standings':
+            raise OSError('disk full')
+        return save(domain, *args, **kwargs)
+
+    monkeypatch.setattr(server.storage, 'save', failing_save)
+    match = {'homeTeam': 'A', 'awayTeam': 'B', 'matchday': 1, 'status': 'finished', 'homeScore': 2,
+             'awayScore': 0, 'scorers': [{'playerId': 9, 'team': 'A'}, {'playerId': 9, 'team': 'A'}]}
+    response = client.post('/api/matches', json=match)
+    assert response.status_code == 200
+    assert len(client.get('/api/matches').get_json()) == 1
+
+    def points():
+        return {row['team']: row['points'] for row in client.get('/api/standings').get_json()}
+
+    assert points()['A'] == 3
+    assert client.get('/api/standings?matchday=1').get_json()[0]['team'] == 'A'
+    assert client.get('/api/leaderboards/scorers').get_json()
+
+    # Once the disk recovers, the next engine read writes the table that was kept
+    monkeypatch.setattr(server.storage, 'save', save)
+    server.standings_engine.table()
+    assert {row['team']: row['points'] for row in server.load_standings_data()}['A'] == 3
+
+
+def test_rebuild_matches_incremental_updates_and_rescoring(tmp_path):
+    matches = [finished(1, 'A', 'B', 2, 1), finished(2, 'B', 'C', 0, 0), finished(3, 'C', 'A', 3, 1)]
+    incremental, _ = make_engine(tmp_path)
+    incremental.apply_match_changes([(None, m) for m in matches])
+
+    rebuilt, _ = make_engine(tmp_path)
+    roster = [{'team': team} for team in ('A', 'B', 'C')]
+    assert [(r['team'], r['points'], r['goalDifference']) for r in rebuilt.rebuild(roster, matches)] == \
+        [(r['team'], r['points'], r['goalDifference']) for r in incremental.table()]
+
+    incremental.update_points({'pointsWin': 2, 'pointsDraw': 1, 'pointsLoss': 0})
+    assert {r['team']: r['points'] for r in incremental.table()} == {'A': 2, 'B': 1, 'C': 3}
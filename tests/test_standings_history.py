@@ -0,0 +1,22 @@
+def result(matchday, home, away, home_score, away_score):
+    return {'homeTeam': home, 'awayTeam': away, 'matchday': matchday, 'status': 'finished',
+            'homeScore': home_score, 'awayScore': away_score}
+
+
+def points(client, matchday):
+    table = client.get(f'/api/standings?matchday={matchday}').get_json()
+    return {row['team']: row['points'] for row in table if row['played']}
+
+
+def test_tables_per_matchday_follow_match_edits(client):
+    first = client.post('/api/matches', json=result(1, 'A', 'B', 1, 0)).get_json()['match']
+    client.post('/api/matches', json=result(2, 'B', 'A', 2, 0))
+    assert points(client, 1) == {'A': 3, 'B': 0}
+    assert points(client, 2) == {'A': 3, 'B': 3}
+
+    client.put(f"/api/matches/{first['id']}", json={'homeScore': 0, 'awayScore': 0})
+    assert points(client, 1) == {'A': 1, 'B': 1}
+    assert points(client, 2) == {'A': 1, 'B': 4}
+
+    timeline = client.get('/api/standings/timeline/B').get_json()['timeline']
+    assert [entry['points'] for entry in timeline] == [1, 4]
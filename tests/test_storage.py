@@ -0,0 +1,68 @@
+import os
+import sqlite3
+
+import pytest
+
+from storage import JsonBackend, NdjsonBackend, SqliteBackend, StaleWriteError, convert
+
+CLIPS = [{'id': 'a', 'type': 'goles', 'upload_date': '2025-01-01'}, {'id': 'b', 'title': 'ñandú'}]
+
+
+def backends(tmp_path):
+    files = {domain: str(tmp_path / f'{domain}.json') for domain in ('clips', 'standings', 'matches', 'settings')}
+    return [JsonBackend(files), NdjsonBackend(files), SqliteBackend(str(tmp_path / 'lpcp.db'))]
+
+
+@pytest.mark.parametrize('index', range(3))
+def test_round_trip_and_stale_writes(tmp_path, index):
+    backend = backends(tmp_path)[index]
+    assert backend.load('clips') is None
+    backend.save('clips', CLIPS)
+    backend.save('settings', {'pointsWin': 3})
+    assert backend.load('clips') == CLIPS
+    assert backend.load('settings') == {'pointsWin': 3}
+
+    version = backend.version('clips')
+    backend.save('clips', CLIPS[:1], expected_version=version)
+    with pytest.raises(StaleWriteError):
+        backend.save('clips', CLIPS, expected_version=version)
+    assert backend.load('clips') == CLIPS[:1]
+
+
+def test_convert_between_backends(tmp_path):
+    json_backend, ndjson_backend, sqlite_backend = backends(tmp_path)
+    json_backend.save('clips', CLIPS)
+    json_backend.save('matches', [{'id': 1, 'matchday': 2}])
+    assert convert(json_backend, sqlite_backend) == {'clips': 2, 'matches': 1}
+    assert sqlite_backend.load('matches') == [{'id': 1, 'matchday': 2}]
+
+
+def test_sqlite_opens_a_database_with_the_old_query_schema(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE clips (pos INTEGER PRIMARY KEY, id, type TEXT, club TEXT, upload_date TEXT, data TEXT NOT NULL);
+        CREATE INDEX clips_type_date ON clips (type, upload_date);
+    """)
+    conn.close()
+
+    backend = SqliteBackend(path)
+    backend.save('clips', CLIPS)
+    assert backend.load('clips') == CLIPS
+    indexes = backend._conn().execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'clips_%'")
+    assert indexes.fetchall() == []
+
+
+def test_ndjson_rescan_keeps_duplicates_and_patches(tmp_path):
+    backend = backends(tmp_path)[1]
+    backend.save('matches', [{'id': 1, 'score': 0}, {'id': 1, 'score': 1}, {'id': 2, 'score': 2}])
+    os.remove(backend._index_path('matches'))
+    fresh = NdjsonBackend({'matches': str(tmp_path / 'matches.json')})
+    assert fresh.load('matches') == [{'id': 1, 'score': 0}, {'id': 1, 'score': 1}, {'id': 2, 'score': 2}]
+
+    fresh.patch_record('matches', 2, {'score': 5})
+    fresh.patch_record('matches', '#1', {'score': 4})
+    os.remove(fresh._index_path('matches'))
+    rescanned = NdjsonBackend({'matches': str(tmp_path / 'matches.json')})
+    assert rescanned.load('matches') == [{'id': 1, 'score': 0}, {'id': 1, 'score': 4}, {'id': 2, 'score': 5}]
+    assert rescanned.get_record('matches', 2) == {'id': 2, 'score': 5}
@@ -0,0 +1,38 @@
+import json
+
+from tournament_store import TournamentStore
+
+DOCUMENT = {
+    'teams': [{'id': 1, 'name': 'ACP 507'}],
+    'tournament': {'matches': [{'id': 7, 'note': 'llaves [ } "'}], 'currentBracket': None},
+    'players': [{'id': 3, 'name': 'Ana'}],
+    'lastQuickSave': '2025-01-01',
+}
+
+
+def write(tmp_path):
+    path = tmp_path / 'tournament.json'
+    path.write_text(json.dumps(DOCUMENT, ensure_ascii=False, indent=2), encoding='utf-8')
+    return path
+
+
+def test_sections_are_parsed_on_demand(tmp_path):
+    store = TournamentStore(str(write(tmp_path)))
+    assert {'teams', 'players', 'tournament.matches', 'tournament.currentBracket'} <= set(store.sections())
+    assert store.get('tournament.matches')[0]['note'] == 'llaves [ } "'
+    assert store.find('players', '3')['name'] == 'Ana'
+
+
+def test_saving_one_section_leaves_the_others_untouched(tmp_path):
+    path = write(tmp_path)
+    store = TournamentStore(str(path))
+    before = path.read_text(encoding='utf-8')
+    store.save('players', [{'id': 3, 'name': 'Ana'}, {'id': 4, 'name': 'Luis'}])
+    store.save('tournament.currentBracket', {'rounds': []})
+
+    after = path.read_text(encoding='utf-8')
+    assert json.loads(after) == dict(DOCUMENT, players=[{'id': 3, 'name': 'Ana'}, {'id': 4, 'name': 'Luis'}],
+                                     tournament=dict(DOCUMENT['tournament'], currentBracket={'rounds': []}))
+    teams = before[before.index('"teams"'):before.index('"tournament"')]
+    assert teams in after
+    assert TournamentStore(str(path)).find('players', 4)['name'] == 'Luis'
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Section-by-section access to ``data/tournament.json``.
+
+The document packs several independent domains into one object::
+
+    {"teams": [...], "tournament": {"matches": [...], "standings": [...],
+     "settings": {...}, "currentBracket": ...}, "players": [...],
+     "clubs": [...], "clips": [...], "stats": {...}, "lastQuickSave": "..."}
+
+Reading the file only locates where each section's value starts and ends
+(a scan for brackets and strings, without building any objects); a section
+is parsed the first time it is asked for. ``tournament`` is split one level
+further, so ``tournament.currentBracket`` is a section of its own.
+
+Saving a section serializes just that value and splices it between the
+untouched text of the others, so editing one player never re-serializes the
+clips or matches. Writes happen under a cross-process lock, on top of the
+latest file (sections changed by another process are kept), and are atomic.
+The layout stays the pretty-printed JSON the Node server reads and writes.
+
+``find`` looks records up by id (teams, players, clubs) through a per-section
+index built on first use.
+"""
+import json
+import os
+import re
+import threading
+
+from storage import FileLock, CorruptDataError, atomic_write
+
+# Strings (skipped whole, so brackets inside them don't count) and brackets
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+_WS = re.compile(r'\s*')
+_COLON = re.compile(r'\s*:\s*')
+_NEXT = re.compile(r'\s*([,}])\s*')
+
+_decoder = json.JSONDecoder()
+
+INDENT = 2
+
+
+def _value_end(text, start):
+    if text[start] not in '{[':
+        return _decoder.raw_decode(text, start)[1]
+    depth = 0
+    for m in _TOKEN.finditer(text, start):
+        c = m.group()[0]
+        if c in '{[':
+            depth += 1
+        elif c in '}]':
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    raise ValueError(f"unterminated value at {start}")
+
+
+def _members(text, start):
+    """``{key: (start, end)}`` of the values in the object starting at ``start``"""
+    if text[start] != '{':
+        raise ValueError(f"expected an object at {start}")
+    spans = {}
+    pos = _WS.match(text, start + 1).end()
+    if text[pos] == '}':
+        return spans
+    while True:
+        key, pos = _decoder.raw_decode(text, pos)
+        colon = _COLON.match(text, pos)
+        if colon is None or not isinstance(key, str):
+            raise ValueError(f"expected a key at {pos}")
+        pos = colon.end()
+        end = _value_end(text, pos)
+        spans[key] = (pos, end)
+        sep = _NEXT.match(text, end)
+        if sep is None:
+            raise ValueError(f"expected ',' or '}}' at {end}")
+        if sep.group(1) == '}':
+            return spans
+        pos = sep.end()
+
+
+class TournamentStore:
+    """Lazily parsed, independently saved sections of one JSON document"""
+
+    def __init__(self, path, split=('tournament',)):
+        self.path = path
+        self.split = split
+        self._file_lock = FileLock(path + '.lock')
+        self._lock = threading.RLock()
+        self._text = None
+        self._version = None
+        self._spans = {}    # section -> (start, end) of its value in _text
+        self._objects = {}  # '' (the document) or a split key -> span of that object
+        self._values = {}   # parsed sections
+        self._ids = {}      # section -> {str(id): record}
+
+    # ---- file ----------------------------------------------------------
+
+    def version(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def lock(self):
+        """Cross-process lock to hold around a read-modify-write of a section"""
+        return self._file_lock
+
+    def _scan(self, text):
+        start = _WS.match(text).end()
+        objects = {'': (start, _value_end(text, start))}
+        spans = {}
+        for key, (s, e) in _members(text, start).items():
+            if key in self.split and text[s] == '{':
+                objects[key] = (s, e)
+                for sub, span in _members(text, s).items():
+                    spans[f'{key}.{sub}'] = span
+            else:
+                spans[key] = (s, e)
+        return spans, objects
+
+    def _refresh(self):
+        version = self.version()
+        if self._text is not None and version == self._version:
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                text = f.read().decode('utf-8')
+        except FileNotFoundError:
+            text = '{}'
+        try:
+            spans, objects = self._scan(text)
+        except (ValueError, IndexError) as e:
+            raise CorruptDataError(f"{self.path} is not valid JSON: {e}") from e
+        self._text, self._version = text, version
+        self._spans, self._objects = spans, objects
+        self._values, self._ids = {}, {}
+
+    # ---- reads ---------------------------------------------------------
+
+    def sections(self):
+        with self._lock:
+            self._refresh()
+            return list(self._spans)
+
+    def get(self, section, default=None):
+        """The parsed section (shared: copy before changing it), or ``default``"""
+        with self._lock:
+            self._refresh()
+            if section in self._values:
+                return self._values[section]
+            span = self._spans.get(section)
+            if span is None:
+                return default
+            try:
+                value = json.loads(self._text[span[0]:span[1]])
+            except ValueError as e:
+                raise CorruptDataError(f"{self.path}: section {section} is not valid JSON: {e}") from e
+            self._values[section] = value
+            return value
+
+    def find(self, section, record_id):
+        """The record of a list section whose id is ``record_id`` (as a string or number)"""
+        with self._lock:
+            records = self.get(section) or []
+            ids = self._ids.get(section)
+            if ids is None:
+                ids = self._ids[section] = {str(r['id']): r for r in records
+                                            if isinstance(r, dict) and r.get('id') is not None}
+            return ids.get(str(record_id))
+
+    # ---- writes --------------------------------------------------------
+
+    def _serialize(self, value, depth):
+        raw = json.dumps(value, ensure_ascii=False, indent=INDENT)
+        return raw.replace('\n', '\n' + ' ' * (INDENT * depth))
+
+    def _splice(self, start, end, new):
+        delta = len(new) - (end - start)
+
+        def shift(span):
+            s, e = span
+            return (s + delta if s >= end else s, e + delta if e >= end else e)
+
+        self._text = self._text[:start] + new + self._text[end:]
+        self._spans = {name: shift(span) for name, span in self._spans.items()}
+        self._objects = {name: shift(span) for name, span in self._objects.items()}
+
+    def _insert(self, container, key, value, depth):
+        """Add ``key`` to the object ``container``, then rescan"""
+        s, e = self._objects[container]
+        member = json.dumps(key, ensure_ascii=False) + ': ' + self._serialize(value, depth)
+        pad = '\n' + ' ' * (INDENT * depth)
+        if self._text[s + 1:e - 1].strip():
+            # Right after the last member's value
+            last = len(self._text[:e - 1].rstrip())
+            self._text = self._text[:last] + ',' + pad + member + self._text[last:]
+        else:
+            self._text = self._text[:s + 1] + pad + member + '\n' + ' ' * (INDENT * (depth - 1)) + self._text[e - 1:]
+        self._spans, self._objects = self._scan(self._text)
+
+    def save(self, section, value):
+        """Persist one section; the rest of the file is copied through unchanged"""
+        with self._file_lock, self._lock:
+            # Build on the latest file so other writers' sections are kept
+            self._refresh()
+            before = self._version
+            parent, _, key = section.rpartition('.')
+            if section in self._spans:
+                start, end = self._spans[section]
+                self._splice(start, end, self._serialize(value, 2 if parent else 1))
+            elif parent and parent in self._objects:
+                self._insert(parent, key, value, 2)
+            elif parent:
+                self._insert('', parent, {key: value}, 1)
+            else:
+                self._insert('', section, value, 1)
+            if not self._text.endswith('\n'):
+                self._text += '\n'
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            atomic_write(self.path, self._text.encode('utf-8'))
+            after = self.version()
+            if before is not None and after is not None and after <= before:
+                os.utime(self.path, ns=(before + 1, before + 1))
+            self._version = self.version()
+            self._values[section] = value
+            self._ids.pop(section, None)